@@ -0,0 +1,171 @@
+import time
+
+import numpy as np
+
+def price_lookup(asset_ids, prices):
+    """Look up the price of each asset id in one vectorized pass.
+    
+    Args:
+        asset_ids: Array of asset ids.
+        prices: Dict mapping asset_id to its price; missing assets are priced at 0.
+        
+    Returns:
+        An array of prices aligned with asset_ids.
+    """
+    asset_ids = np.asarray(asset_ids, dtype=np.int64)
+    if not prices or not len(asset_ids):
+        return np.zeros(len(asset_ids))
+        
+    keys = np.fromiter(prices.keys(), np.int64, len(prices))
+    values = np.fromiter(prices.values(), float, len(prices))
+    order = np.argsort(keys)
+    keys = keys[order]
+    values = values[order]
+    
+    positions = np.minimum(np.searchsorted(keys, asset_ids), len(keys) - 1)
+    return np.where(keys[positions] == asset_ids, values[positions], 0.0)
+
+def holdings_columns(holdings, prices):
+    """Load holdings and their prices into column arrays.
+    
+    Args:
+        holdings: List of holding dicts as returned by Database.get_user_holdings.
+        prices: Dict mapping asset_id to its latest price.
+        
+    Returns:
+        A dict of arrays: id, asset_id, amount, purchase_price and price.
+    """
+    count = len(holdings)
+    asset_ids = np.fromiter((holding['asset_id'] for holding in holdings), np.int64, count)
+    return {
+        "id": np.fromiter((holding['id'] for holding in holdings), np.int64, count),
+        "asset_id": asset_ids,
+        "amount": np.fromiter((holding['amount'] for holding in holdings), float, count),
+        "purchase_price": np.fromiter((holding['purchase_price_per_unit'] for holding in holdings), float, count),
+        "price": price_lookup(asset_ids, prices)
+    }
+
+def analyze(amounts, purchase_prices, prices):
+    """Value a whole portfolio in one vectorized pass.
+    
+    Args:
+        amounts: Array of amounts held.
+        purchase_prices: Array of purchase prices per unit.
+        prices: Array of current prices per unit.
+        
+    Returns:
+        A (columns, totals) tuple. columns is a dict of arrays: value, cost,
+        profit_loss, profit_loss_pct and allocation (percent of total value).
+        totals has total_value, total_cost, total_profit, total_profit_pct,
+        asset_count and hhi, the Herfindahl-Hirschman index: the sum of
+        squared value shares, from 1/n for an even split to 1 for a single
+        position, and 0 for an empty or worthless portfolio.
+    """
+    amounts = np.asarray(amounts, dtype=float)
+    value = amounts * np.asarray(prices, dtype=float)
+    cost = amounts * np.asarray(purchase_prices, dtype=float)
+    profit_loss = value - cost
+    
+    # Divide only where the cost basis is positive, leaving 0 elsewhere
+    profit_loss_pct = np.divide(profit_loss, cost, out=np.zeros_like(profit_loss), where=cost > 0) * 100
+    
+    total_value = float(value.sum())
+    total_cost = float(cost.sum())
+    shares = value / total_value if total_value > 0 else np.zeros_like(value)
+    
+    columns = {
+        "value": value,
+        "cost": cost,
+        "profit_loss": profit_loss,
+        "profit_loss_pct": profit_loss_pct,
+        "allocation": shares * 100
+    }
+    totals = {
+        "total_value": total_value,
+        "total_cost": total_cost,
+        "total_profit": total_value - total_cost,
+        "total_profit_pct": ((total_value - total_cost) / total_cost) * 100 if total_cost > 0 else 0,
+        "asset_count": len(value),
+        "hhi": float(np.dot(shares, shares))
+    }
+    return columns, totals
+
+def diversification_score(asset_count, hhi):
+    """Score diversification from 0 to 10.
+    
+    Up to 5 points for the number of assets (5 at 10 or more) and up to 5
+    for a low concentration (HHI).
+    """
+    asset_score = min(5, asset_count / 2)
+    concentration_score = 5 * (1 - hhi)
+    return max(0, min(10, round(asset_score + concentration_score)))
+
+def benchmark(holding_count=100000, asset_count=2000, repeat=5):
+    """Time the PortfolioEngine's column valuation against a per-row Python loop.
+    
+    Returns:
+        A dict with the best time of each step in milliseconds.
+    """
+    from portfolio import PortfolioEngine
+    
+    rng = np.random.default_rng(0)
+    holdings = [
+        {"id": i, "asset_id": int(asset_id), "symbol": f"A{asset_id}", "name": f"Asset {asset_id}",
+         "amount": float(amount), "purchase_price_per_unit": float(purchase_price)}
+        for i, (asset_id, amount, purchase_price) in enumerate(zip(
+            rng.integers(1, asset_count + 1, holding_count),
+            rng.random(holding_count) * 10,
+            rng.random(holding_count) * 100
+        ))
+    ]
+    prices = {asset_id: float(price) for asset_id, price in enumerate(rng.random(asset_count) * 100, start=1)}
+    
+    class MemoryDatabase:
+        """Serves the generated holdings and prices in place of a Database."""
+        def get_user_holdings(self, user_id):
+            return holdings
+            
+        def get_latest_prices(self, asset_ids):
+            return {asset_id: {"price_usd": prices[asset_id]} for asset_id in asset_ids}
+            
+    engine = PortfolioEngine(MemoryDatabase())
+    
+    def best_of(function):
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            function()
+            timings.append((time.perf_counter() - start) * 1000)
+        return min(timings)
+        
+    def snapshot():
+        engine.portfolios[1]['snapshot'] = None
+        return engine.get_snapshot(1)
+        
+    def per_row():
+        rows = []
+        total_value = 0
+        for holding in holdings:
+            value = holding['amount'] * prices.get(holding['asset_id'], 0)
+            cost = holding['amount'] * holding['purchase_price_per_unit']
+            rows.append((value, cost, value - cost, ((value - cost) / cost) * 100 if cost > 0 else 0))
+            total_value += value
+        rows.sort(key=lambda row: row[0], reverse=True)
+        return rows, sum((row[0] / total_value) ** 2 for row in rows)
+        
+    columns = holdings_columns(holdings, prices)
+    return {
+        "holdings": holding_count,
+        "load_ms": best_of(lambda: engine.load(1)),
+        "analyze_ms": best_of(lambda: analyze(columns['amount'], columns['purchase_price'], columns['price'])),
+        "snapshot_ms": best_of(snapshot),
+        "per_row_ms": best_of(per_row)
+    }
+
+if __name__ == "__main__":
+    results = benchmark()
+    print(f"{results['holdings']} holdings:")
+    print(f"  load into column arrays {results['load_ms']:8.1f} ms")
+    print(f"  vectorized analysis     {results['analyze_ms']:8.1f} ms")
+    print(f"  portfolio snapshot      {results['snapshot_ms']:8.1f} ms")
+    print(f"  per-row Python          {results['per_row_ms']:8.1f} ms")
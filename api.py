@@ -1,57 +1,192 @@
+import asyncio
+import random
 import requests
+import threading
 import time
-from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from email.utils import parsedate_to_datetime
+from requests.adapters import HTTPAdapter
 
+# Default request budgets per CoinGecko endpoint: (requests per minute, burst size).
+# The public API allows roughly 10-30 calls per minute depending on load.
+DEFAULT_RATE_LIMITS = {
+    "simple/price": (10, 5),
+    "search": (10, 3),
+    "market_chart": (5, 2),
+    "coins/list": (2, 1),
+}
+
+# Status codes worth retrying: rate limited or a transient server error
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+
+class TokenBucket:
+    def __init__(self, rate, capacity):
+        """Initialize a token bucket.
+        
+        Args:
+            rate: Tokens added per second.
+            capacity: Maximum number of tokens, i.e. the allowed burst size.
+        """
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+        
+    def refill(self):
+        """Add the tokens accumulated since the last update."""
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        
+    def wait_time(self):
+        """Get the number of seconds until a token is available."""
+        with self.lock:
+            self.refill()
+            return max(0, (1 - self.tokens) / self.rate)
+            
+    def acquire(self, timeout=None):
+        """Take a token, sleeping until one is available.
+        
+        The token is reserved before sleeping, so concurrent callers queue up
+        and are spread evenly over the budget rather than racing for it.
+        
+        Args:
+            timeout: Maximum number of seconds to wait, or None to wait as
+                long as needed.
+                
+        Returns:
+            True if a token was taken, False if it would take longer than timeout.
+        """
+        with self.lock:
+            self.refill()
+            wait = max(0, (1 - self.tokens) / self.rate)
+            if timeout is not None and wait > timeout:
+                return False
+            self.tokens -= 1
+            
+        if wait > 0:
+            time.sleep(wait)
+        return True
+        
 class CryptoAPI:
-    def __init__(self):
-        """Initialize the Crypto API handler."""
+    def __init__(self, rate_limits=None, timeout=(5, 15), max_retries=3, backoff_factor=1.0, max_backoff=60):
+        """Initialize the Crypto API handler.
+        
+        Args:
+            rate_limits: Overrides for DEFAULT_RATE_LIMITS, mapping an endpoint
+                to a (requests per minute, burst size) tuple.
+            timeout: (connect, read) timeout in seconds for each HTTP request.
+            max_retries: Number of retries on connection errors, 429 and 5xx.
+            backoff_factor: Base delay in seconds, doubled on every retry.
+            max_backoff: Upper bound in seconds on any single retry delay,
+                including one requested by a Retry-After header.
+        """
         self.coingecko_base_url = "https://api.coingecko.com/api/v3"
-        self.last_request_time = None
-        self.cooldown_period = 60  # 1 minute cooldown (in seconds)
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.max_backoff = max_backoff
         
-    def can_make_request(self):
-        """Check if cooldown period has passed since last request."""
-        if self.last_request_time is None:
-            return True
-            
-        elapsed_time = time.time() - self.last_request_time
-        return elapsed_time >= self.cooldown_period
+        # One pooled session so requests reuse keep-alive connections
+        self.session = requests.Session()
+        self.session.headers.update({
+            "Accept": "application/json",
+            "Accept-Encoding": "gzip, deflate",
+        })
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=8)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
         
-    def get_remaining_cooldown(self):
-        """Get remaining cooldown time in seconds."""
-        if self.last_request_time is None:
-            return 0
+        self.limiters = {}
+        for endpoint, (per_minute, burst) in dict(DEFAULT_RATE_LIMITS, **(rate_limits or {})).items():
+            self.limiters[endpoint] = TokenBucket(per_minute / 60, burst)
             
-        elapsed_time = time.time() - self.last_request_time
-        remaining = self.cooldown_period - elapsed_time
-        return max(0, remaining)
-    
-    def update_request_time(self):
-        """Update the last request time to current time."""
-        self.last_request_time = time.time()
+    def acquire(self, endpoint, timeout=None):
+        """Wait for the rate limiter of an endpoint to allow a request."""
+        limiter = self.limiters.get(endpoint)
+        if limiter is None:
+            return True
+        return limiter.acquire(timeout)
+        
+    def close(self):
+        """Close the HTTP session and its pooled connections."""
+        self.session.close()
         
+    def get_retry_delay(self, response, attempt):
+        """Get the seconds to wait before retrying, honoring Retry-After."""
+        retry_after = response.headers.get("Retry-After") if response is not None else None
+        if retry_after:
+            try:
+                delay = float(retry_after)
+            except ValueError:
+                try:
+                    retry_at = parsedate_to_datetime(retry_after)
+                    delay = (retry_at - datetime.now(timezone.utc)).total_seconds()
+                except (TypeError, ValueError):
+                    delay = None
+            if delay is not None:
+                return min(self.max_backoff, max(0, delay))
+                
+        # Exponential backoff with jitter so concurrent clients do not retry in lockstep
+        delay = self.backoff_factor * (2 ** attempt)
+        return min(self.max_backoff, delay * random.uniform(0.5, 1.0))
+        
+    def request(self, path, params=None, endpoint=None, limit_timeout=None):
+        """Send a GET request to the CoinGecko API with rate limiting and retries.
+        
+        Args:
+            path: API path relative to the base URL, e.g. "simple/price".
+            params: Query parameters.
+            endpoint: Rate limiter to use; defaults to path.
+            limit_timeout: Maximum seconds to wait for the rate limiter, or
+                None to wait as long as needed.
+                
+        Returns:
+            The final response, or None if the rate limiter timed out. Raises
+            the last requests exception if every attempt failed to connect.
+        """
+        url = f"{self.coingecko_base_url}/{path}"
+        endpoint = endpoint or path
+        
+        for attempt in range(self.max_retries + 1):
+            # Every attempt, including retries, counts against the budget
+            if not self.acquire(endpoint, limit_timeout):
+                return None
+                
+            try:
+                response = self.session.get(url, params=params, timeout=self.timeout)
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt == self.max_retries:
+                    raise
+                response = None
+            else:
+                if response.status_code not in RETRY_STATUS_CODES or attempt == self.max_retries:
+                    return response
+                    
+            delay = self.get_retry_delay(response, attempt)
+            status = response.status_code if response is not None else "connection error"
+            print(f"API request to {path} failed ({status}), retrying in {delay:.1f} seconds")
+            time.sleep(delay)
+            
     def get_price(self, coingecko_id):
         """Get current price for a cryptocurrency by its CoinGecko ID."""
-        if not self.can_make_request():
-            return None, f"API cooldown active. Please wait {int(self.get_remaining_cooldown())} seconds."
-            
         try:
-            url = f"{self.coingecko_base_url}/simple/price"
             params = {
                 "ids": coingecko_id,
                 "vs_currencies": "usd",
                 "include_market_cap": "true"
             }
             
-            self.update_request_time()
-            response = requests.get(url, params=params)
+            response = self.request("simple/price", params)
             
             if response.status_code == 200:
                 data = response.json()
                 if coingecko_id in data:
                     try:
                         price_usd = data[coingecko_id].get("usd", 0)
-                        market_cap = data[coingecko_id].get("usd_market_cap", 0)
+                        market_cap = data[coingecko_id].get("usd_market_cap")
                         
                         return {
                             "price_usd": price_usd,
@@ -72,19 +207,14 @@ class CryptoAPI:
             
     def get_multiple_prices(self, coingecko_ids):
         """Get current prices for multiple cryptocurrencies."""
-        if not self.can_make_request():
-            return None, f"API cooldown active. Please wait {int(self.get_remaining_cooldown())} seconds."
-            
         try:
-            url = f"{self.coingecko_base_url}/simple/price"
             params = {
                 "ids": ",".join(coingecko_ids),
                 "vs_currencies": "usd",
                 "include_market_cap": "true"
             }
             
-            self.update_request_time()
-            response = requests.get(url, params=params)
+            response = self.request("simple/price", params)
             
             if response.status_code == 200:
                 data = response.json()
@@ -94,7 +224,7 @@ class CryptoAPI:
                     if coin_id in data:
                         try:
                             price_usd = data[coin_id].get("usd", 0)
-                            market_cap = data[coin_id].get("usd_market_cap", 0)
+                            market_cap = data[coin_id].get("usd_market_cap")
                             
                             results[coin_id] = {
                                 "price_usd": price_usd,
@@ -113,21 +243,68 @@ class CryptoAPI:
             print(f"Coin IDs: {coingecko_ids}")
             return None, f"API request error: {str(e)}"
             
+    def get_market_chart(self, coingecko_id, days, interval=None):
+        """Get historical prices for a cryptocurrency.
+        
+        CoinGecko picks the granularity from days: 5-minute points for 1 day,
+        hourly up to 90 days and daily beyond that, unless interval="daily".
+        
+        Returns:
+            A (points, error) tuple; points is a list of (timestamp, price_usd)
+            pairs with UTC timestamps formatted like SQLite's CURRENT_TIMESTAMP.
+        """
+        try:
+            params = {
+                "vs_currency": "usd",
+                "days": days
+            }
+            if interval:
+                params["interval"] = interval
+                
+            response = self.request(f"coins/{coingecko_id}/market_chart", params, endpoint="market_chart")
+            
+            if response.status_code == 200:
+                data = response.json()
+                points = []
+                for timestamp_ms, price_usd in data.get("prices", []):
+                    if price_usd is None:
+                        continue
+                    timestamp = datetime.fromtimestamp(timestamp_ms / 1000, timezone.utc)
+                    points.append((timestamp.strftime("%Y-%m-%d %H:%M:%S"), price_usd))
+                return points, None
+            else:
+                return None, f"API request failed with status code {response.status_code}."
+                
+        except Exception as e:
+            print(f"API request error for market chart of {coingecko_id}: {str(e)}")
+            return None, f"API request error: {str(e)}"
+            
+    def get_coin_list(self):
+        """Get the full CoinGecko coin list as dicts with id, symbol and name."""
+        try:
+            response = self.request("coins/list")
+            
+            if response.status_code == 200:
+                return response.json(), None
+            else:
+                return None, f"API request failed with status code {response.status_code}."
+                
+        except Exception as e:
+            return None, f"API request error: {str(e)}"
+            
     def search_cryptocurrency(self, query):
         """Search for a cryptocurrency by name or symbol."""
-        if not self.can_make_request():
-            return None, f"API cooldown active. Please wait {int(self.get_remaining_cooldown())} seconds."
-            
         try:
-            url = f"{self.coingecko_base_url}/search"
             params = {
                 "query": query
             }
             
-            self.update_request_time()
-            response = requests.get(url, params=params)
+            # Searches are interactive, so give up instead of waiting long
+            response = self.request("search", params, limit_timeout=5)
             
-            if response.status_code == 200:
+            if response is None:
+                return None, "API rate limit reached. Please try again later."
+            elif response.status_code == 200:
                 data = response.json()
                 coins = data.get("coins", [])
                 return coins, None
@@ -135,4 +312,56 @@ class CryptoAPI:
                 return None, f"API request failed with status code {response.status_code}."
                 
         except Exception as e:
-            return None, f"API request error: {str(e)}" 
\ No newline at end of file
+            return None, f"API request error: {str(e)}" 
+
+
+class AsyncCryptoAPI:
+    def __init__(self, api=None, max_concurrency=8):
+        """Initialize the async API client.
+        
+        Requests run on a thread pool over the CryptoAPI session, so they
+        share its connection pool, retries and rate limiters.
+        
+        Args:
+            api: CryptoAPI to send requests through; a new one is created if None.
+            max_concurrency: Maximum number of requests in flight at once.
+        """
+        self.api = api or CryptoAPI()
+        self.max_concurrency = max_concurrency
+        self.executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="CryptoAPI")
+        
+    def close(self):
+        """Shut down the worker threads."""
+        self.executor.shutdown(wait=False)
+        
+    async def get_multiple_prices_async(self, coingecko_ids, batch_size=50):
+        """Get current prices for many cryptocurrencies, fetching batches concurrently.
+        
+        Returns:
+            A (results, error) tuple like CryptoAPI.get_multiple_prices. Results
+            from successful batches are merged even if other batches failed,
+            in which case error describes the failures.
+        """
+        loop = asyncio.get_running_loop()
+        batches = [coingecko_ids[i:i + batch_size] for i in range(0, len(coingecko_ids), batch_size)]
+        
+        responses = await asyncio.gather(*[
+            loop.run_in_executor(self.executor, self.api.get_multiple_prices, batch)
+            for batch in batches
+        ])
+        
+        results = {}
+        errors = []
+        for prices, error in responses:
+            if error:
+                errors.append(error)
+            if prices:
+                results.update(prices)
+                
+        if errors:
+            return results, f"{len(errors)} of {len(batches)} batches failed: {errors[0]}"
+        return results, None
+        
+    def get_multiple_prices(self, coingecko_ids, batch_size=50):
+        """Synchronous wrapper around get_multiple_prices_async."""
+        return asyncio.run(self.get_multiple_prices_async(coingecko_ids, batch_size))
@@ -0,0 +1,112 @@
+import math
+from datetime import datetime, timezone
+
+class PriceBackfill:
+    def __init__(self, api, db, max_days=365, min_interval=24 * 3600, retention=None):
+        """Initialize the historical price backfill job.
+        
+        Args:
+            api: CryptoAPI used to fetch market charts.
+            db: Database the history is ingested into.
+            max_days: How far back to fetch for an asset with no history yet.
+            min_interval: Seconds since an asset's last backfilled point
+                before it is fetched again.
+            retention: Optional PriceRetention thinning the same history;
+                candles older than its cutoff are only added, never recomputed.
+        """
+        self.api = api
+        self.db = db
+        self.retention = retention
+        self.max_days = max_days
+        self.min_interval = min_interval
+        self.stop_requested = False
+        
+    def stop(self):
+        """Ask a running backfill to stop after the current asset."""
+        self.stop_requested = True
+        
+    def get_days_to_fetch(self, asset_id):
+        """Get how many days of history to fetch to resume from the last stored point.
+        
+        Returns:
+            0 if the asset was backfilled less than min_interval ago.
+        """
+        last_timestamp = self.db.get_last_price_timestamp(asset_id, source="backfill")
+        if not last_timestamp:
+            return self.max_days
+            
+        # SQLite CURRENT_TIMESTAMP values are UTC
+        last = datetime.fromisoformat(str(last_timestamp)).replace(tzinfo=timezone.utc)
+        age = (datetime.now(timezone.utc) - last).total_seconds()
+        if age < self.min_interval:
+            return 0
+            
+        # One extra day of overlap; duplicates are skipped on insert
+        return min(self.max_days, math.ceil(age / 86400) + 1)
+        
+    def backfill_asset(self, asset_id, coingecko_id, days=None):
+        """Fetch and store the price history of one asset.
+        
+        Returns:
+            An (inserted, error) tuple with the number of new price rows.
+        """
+        if days is None:
+            days = self.get_days_to_fetch(asset_id)
+        if days <= 0:
+            return 0, None
+            
+        points, error = self.api.get_market_chart(coingecko_id, days)
+        if error:
+            return 0, error
+            
+        inserted = self.db.ingest_price_history(asset_id, points)
+        if inserted:
+            # The history may reach back before the existing candles
+            since = min(timestamp for timestamp, _ in points)
+            cutoff = self.retention.get_cutoff() if self.retention else None
+            if cutoff and since < cutoff:
+                # Thinned buckets keep their candles; only missing ones are added
+                self.db.rollup_all_candles(asset_id, since=cutoff)
+                self.db.rollup_all_candles(asset_id, since=since, replace=False)
+            else:
+                self.db.rollup_all_candles(asset_id, since=since)
+        return inserted, None
+        
+    def run(self, asset_ids=None, progress=None):
+        """Backfill every asset with a CoinGecko ID, or only the given ones.
+        
+        The API rate limiter paces the requests, so this is meant to run on
+        a background thread.
+        
+        Args:
+            asset_ids: Optional list of asset ids to restrict the backfill to.
+            progress: Optional callable called with (done, total) after each asset.
+            
+        Returns:
+            The total number of price rows inserted.
+        """
+        self.stop_requested = False
+        assets = self.db.get_assets_with_coingecko_id()
+        if asset_ids is not None:
+            wanted = set(asset_ids)
+            assets = [asset for asset in assets if asset['id'] in wanted]
+            
+        total_inserted = 0
+        for done, asset in enumerate(assets, start=1):
+            if self.stop_requested:
+                break
+                
+            try:
+                inserted, error = self.backfill_asset(asset['id'], asset['coingecko_id'])
+            except Exception as e:
+                inserted, error = 0, str(e)
+                
+            if error:
+                print(f"Error backfilling {asset['coingecko_id']}: {error}")
+            total_inserted += inserted
+            
+            if progress:
+                progress(done, len(assets))
+                
+        print(f"Backfilled {total_inserted} historical prices for {len(assets)} assets")
+        return total_inserted
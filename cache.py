@@ -0,0 +1,197 @@
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+
+class PriceCache:
+    def __init__(self, api, db=None, async_api=None, ttl=60, stale_ttl=600, max_entries=2000):
+        """Initialize the price cache.
+        
+        Args:
+            api: CryptoAPI used to fetch prices on a miss.
+            db: Database the cache is backed by. Fetched prices are written
+                through to it, and load_from_db() warms the cache from it.
+            async_api: Optional AsyncCryptoAPI used to fetch misses concurrently.
+            ttl: Seconds a price is served as fresh.
+            stale_ttl: Seconds after ttl during which a stale price is still
+                served while it is refreshed in the background.
+            max_entries: Maximum number of coins kept; least recently used
+                entries are evicted first.
+        """
+        self.api = api
+        self.db = db
+        self.async_api = async_api
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.max_entries = max_entries
+        self.entries = OrderedDict()  # coingecko_id -> (price data, fetched at)
+        self.revalidating = set()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        
+    def put(self, coingecko_id, price_data, fetched_at=None):
+        """Store a price in the cache, evicting the least recently used entry if full."""
+        with self.lock:
+            self.entries[coingecko_id] = (price_data, fetched_at or time.time())
+            self.entries.move_to_end(coingecko_id)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+                
+    def invalidate(self, coingecko_ids=None):
+        """Drop the given coins from the cache, or every coin if None."""
+        with self.lock:
+            if coingecko_ids is None:
+                self.entries.clear()
+            else:
+                for coingecko_id in coingecko_ids:
+                    self.entries.pop(coingecko_id, None)
+                    
+    def load_from_db(self):
+        """Warm the cache with the last persisted quotes, keeping their original age.
+        
+        Returns:
+            The number of quotes loaded.
+        """
+        if self.db is None:
+            return 0
+            
+        loaded = 0
+        for quote in self.db.get_latest_quotes():
+            try:
+                # SQLite CURRENT_TIMESTAMP values are UTC
+                fetched_at = datetime.fromisoformat(str(quote['timestamp'])).replace(tzinfo=timezone.utc).timestamp()
+            except ValueError:
+                continue
+                
+            price_data = {
+                "price_usd": quote['price_usd'],
+                "market_cap": quote['market_cap'] or 0
+            }
+            self.put(quote['coingecko_id'], price_data, fetched_at)
+            loaded += 1
+            
+        return loaded
+        
+    def get_price(self, coingecko_id, allow_stale=True):
+        """Get the price of one coin; see get_prices."""
+        prices, error = self.get_prices([coingecko_id], allow_stale)
+        if coingecko_id in prices:
+            return prices[coingecko_id], None
+        return None, error or "Cryptocurrency not found in API response."
+        
+    def get_prices(self, coingecko_ids, allow_stale=True):
+        """Get prices for several coins, fetching only what the cache cannot serve.
+        
+        Fresh entries are returned as is. Stale entries are returned right
+        away and refreshed on a background thread, unless allow_stale is
+        False. Missing or expired entries are fetched before returning.
+        
+        Returns:
+            A (results, error) tuple like CryptoAPI.get_multiple_prices.
+        """
+        now = time.time()
+        results = {}
+        stale = []
+        missing = []
+        
+        with self.lock:
+            for coingecko_id in dict.fromkeys(coingecko_ids):
+                entry = self.entries.get(coingecko_id)
+                age = now - entry[1] if entry else None
+                
+                if entry and age < self.ttl:
+                    self.hits += 1
+                    results[coingecko_id] = entry[0]
+                    self.entries.move_to_end(coingecko_id)
+                elif entry and allow_stale and age < self.ttl + self.stale_ttl:
+                    self.stale_hits += 1
+                    results[coingecko_id] = entry[0]
+                    self.entries.move_to_end(coingecko_id)
+                    if coingecko_id not in self.revalidating:
+                        self.revalidating.add(coingecko_id)
+                        stale.append(coingecko_id)
+                else:
+                    self.misses += 1
+                    missing.append(coingecko_id)
+                    
+        if stale:
+            threading.Thread(target=self.revalidate, args=(stale,), name="PriceCacheRevalidate", daemon=True).start()
+            
+        error = None
+        if missing:
+            fetched, error = self.fetch(missing)
+            results.update(fetched)
+            
+        return results, error
+        
+    def revalidate(self, coingecko_ids):
+        """Refresh stale entries in the background."""
+        try:
+            _, error = self.fetch(coingecko_ids)
+            if error:
+                print(f"Error revalidating cached prices: {error}")
+        except Exception as e:
+            print(f"Error revalidating cached prices: {str(e)}")
+        finally:
+            with self.lock:
+                self.revalidating.difference_update(coingecko_ids)
+                
+    def fetch(self, coingecko_ids):
+        """Fetch prices from the API, then store them in the cache and database."""
+        if self.async_api:
+            prices, error = asyncio.run(self.async_api.get_multiple_prices_async(coingecko_ids))
+        else:
+            prices = {}
+            error = None
+            
+            # Split into batches to avoid too long URLs
+            batch_size = 50
+            for i in range(0, len(coingecko_ids), batch_size):
+                batch_prices, batch_error = self.api.get_multiple_prices(coingecko_ids[i:i + batch_size])
+                if batch_error:
+                    error = batch_error
+                prices.update(batch_prices or {})
+                
+        for coingecko_id, price_data in prices.items():
+            self.put(coingecko_id, price_data)
+            
+        if self.db is not None and prices:
+            self.persist(prices)
+            
+        return prices, error
+        
+    def persist(self, prices):
+        """Write fetched prices to the database in one transaction and roll them into candles.
+        
+        A price without a market cap leaves the asset's stored market cap as is,
+        and only the assets written are rolled up.
+        """
+        price_rows = []
+        for asset in self.db.get_assets_with_coingecko_id():
+            price_data = prices.get(asset['coingecko_id'])
+            if price_data:
+                price_rows.append((asset['id'], price_data['price_usd'], price_data.get('market_cap')))
+                
+        success = self.db.bulk_record_prices(price_rows, "api")
+        if success:
+            for asset_id, _, _ in price_rows:
+                self.db.rollup_all_candles(asset_id)
+        return success
+        
+    def stats(self):
+        """Get hit/miss statistics for the cache."""
+        with self.lock:
+            lookups = self.hits + self.stale_hits + self.misses
+            return {
+                "entries": len(self.entries),
+                "hits": self.hits,
+                "stale_hits": self.stale_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": (self.hits + self.stale_hits) / lookups if lookups else 0
+            }
@@ -0,0 +1,408 @@
+import contextlib
+import datetime
+import hashlib
+import math
+import threading
+import tkinter as tk
+from concurrent.futures import ThreadPoolExecutor
+from PIL import Image, ImageTk
+
+# matplotlib takes most of a second to import, so it is only imported when a
+# figure is first created; for ChartManager that is on the render thread,
+# after the screen showing the chart is already up.
+
+def new_figure(width, height):
+    """Create an offscreen figure of the given size in pixels."""
+    from matplotlib.figure import Figure
+    return Figure(figsize=(width/100, height/100), dpi=100)
+
+def chart_colors(count):
+    """Get count colors of the categorical palette used by the charts."""
+    from matplotlib import colormaps
+    return colormaps['tab20'].colors[:count]
+
+def get_holding_fields(holding):
+    """Get the asset_id, amount and symbol of a holding dict or Holding object."""
+    if isinstance(holding, dict):
+        return holding['asset_id'], holding['amount'], holding['symbol']
+    return holding.asset_id, holding.amount, holding.symbol
+
+def pie_chart_data(holdings, current_prices):
+    """Get the values and labels of the assets making up more than 1% of the portfolio."""
+    rows = []
+    for holding in holdings:
+        asset_id, amount, symbol = get_holding_fields(holding)
+        rows.append((amount * current_prices.get(asset_id, 0), symbol))
+        
+    total_value = sum(value for value, _ in rows)
+    data = []
+    labels = []
+    for value, symbol in rows:
+        percentage = (value / total_value) * 100 if total_value > 0 else 0
+        if percentage > 1:  # Only show assets with more than 1% in the pie chart
+            data.append(value)
+            labels.append(f"{symbol} ({percentage:.1f}%)")
+    return data, labels
+
+def draw_pie_chart(fig, chart_data):
+    """Draw a portfolio distribution pie chart into an empty figure; returns its artists."""
+    data, labels = chart_data
+    ax = fig.add_subplot(111)
+    wedges, texts, autotexts = ax.pie(
+        data, 
+        labels=labels, 
+        autopct='%1.1f%%',
+        startangle=90,
+        colors=chart_colors(len(data))
+    )
+    
+    # Format
+    ax.set_title('Portfolio Distribution', fontsize=14)
+    return {"wedges": wedges, "texts": texts, "autotexts": autotexts}
+
+def update_pie_chart(fig, artists, chart_data):
+    """Move the wedges and labels of a drawn pie chart to new data.
+    
+    Returns:
+        False if the number of wedges changed and the chart must be redrawn.
+    """
+    data, labels = chart_data
+    if len(data) != len(artists['wedges']):
+        return False
+        
+    total = sum(data)
+    angle = 90  # startangle of draw_pie_chart()
+    for wedge, text, autotext, value, label in zip(artists['wedges'], artists['texts'], artists['autotexts'], data, labels):
+        sweep = 360 * value / total if total else 0
+        wedge.set_theta1(angle)
+        wedge.set_theta2(angle + sweep)
+        
+        # Same placement as Axes.pie: labels at 1.1 radii, percentages at 0.6
+        middle = math.radians(angle + sweep / 2)
+        x, y = math.cos(middle), math.sin(middle)
+        text.set_position((1.1 * x, 1.1 * y))
+        text.set_horizontalalignment('left' if x > 0 else 'right')
+        text.set_text(label)
+        autotext.set_position((0.6 * x, 0.6 * y))
+        autotext.set_text(f"{sweep / 3.6:.1f}%")
+        angle += sweep
+    return True
+
+def bar_chart_data(holdings, current_prices, limit=15):
+    """Get the symbols and values of the most valuable holdings, highest first."""
+    rows = []
+    for holding in holdings:
+        asset_id, amount, symbol = get_holding_fields(holding)
+        rows.append((amount * current_prices.get(asset_id, 0), symbol))
+        
+    # Sort holdings by value (descending); a stable sort keeps ties in order
+    rows.sort(key=lambda row: row[0], reverse=True)
+    return [symbol for _, symbol in rows[:limit]], [value for value, _ in rows[:limit]]
+
+def draw_bar_chart(fig, chart_data):
+    """Draw a top asset values bar chart into an empty figure; returns its artists."""
+    symbols, values = chart_data
+    ax = fig.add_subplot(111)
+    bars = ax.bar(symbols, values, color=chart_colors(len(symbols)))
+    
+    # Add value labels on top of bars
+    labels = []
+    for bar in bars:
+        height = bar.get_height()
+        labels.append(ax.text(
+            bar.get_x() + bar.get_width()/2.,
+            height,
+            f"${height:.0f}",
+            ha='center',
+            va='bottom',
+            rotation=45,
+            fontsize=8
+        ))
+    
+    # Format
+    ax.set_title('Top Asset Values (USD)', fontsize=14)
+    ax.set_xlabel('Assets')
+    ax.set_ylabel('Value (USD)')
+    ax.tick_params(axis='x', rotation=45)
+    return {"ax": ax, "bars": bars, "labels": labels, "symbols": list(symbols)}
+
+def update_bar_chart(fig, artists, chart_data):
+    """Resize the bars of a drawn bar chart to new values.
+    
+    Returns:
+        False if the assets shown changed and the chart must be redrawn.
+    """
+    symbols, values = chart_data
+    if list(symbols) != artists['symbols']:
+        return False
+        
+    for bar, label, value in zip(artists['bars'], artists['labels'], values):
+        bar.set_height(value)
+        label.set_y(value)
+        label.set_text(f"${value:.0f}")
+        
+    ax = artists['ax']
+    ax.relim()
+    ax.autoscale_view()
+    return True
+
+def value_history_data(candles, amounts):
+    """Sum candle closes into portfolio values over time.
+    
+    Args:
+        candles: Dict of asset_id -> list of candle dicts, as returned by
+            Database.get_candles.
+        amounts: Dict of asset_id -> amount held.
+        
+    Returns:
+        A (dates, values) tuple of lists; both empty if there are no candles.
+    """
+    buckets = sorted({candle['bucket_start'] for series in candles.values() for candle in series})
+    
+    # Carry each asset's last close forward over buckets it has no candle for
+    values = [0] * len(buckets)
+    positions = {bucket: i for i, bucket in enumerate(buckets)}
+    for asset_id, series in candles.items():
+        amount = amounts.get(asset_id, 0)
+        closes = [None] * len(buckets)
+        for candle in series:
+            closes[positions[candle['bucket_start']]] = candle['close']
+            
+        last_close = None
+        for i, close in enumerate(closes):
+            if close is not None:
+                last_close = close
+            if last_close is not None:
+                values[i] += amount * last_close
+                
+    return [datetime.datetime.fromisoformat(bucket) for bucket in buckets], values
+
+def draw_value_history_chart(fig, chart_data):
+    """Draw a portfolio value line chart into an empty figure; returns its artists."""
+    dates, values = chart_data
+    ax = fig.add_subplot(111)
+    
+    line, = ax.plot(dates, values, color='#3498db', linewidth=2)
+    fill = ax.fill_between(dates, values, color='#3498db', alpha=0.15)
+    
+    # Format
+    ax.set_title('Portfolio Value (USD)', fontsize=14)
+    ax.set_ylabel('Value (USD)')
+    ax.grid(True, linestyle='--', alpha=0.3)
+    fig.autofmt_xdate()
+    return {"ax": ax, "line": line, "fill": fill}
+
+def update_value_history_chart(fig, artists, chart_data):
+    """Replace the data of a drawn value history chart; always succeeds."""
+    dates, values = chart_data
+    ax = artists['ax']
+    artists['line'].set_data(dates, values)
+    
+    # A filled area cannot be reshaped, so only it is rebuilt
+    artists['fill'].remove()
+    artists['fill'] = ax.fill_between(dates, values, color='#3498db', alpha=0.15)
+    
+    ax.relim()
+    ax.autoscale_view()
+    return True
+
+class ChartRenderer:
+    def __init__(self, workers=1):
+        """Initialize the offscreen chart renderer.
+        
+        Figures are drawn with the Agg backend on worker threads and handed
+        back as PIL images, so the Tk thread only has to display them.
+        
+        Args:
+            workers: Number of render threads. Each chart slot renders one
+                job at a time whatever the number; styled charts change
+                matplotlib's global rcParams while drawing, so screens
+                using them should share a single-threaded renderer.
+        """
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="chart-render")
+        
+    def submit(self, function, *args):
+        """Run a render job on a worker thread; returns its Future."""
+        return self.executor.submit(function, *args)
+        
+    def shutdown(self):
+        """Stop the render threads once queued jobs have finished."""
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        
+class ChartManager:
+    def __init__(self, renderer=None, poll_interval=30, background="#2b2b2b"):
+        """Initialize the manager of a screen's charts.
+        
+        Each chart slot keeps one offscreen Figure for its lifetime. New data
+        updates the drawn artists in place, or redraws the figure if they
+        cannot be updated, on a ChartRenderer worker thread; the finished
+        image is then shown in a label. Data identical to what is shown is
+        not drawn at all.
+        
+        Args:
+            renderer: ChartRenderer shared between screens; a private one
+                is created if not given.
+            poll_interval: Milliseconds between checks for finished renders.
+            background: Color behind a chart until its first image arrives.
+        """
+        self.renderer = renderer or ChartRenderer()
+        self.poll_interval = poll_interval
+        self.background = background
+        self.slots = {}  # name -> slot state, see get_slot()
+        
+    def data_hash(self, chart_data):
+        """Get a fingerprint of chart data made of lists of numbers, strings and dates."""
+        return hashlib.md5(repr(chart_data).encode('utf-8')).hexdigest()
+        
+    def get_slot(self, name, master, width, height):
+        """Get a chart slot, creating its figure and label on first use."""
+        slot = self.slots.get(name)
+        if slot is None:
+            label = tk.Label(master, borderwidth=0, highlightthickness=0, bg=self.background)
+            slot = {
+                "figure": None,  # created by the first render_job()
+                "canvas": None,
+                "label": label,
+                "photo": None,
+                "artists": None,
+                "style": None,
+                "hash": None,
+                "size": (width, height),
+                "requested_size": None,
+                "resize_job": None,
+                "generation": 0,
+                "lock": threading.Lock(),
+                "last_show": None
+            }
+            self.slots[name] = slot
+            label.bind("<Configure>", lambda event: self.on_resize(name, event))
+        return slot
+        
+    def render_job(self, slot, chart_data, draw, update, size, style):
+        """Update or redraw a slot's figure and render it; runs on a render thread.
+        
+        Returns:
+            The rendered chart as a PIL image.
+        """
+        # A style applies to artists as they are created and drawn, so both
+        # happen inside it; it is restored before the next job
+        style_context = contextlib.nullcontext()
+        if style:
+            import matplotlib.style
+            style_context = matplotlib.style.context(style)
+            
+        with slot['lock'], style_context:
+            if slot['figure'] is None:
+                from matplotlib.backends.backend_agg import FigureCanvasAgg
+                slot['figure'] = new_figure(*slot['size'])
+                slot['canvas'] = FigureCanvasAgg(slot['figure'])
+                
+            fig = slot['figure']
+            resized = size != slot['size']
+            if resized:
+                fig.set_size_inches(size[0] / fig.dpi, size[1] / fig.dpi)
+                slot['size'] = size
+            
+            if (
+                slot['artists'] is None or update is None or style != slot['style']
+                or not update(fig, slot['artists'], chart_data)
+            ):
+                fig.clear()
+                slot['artists'] = draw(fig, chart_data)
+                slot['style'] = style
+                fig.tight_layout()
+            elif resized:
+                fig.tight_layout()
+            slot['canvas'].draw()
+                
+            width, height = slot['canvas'].get_width_height()
+            return Image.frombytes("RGBA", (width, height), bytes(slot['canvas'].buffer_rgba()))
+            
+    def show(self, name, master, chart_data, draw, update=None, width=800, height=500, style=None):
+        """Show chart data in a slot, rendering it off the Tk thread.
+        
+        Args:
+            name: Slot name, unique within this manager.
+            master: Widget the chart label is packed into.
+            chart_data: Data passed to draw and update; read on a render
+                thread, so it must not be changed afterwards.
+            draw: Callable (figure, chart_data) -> artists that draws the
+                chart into an empty figure.
+            update: Optional callable (figure, artists, chart_data) -> bool
+                that updates the artists in place, returning False if it
+                cannot and the chart must be redrawn.
+            width: Figure width in pixels until the label has been laid out.
+            height: Figure height in pixels until the label has been laid out.
+            style: Optional matplotlib style the chart is drawn in.
+            
+        Returns:
+            The chart label, already packed.
+        """
+        slot = self.get_slot(name, master, width, height)
+        if not slot['label'].winfo_manager():
+            slot['label'].pack(fill="both", expand=True)
+            
+        # Fill the space the label was given once laid out, like an embedded
+        # canvas; the label's own size keeps the image from growing its master
+        label = slot['label']
+        if label.winfo_width() > 1 and label.winfo_height() > 1:
+            width, height = label.winfo_width(), label.winfo_height()
+        size = (width, height)
+        slot['requested_size'] = size
+        
+        data_hash = self.data_hash((chart_data, size, style))
+        slot['last_show'] = (master, chart_data, draw, update, style)
+        if data_hash == slot['hash']:
+            return slot['label']
+        slot['hash'] = data_hash
+        
+        slot['generation'] += 1
+        generation = slot['generation']
+        future = self.renderer.submit(self.render_job, slot, chart_data, draw, update, size, style)
+        
+        def check_finished():
+            if not slot['label'].winfo_exists():
+                return
+            if not future.done():
+                slot['label'].after(self.poll_interval, check_finished)
+                return
+            # A newer render was requested meanwhile; only show the latest
+            if generation != slot['generation']:
+                return
+                
+            try:
+                image = future.result()
+            except Exception as e:
+                print(f"Error rendering chart {name}: {str(e)}")
+                slot['hash'] = None
+                return
+                
+            slot['photo'] = ImageTk.PhotoImage(image)
+            slot['label'].configure(image=slot['photo'])
+            
+        slot['label'].after(self.poll_interval, check_finished)
+        return slot['label']
+        
+    def on_resize(self, name, event):
+        """Re-render a shown chart at its label's new size, once resizing settles."""
+        slot = self.slots.get(name)
+        if slot is None or not slot['label'].winfo_manager() or slot['last_show'] is None:
+            return
+        if (event.width, event.height) == slot['requested_size']:
+            return
+            
+        if slot['resize_job']:
+            slot['label'].after_cancel(slot['resize_job'])
+            
+        def resize():
+            slot['resize_job'] = None
+            master, chart_data, draw, update, style = slot['last_show']
+            self.show(name, master, chart_data, draw, update, style=style)
+            
+        slot['resize_job'] = slot['label'].after(150, resize)
+        
+    def hide(self, name):
+        """Unpack a slot's chart, keeping it for the next show()."""
+        slot = self.slots.get(name)
+        if slot is not None:
+            slot['label'].pack_forget()
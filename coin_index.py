@@ -0,0 +1,230 @@
+import re
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter, OrderedDict
+from datetime import datetime, timezone
+
+def tokenize(text):
+    """Split a symbol or name into lowercase words."""
+    return re.findall(r"[a-z0-9]+", text.lower())
+
+def trigrams(text):
+    """Get the set of character trigrams of a padded string."""
+    padded = f" {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+class CoinIndex:
+    def __init__(self, api, db, max_age=7 * 24 * 3600, search_cache_size=256, search_cache_ttl=3600):
+        """Initialize the local CoinGecko coin-list index.
+        
+        Args:
+            api: CryptoAPI used to download the coin list and for remote searches.
+            db: Database the coin list is persisted in.
+            max_age: Seconds after which the stored coin list is refreshed.
+            search_cache_size: Number of remote search results kept.
+            search_cache_ttl: Seconds a remote search result is reused.
+        """
+        self.api = api
+        self.db = db
+        self.max_age = max_age
+        self.search_cache_size = search_cache_size
+        self.search_cache_ttl = search_cache_ttl
+        self.search_cache = OrderedDict()  # query -> (results, fetched at)
+        self.lock = threading.Lock()
+        self.build([])
+        
+    def build(self, coins):
+        """Build the in-memory search structures from a list of coin dicts."""
+        coins = [{"id": coin['id'], "symbol": coin['symbol'], "name": coin['name']} for coin in coins]
+        
+        # Sorted (key, position) pairs answer prefix queries with a binary search
+        symbol_keys = sorted((coin['symbol'].lower(), i) for i, coin in enumerate(coins))
+        name_keys = sorted((coin['name'].lower(), i) for i, coin in enumerate(coins))
+        
+        # Fuzzy matching works on the vocabulary of distinct words, which is far
+        # smaller than the coin list: word -> coin positions, shortest names first
+        word_coins = {}
+        for i, coin in enumerate(coins):
+            for word in set(tokenize(coin['symbol']) + tokenize(coin['name'])):
+                word_coins.setdefault(word, []).append(i)
+        for positions in word_coins.values():
+            positions.sort(key=lambda i: len(coins[i]['name']))
+            
+        words = list(word_coins)
+        word_sizes = []
+        postings = {}
+        for w, word in enumerate(words):
+            word_trigrams = trigrams(word)
+            word_sizes.append(len(word_trigrams))
+            for trigram in word_trigrams:
+                postings.setdefault(trigram, []).append(w)
+                
+        # Swap in all structures at once so concurrent searches see a consistent index
+        self.index = (coins, symbol_keys, name_keys, word_coins, words, word_sizes, postings)
+        
+    def __len__(self):
+        """Get the number of indexed coins."""
+        return len(self.index[0])
+        
+    def load(self):
+        """Load the coin list persisted in the database.
+        
+        Returns:
+            The number of coins loaded.
+        """
+        self.build(self.db.get_coin_list())
+        return len(self)
+        
+    def is_stale(self):
+        """Check if the stored coin list is missing or older than max_age."""
+        updated_at = self.db.get_coin_list_updated_at()
+        if not updated_at:
+            return True
+            
+        # SQLite CURRENT_TIMESTAMP values are UTC
+        updated = datetime.fromisoformat(str(updated_at)).replace(tzinfo=timezone.utc)
+        return (datetime.now(timezone.utc) - updated).total_seconds() > self.max_age
+        
+    def refresh(self):
+        """Download the full coin list, persist it and rebuild the index.
+        
+        Returns:
+            A (count, error) tuple with the number of coins indexed.
+        """
+        coins, error = self.api.get_coin_list()
+        if error:
+            return 0, error
+            
+        coins = [coin for coin in coins if coin.get('id') and coin.get('symbol') and coin.get('name')]
+        self.db.replace_coin_list([(coin['id'], coin['symbol'], coin['name']) for coin in coins])
+        self.build(coins)
+        return len(coins), None
+        
+    def refresh_if_stale(self):
+        """Load the stored coin list, downloading a new one first if it is stale."""
+        if self.is_stale():
+            count, error = self.refresh()
+            if error:
+                print(f"Error refreshing coin list: {error}")
+                self.load()
+        else:
+            self.load()
+            
+    def prefix_matches(self, keys, query, limit):
+        """Get positions of keys starting with query, shortest keys first."""
+        start = bisect_left(keys, (query, -1))
+        matches = []
+        for key, i in keys[start:start + limit * 5]:
+            if not key.startswith(query):
+                break
+            matches.append((len(key), i))
+        return [i for _, i in sorted(matches)[:limit]]
+        
+    def similar_words(self, token, cutoff=0.3, max_words=5):
+        """Get (score, word) pairs for vocabulary words similar to token, best first."""
+        _, _, _, _, words, word_sizes, postings = self.index
+        
+        token_trigrams = trigrams(token)
+        counts = Counter()
+        for trigram in token_trigrams:
+            counts.update(postings.get(trigram, ()))
+            
+        # Jaccard similarity of the trigram sets
+        scored = []
+        for w, shared in counts.items():
+            score = shared / (len(token_trigrams) + word_sizes[w] - shared)
+            if score >= cutoff:
+                scored.append((score, words[w]))
+                
+        scored.sort(reverse=True)
+        return scored[:max_words]
+        
+    def fuzzy_matches(self, query, limit):
+        """Get positions of coins whose words are similar to every word of query."""
+        word_coins = self.index[3]
+        
+        scores = None
+        for token in tokenize(query):
+            token_scores = {}
+            for score, word in self.similar_words(token):
+                for i in word_coins[word]:
+                    if score > token_scores.get(i, 0):
+                        token_scores[i] = score
+                        
+            if scores is None:
+                scores = token_scores
+            else:
+                # Every query word has to match; scores add up across words
+                scores = {i: scores[i] + score for i, score in token_scores.items() if i in scores}
+                
+            if not scores:
+                return []
+                
+        if not scores:
+            return []
+            
+        # word_coins lists shorter names first and dicts keep insertion order,
+        # so equal scores keep preferring the shorter name
+        return sorted(scores, key=scores.get, reverse=True)[:limit]
+        
+    def search(self, query, limit=10, fuzzy=True):
+        """Search the local index by symbol and name.
+        
+        Exact symbol matches rank first, then symbol prefixes, then name
+        prefixes. If nothing matches a prefix and fuzzy is set, coins with
+        similar symbols or names are returned instead.
+        
+        Returns:
+            A list of dicts with id, symbol and name.
+        """
+        query = query.strip().lower()
+        if not query:
+            return []
+            
+        coins, symbol_keys, name_keys = self.index[:3]
+        
+        positions = []
+        positions.extend(self.prefix_matches(symbol_keys, query, limit))
+        positions.extend(self.prefix_matches(name_keys, query, limit))
+        if fuzzy and not positions:
+            positions.extend(self.fuzzy_matches(query, limit))
+            
+        # Keep the first occurrence of each coin; exact symbol matches go first
+        positions = list(dict.fromkeys(positions))
+        positions.sort(key=lambda i: coins[i]['symbol'].lower() != query)
+        return [coins[i] for i in positions[:limit]]
+        
+    def lookup(self, query, limit=10):
+        """Search locally, falling back to the remote search endpoint on a miss.
+        
+        Returns:
+            A (results, error) tuple; results are dicts with id, symbol and name.
+        """
+        results = self.search(query, limit)
+        if results:
+            return results, None
+            
+        key = query.strip().lower()
+        if not key:
+            return [], None
+            
+        with self.lock:
+            cached = self.search_cache.get(key)
+            if cached and time.time() - cached[1] < self.search_cache_ttl:
+                self.search_cache.move_to_end(key)
+                return cached[0], None
+                
+        coins, error = self.api.search_cryptocurrency(query)
+        if error:
+            return [], error
+            
+        results = [{"id": coin['id'], "symbol": coin['symbol'], "name": coin['name']} for coin in coins[:limit]]
+        
+        with self.lock:
+            self.search_cache[key] = (results, time.time())
+            self.search_cache.move_to_end(key)
+            while len(self.search_cache) > self.search_cache_size:
+                self.search_cache.popitem(last=False)
+                
+        return results, None
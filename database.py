@@ -1,29 +1,219 @@
 import sqlite3
 import os
 import json
+import queue
+import threading
+from contextlib import contextmanager
 from datetime import datetime
 
+from models import PriceSeries, TransactionLog
+
+# Connection tuning applied to every connection. WAL lets the reader pool
+# query while the writer commits; synchronous=NORMAL is durable under WAL
+# except for the last transactions before a power loss.
+DEFAULT_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "cache_size": -16000,  # Negative values are KiB, i.e. 16 MB
+    "mmap_size": 268435456,  # 256 MB
+    "temp_store": "MEMORY",
+    "busy_timeout": 5000,  # Milliseconds to wait on a locked database
+}
+
+# Pragmas that are per database file rather than per connection
+WRITER_ONLY_PRAGMAS = ("journal_mode", "synchronous")
+
+# Candle intervals rolled up from raw prices, finest first, in seconds
+CANDLE_INTERVALS = {
+    "1m": 60,
+    "1h": 3600,
+    "1d": 86400,
+}
+
+# Tables a user's data can be exported from, see Database.iter_export_rows()
+EXPORT_TABLES = ("holdings", "transactions", "prices")
+
+def choose_candle_interval(start, end, max_points=500):
+    """Pick the finest candle interval that covers start..end in at most max_points candles.
+    
+    Wider ranges get coarser candles, so a chart never reads more than about
+    max_points rows per asset however much history is stored.
+    """
+    span = (end - start).total_seconds()
+    for interval, seconds in CANDLE_INTERVALS.items():
+        if span / seconds <= max_points:
+            return interval
+    return list(CANDLE_INTERVALS)[-1]
+
+def apply_pragmas(connection, pragmas):
+    """Apply a dict of PRAGMA settings to a connection."""
+    for name, value in pragmas.items():
+        # PRAGMA does not accept bound parameters
+        connection.execute(f"PRAGMA {name} = {value}")
+
+class ConnectionPool:
+    """A thread-safe pool of read-only SQLite connections."""
+    
+    def __init__(self, db_path, size=4, pragmas=None):
+        """Initialize the pool; connections are opened lazily up to size."""
+        self.db_path = db_path
+        self.size = size
+        self.pragmas = pragmas or {}
+        self.idle = queue.LifoQueue()
+        self.created = 0
+        self.lock = threading.Lock()
+        self.closed = False
+        
+    def create_connection(self):
+        """Open a new read-only connection."""
+        connection = sqlite3.connect(self.db_path, check_same_thread=False)
+        connection.row_factory = sqlite3.Row
+        apply_pragmas(connection, self.pragmas)
+        connection.execute("PRAGMA query_only = ON")
+        return connection
+        
+    def acquire(self):
+        """Take an idle connection, opening one if the pool is not full yet."""
+        try:
+            return self.idle.get_nowait()
+        except queue.Empty:
+            pass
+            
+        with self.lock:
+            if self.created < self.size:
+                self.created += 1
+                try:
+                    return self.create_connection()
+                except Exception:
+                    self.created -= 1
+                    raise
+                    
+        # Pool exhausted, wait for another thread to release a connection
+        return self.idle.get()
+        
+    def release(self, connection):
+        """Return a connection to the pool."""
+        if self.closed:
+            connection.close()
+        else:
+            self.idle.put(connection)
+            
+    @contextmanager
+    def connection(self):
+        """Borrow a connection for the duration of a with block."""
+        connection = self.acquire()
+        try:
+            yield connection
+        finally:
+            self.release(connection)
+            
+    def close(self):
+        """Close all idle connections; busy ones are closed on release."""
+        self.closed = True
+        while True:
+            try:
+                self.idle.get_nowait().close()
+            except queue.Empty:
+                break
+
 class Database:
-    def __init__(self, db_path="cryptojandie.db"):
-        """Initialize database connection and create tables if they don't exist."""
+    def __init__(self, db_path="cryptojandie.db", pragmas=None, read_pool_size=4):
+        """Initialize database connection and create tables if they don't exist.
+        
+        Args:
+            db_path: Path to the SQLite database file.
+            pragmas: PRAGMA overrides merged over DEFAULT_PRAGMAS.
+            read_pool_size: Number of pooled reader connections. Reads share
+                the writer connection when this is 0 or the database is
+                in-memory.
+        """
         self.db_path = db_path
+        self.pragmas = dict(DEFAULT_PRAGMAS, **(pragmas or {}))
+        self.read_pool_size = read_pool_size
         self.connection = None
         self.cursor = None
+        self.pool = None
+        # Serializes all use of the writer connection across threads
+        self.write_lock = threading.RLock()
+        self.batch_depth = 0
+        self.batch_owner = None
         self.connect()
         self.create_tables()
-        self.migrate_users_table()
+        self.migrate()
         
     def connect(self):
-        """Establish connection to the SQLite database."""
-        self.connection = sqlite3.connect(self.db_path)
+        """Establish the writer connection and the reader pool."""
+        self.connection = sqlite3.connect(self.db_path, check_same_thread=False)
         self.connection.row_factory = sqlite3.Row  # Return rows as dictionaries
+        apply_pragmas(self.connection, self.pragmas)
         self.cursor = self.connection.cursor()
         
+        if self.read_pool_size > 0 and self.db_path != ":memory:":
+            reader_pragmas = {
+                name: value for name, value in self.pragmas.items()
+                if name not in WRITER_ONLY_PRAGMAS
+            }
+            self.pool = ConnectionPool(self.db_path, self.read_pool_size, reader_pragmas)
+            
     def close(self):
         """Close the database connection."""
+        if self.pool:
+            self.pool.close()
         if self.connection:
-            self.connection.close()
+            with self.write_lock:
+                self.connection.close()
+                
+    @contextmanager
+    def reader(self):
+        """Yield a cursor for read-only queries.
+        
+        Reads go to the reader pool so they do not wait for the writer. A
+        thread inside batch() reads through the writer instead, so it sees
+        its own uncommitted writes.
+        """
+        if self.pool is None or self.batch_owner == threading.get_ident():
+            with self.write_lock:
+                yield self.connection.cursor()
+        else:
+            with self.pool.connection() as connection:
+                yield connection.cursor()
+                
+    def _commit(self):
+        """Commit the current transaction unless a batch() is open."""
+        if self.batch_depth == 0:
+            self.connection.commit()
             
+    @contextmanager
+    def batch(self):
+        """Defer commits so a sequence of writes lands in one transaction.
+        
+        Usage:
+            with db.batch():
+                db.add_price(asset_id, price, "api")
+                db.update_asset_market_cap(asset_id, market_cap)
+        
+        Batches may be nested; only the outermost one commits. If an
+        exception escapes the outermost batch, every write in it is rolled back.
+        The write lock is held for the whole batch, so writes from other
+        threads wait until it finishes.
+        """
+        with self.write_lock:
+            self.batch_depth += 1
+            self.batch_owner = threading.get_ident()
+            try:
+                yield self
+            except Exception:
+                self.batch_depth -= 1
+                if self.batch_depth == 0:
+                    self.batch_owner = None
+                    self.connection.rollback()
+                raise
+            else:
+                self.batch_depth -= 1
+                if self.batch_depth == 0:
+                    self.batch_owner = None
+                    self.connection.commit()
+                    
     def create_tables(self):
         """Create necessary tables if they don't exist."""
         # Users table
@@ -94,14 +284,169 @@ class Database:
         
         self.connection.commit()
         
-    def migrate_users_table(self):
-        """Migrate users table to add password column if missing."""
+    def get_migrations(self):
+        """Return the ordered list of schema migrations.
+        
+        Each migration is applied once; its 1-based position in this list is
+        the schema version stored in PRAGMA user_version after it runs. New
+        migrations must only ever be appended.
+        """
+        return [
+            self.migrate_add_user_password,
+            self.migrate_add_indexes,
+            self.migrate_add_latest_prices,
+            self.migrate_add_coins,
+            self.migrate_unique_price_timestamps,
+            self.migrate_add_candles,
+            self.migrate_add_transaction_source_hash,
+        ]
+        
+    def get_schema_version(self):
+        """Get the schema version recorded in the database file."""
+        self.cursor.execute("PRAGMA user_version")
+        return self.cursor.fetchone()[0]
+        
+    def migrate(self):
+        """Apply any pending schema migrations in order."""
+        current_version = self.get_schema_version()
+        
+        for version, migration in enumerate(self.get_migrations(), start=1):
+            if version <= current_version:
+                continue
+                
+            try:
+                self.cursor.execute("BEGIN")
+                migration()
+                # PRAGMA does not accept bound parameters
+                self.cursor.execute(f"PRAGMA user_version = {int(version)}")
+                self.connection.commit()
+            except Exception as e:
+                self.connection.rollback()
+                print(f"Error applying schema migration {version} ({migration.__name__}): {str(e)}")
+                raise
+                
+    def migrate_add_user_password(self):
+        """Migration 1: add the password column to users if missing."""
         self.cursor.execute("PRAGMA table_info(users)")
         columns = self.cursor.fetchall()
         column_names = [col['name'] for col in columns]
         if 'password' not in column_names:
             self.cursor.execute("ALTER TABLE users ADD COLUMN password TEXT DEFAULT 'password123'")
-            self.connection.commit()
+            
+    def migrate_add_indexes(self):
+        """Migration 2: index the per-user and per-asset lookup paths."""
+        # Latest-price lookups seek to the newest row for an asset
+        self.cursor.execute(
+            "CREATE INDEX IF NOT EXISTS idx_prices_asset_timestamp "
+            "ON prices (asset_id, timestamp DESC, id DESC)"
+        )
+        self.cursor.execute(
+            "CREATE INDEX IF NOT EXISTS idx_transactions_user_timestamp "
+            "ON transactions (user_id, timestamp)"
+        )
+        self.cursor.execute(
+            "CREATE INDEX IF NOT EXISTS idx_holdings_user_asset "
+            "ON holdings (user_id, asset_id)"
+        )
+        
+    def migrate_add_latest_prices(self):
+        """Migration 3: keep the current price of every asset in latest_prices."""
+        self.cursor.execute('''
+        CREATE TABLE IF NOT EXISTS latest_prices (
+            asset_id INTEGER PRIMARY KEY,
+            price_usd REAL NOT NULL,
+            timestamp TIMESTAMP NOT NULL,
+            source TEXT NOT NULL,
+            FOREIGN KEY (asset_id) REFERENCES assets (id)
+        )
+        ''')
+        
+        # Every insert into prices upserts latest_prices, so any write path
+        # keeps it current. Older rows (e.g. backfilled history) never
+        # replace a newer quote.
+        self.cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_prices_update_latest
+        AFTER INSERT ON prices
+        BEGIN
+            INSERT INTO latest_prices (asset_id, price_usd, timestamp, source)
+            VALUES (NEW.asset_id, NEW.price_usd, NEW.timestamp, NEW.source)
+            ON CONFLICT (asset_id) DO UPDATE SET
+                price_usd = excluded.price_usd,
+                timestamp = excluded.timestamp,
+                source = excluded.source
+            WHERE excluded.timestamp >= latest_prices.timestamp;
+        END
+        ''')
+        
+        # Seed from the existing price history
+        self.cursor.execute("""
+            INSERT OR REPLACE INTO latest_prices (asset_id, price_usd, timestamp, source)
+            SELECT p.asset_id, p.price_usd, p.timestamp, p.source
+            FROM prices p
+            WHERE p.id IN (
+                SELECT (
+                    SELECT id FROM prices
+                    WHERE asset_id = a.asset_id
+                    ORDER BY timestamp DESC, id DESC
+                    LIMIT 1
+                )
+                FROM (SELECT DISTINCT asset_id FROM prices) a
+            )
+        """)
+        
+    def migrate_add_coins(self):
+        """Migration 4: store the CoinGecko coin list for local search."""
+        self.cursor.execute('''
+        CREATE TABLE IF NOT EXISTS coins (
+            id TEXT PRIMARY KEY,
+            symbol TEXT NOT NULL,
+            name TEXT NOT NULL,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        ''')
+        
+    def migrate_unique_price_timestamps(self):
+        """Migration 5: allow at most one price per asset and timestamp."""
+        # Keep the newest row of any existing duplicates
+        self.cursor.execute("""
+            DELETE FROM prices
+            WHERE id NOT IN (SELECT MAX(id) FROM prices GROUP BY asset_id, timestamp)
+        """)
+        # The unique index also serves every lookup the old one did
+        self.cursor.execute("DROP INDEX IF EXISTS idx_prices_asset_timestamp")
+        self.cursor.execute(
+            "CREATE UNIQUE INDEX IF NOT EXISTS idx_prices_asset_timestamp_unique "
+            "ON prices (asset_id, timestamp)"
+        )
+        
+    def migrate_add_candles(self):
+        """Migration 6: add the OHLC candles rolled up from raw prices."""
+        self.cursor.execute('''
+        CREATE TABLE IF NOT EXISTS candles (
+            asset_id INTEGER NOT NULL,
+            interval TEXT NOT NULL,
+            bucket_start TIMESTAMP NOT NULL,
+            open REAL NOT NULL,
+            high REAL NOT NULL,
+            low REAL NOT NULL,
+            close REAL NOT NULL,
+            volume REAL,
+            samples INTEGER NOT NULL,
+            PRIMARY KEY (asset_id, interval, bucket_start),
+            FOREIGN KEY (asset_id) REFERENCES assets (id)
+        ) WITHOUT ROWID
+        ''')
+        
+    def migrate_add_transaction_source_hash(self):
+        """Migration 7: add the hash of the exchange export row a transaction was imported from."""
+        self.cursor.execute("PRAGMA table_info(transactions)")
+        column_names = [col['name'] for col in self.cursor.fetchall()]
+        if 'source_hash' not in column_names:
+            self.cursor.execute("ALTER TABLE transactions ADD COLUMN source_hash TEXT")
+        self.cursor.execute(
+            "CREATE UNIQUE INDEX IF NOT EXISTS idx_transactions_source_hash "
+            "ON transactions(user_id, source_hash) WHERE source_hash IS NOT NULL"
+        )
         
     def initialize_default_assets(self):
         """Initialize the database with default cryptocurrency assets."""
@@ -160,108 +505,205 @@ class Database:
             ("IRIS", "IRISnet", "iris-network")
         ]
         
-        for symbol, name, coingecko_id in default_assets:
-            self.cursor.execute(
-                "INSERT OR IGNORE INTO assets (symbol, name, coingecko_id) VALUES (?, ?, ?)",
-                (symbol, name, coingecko_id)
-            )
-        
-        self.connection.commit()
-        
+        with self.write_lock:
+            for symbol, name, coingecko_id in default_assets:
+                self.cursor.execute(
+                    "INSERT OR IGNORE INTO assets (symbol, name, coingecko_id) VALUES (?, ?, ?)",
+                    (symbol, name, coingecko_id)
+                )
+                
+            self._commit()
+            
     def add_user(self, username):
         """Add a new user to the database."""
-        try:
-            self.cursor.execute(
-                "INSERT INTO users (username, password) VALUES (?, ?)",
-                (username, "password123")
-            )
-            self.connection.commit()
-            return self.cursor.lastrowid
-        except sqlite3.IntegrityError:
-            # Username already exists
-            return None
-            
+        with self.write_lock:
+            try:
+                self.cursor.execute(
+                    "INSERT INTO users (username, password) VALUES (?, ?)",
+                    (username, "password123")
+                )
+                self._commit()
+                return self.cursor.lastrowid
+            except sqlite3.IntegrityError:
+                # Username already exists
+                return None
+                
     def get_user(self, username):
         """Get user by username."""
-        self.cursor.execute(
-            "SELECT * FROM users WHERE username = ?",
-            (username,)
-        )
-        row = self.cursor.fetchone()
-        return dict(row) if row else None
-        
+        with self.reader() as cursor:
+            cursor.execute(
+                "SELECT * FROM users WHERE username = ?",
+                (username,)
+            )
+            row = cursor.fetchone()
+            return dict(row) if row else None
+            
     def update_user_login(self, user_id):
         """Update user's last login time."""
-        self.cursor.execute(
-            "UPDATE users SET last_login = ? WHERE id = ?",
-            (datetime.now(), user_id)
-        )
-        self.connection.commit()
-        
+        with self.write_lock:
+            self.cursor.execute(
+                "UPDATE users SET last_login = ? WHERE id = ?",
+                (datetime.now(), user_id)
+            )
+            self._commit()
+            
     def update_user_password(self, user_id, new_password):
         """Update the password for the specified user."""
-        self.cursor.execute("UPDATE users SET password = ? WHERE id = ?", (new_password, user_id))
-        self.connection.commit()
-        
+        with self.write_lock:
+            self.cursor.execute("UPDATE users SET password = ? WHERE id = ?", (new_password, user_id))
+            self._commit()
+            
+    def update_user_settings(self, user_id, settings):
+        """Store the settings dict for the specified user as JSON."""
+        with self.write_lock:
+            self.cursor.execute(
+                "UPDATE users SET settings = ? WHERE id = ?",
+                (json.dumps(settings), user_id)
+            )
+            self._commit()
+            
     def add_price(self, asset_id, price_usd, source="manual"):
         """Add a new price entry for an asset."""
-        self.cursor.execute(
-            "INSERT INTO prices (asset_id, price_usd, source) VALUES (?, ?, ?)",
-            (asset_id, price_usd, source)
-        )
-        self.connection.commit()
-        return self.cursor.lastrowid
-        
+        with self.write_lock:
+            self.cursor.execute(
+                "INSERT OR REPLACE INTO prices (asset_id, price_usd, source) VALUES (?, ?, ?)",
+                (asset_id, price_usd, source)
+            )
+            self._commit()
+            return self.cursor.lastrowid
+            
     def get_latest_price(self, asset_id):
         """Get the latest price for an asset."""
-        self.cursor.execute(
-            "SELECT * FROM prices WHERE asset_id = ? ORDER BY timestamp DESC LIMIT 1",
-            (asset_id,)
-        )
-        result = self.cursor.fetchone()
-        return dict(result) if result else None
+        with self.reader() as cursor:
+            cursor.execute(
+                "SELECT * FROM latest_prices WHERE asset_id = ?",
+                (asset_id,)
+            )
+            result = cursor.fetchone()
+            return dict(result) if result else None
+            
+    def get_latest_prices(self, asset_ids=None):
+        """Get the latest price for several assets in one query.
         
+        Returns a dict mapping asset_id to its latest price row. When asset_ids
+        is None, the latest price of every asset is returned.
+        """
+        with self.reader() as cursor:
+            if asset_ids is None:
+                cursor.execute("SELECT * FROM latest_prices")
+                return {row['asset_id']: dict(row) for row in cursor.fetchall()}
+                
+            unique_ids = list(dict.fromkeys(asset_ids))
+            results = {}
+            
+            # Chunk the IN list to stay below SQLite's bound parameter limit
+            chunk_size = 500
+            for i in range(0, len(unique_ids), chunk_size):
+                chunk = unique_ids[i:i + chunk_size]
+                placeholders = ",".join("?" * len(chunk))
+                cursor.execute(
+                    f"SELECT * FROM latest_prices WHERE asset_id IN ({placeholders})",
+                    chunk
+                )
+                for row in cursor.fetchall():
+                    results[row['asset_id']] = dict(row)
+                    
+            return results
+            
+    def get_latest_quotes(self):
+        """Get the latest stored price and market cap of every asset with a CoinGecko ID."""
+        with self.reader() as cursor:
+            cursor.execute("""
+                SELECT a.id AS asset_id, a.coingecko_id, lp.price_usd, a.market_cap, lp.timestamp
+                FROM latest_prices lp
+                JOIN assets a ON lp.asset_id = a.id
+                WHERE a.coingecko_id IS NOT NULL AND a.coingecko_id != ''
+            """)
+            return [dict(row) for row in cursor.fetchall()]
+            
+    def get_coin_list(self):
+        """Get the stored CoinGecko coin list."""
+        with self.reader() as cursor:
+            cursor.execute("SELECT id, symbol, name FROM coins")
+            return [dict(row) for row in cursor.fetchall()]
+            
+    def get_coin_list_updated_at(self):
+        """Get when the stored coin list was last replaced, or None if it is empty."""
+        with self.reader() as cursor:
+            cursor.execute("SELECT MAX(updated_at) FROM coins")
+            return cursor.fetchone()[0]
+            
+    def replace_coin_list(self, coins):
+        """Replace the stored coin list with (id, symbol, name) tuples in one transaction."""
+        with self.batch():
+            self.cursor.execute("DELETE FROM coins")
+            self.cursor.executemany(
+                "INSERT OR REPLACE INTO coins (id, symbol, name) VALUES (?, ?, ?)",
+                coins
+            )
+            
     def get_asset_by_symbol(self, symbol):
         """Get asset by its symbol."""
-        self.cursor.execute(
-            "SELECT * FROM assets WHERE symbol = ?",
-            (symbol,)
-        )
-        result = self.cursor.fetchone()
-        return dict(result) if result else None
-        
-    def add_asset(self, symbol, name, coingecko_id=None):
-        """Add a new cryptocurrency asset."""
-        try:
-            self.cursor.execute(
-                "INSERT INTO assets (symbol, name, coingecko_id) VALUES (?, ?, ?)",
-                (symbol, name, coingecko_id)
+        with self.reader() as cursor:
+            cursor.execute(
+                "SELECT * FROM assets WHERE symbol = ?",
+                (symbol,)
             )
-            self.connection.commit()
-            return self.cursor.lastrowid
-        except sqlite3.IntegrityError:
-            # Asset symbol already exists
-            return None
+            result = cursor.fetchone()
+            return dict(result) if result else None
             
+    def get_asset_ids_by_symbol(self):
+        """Get a dict mapping every asset symbol to its id."""
+        with self.reader() as cursor:
+            cursor.execute("SELECT symbol, id FROM assets")
+            return {row['symbol']: row['id'] for row in cursor.fetchall()}
+            
+    def get_all_assets(self):
+        """Get all assets ordered by symbol."""
+        with self.reader() as cursor:
+            cursor.execute("SELECT * FROM assets ORDER BY symbol")
+            return [dict(row) for row in cursor.fetchall()]
+            
+    def get_assets_with_coingecko_id(self):
+        """Get the id and CoinGecko ID of every asset that can be priced via the API."""
+        with self.reader() as cursor:
+            cursor.execute("SELECT id, coingecko_id FROM assets WHERE coingecko_id IS NOT NULL AND coingecko_id != ''")
+            return [dict(row) for row in cursor.fetchall()]
+            
+    def add_asset(self, symbol, name, coingecko_id=None):
+        """Add a new cryptocurrency asset."""
+        with self.write_lock:
+            try:
+                self.cursor.execute(
+                    "INSERT INTO assets (symbol, name, coingecko_id) VALUES (?, ?, ?)",
+                    (symbol, name, coingecko_id)
+                )
+                self._commit()
+                return self.cursor.lastrowid
+            except sqlite3.IntegrityError:
+                # Asset symbol already exists
+                return None
+                
     def update_asset_coingecko_id(self, symbol, new_coingecko_id):
         """Update the CoinGecko ID for an existing asset."""
-        try:
-            self.cursor.execute(
-                "UPDATE assets SET coingecko_id = ? WHERE symbol = ?",
-                (new_coingecko_id, symbol)
-            )
-            rows_affected = self.cursor.rowcount
-            self.connection.commit()
-            print(f"Updated CoinGecko ID for {symbol} to {new_coingecko_id}, rows affected: {rows_affected}")
-            return rows_affected > 0
-        except Exception as e:
-            print(f"Error updating CoinGecko ID for {symbol}: {str(e)}")
-            return False
-            
+        with self.write_lock:
+            try:
+                self.cursor.execute(
+                    "UPDATE assets SET coingecko_id = ? WHERE symbol = ?",
+                    (new_coingecko_id, symbol)
+                )
+                rows_affected = self.cursor.rowcount
+                self._commit()
+                print(f"Updated CoinGecko ID for {symbol} to {new_coingecko_id}, rows affected: {rows_affected}")
+                return rows_affected > 0
+            except Exception as e:
+                print(f"Error updating CoinGecko ID for {symbol}: {str(e)}")
+                return False
+                
     def fix_bera_asset(self):
         """Fix the Bera asset by updating its CoinGecko ID."""
         return self.update_asset_coingecko_id("BERA", "bera")
-    
+        
     def fix_s_asset(self):
         """Fix the S (Sonic) asset by updating its CoinGecko ID."""
         return self.update_asset_coingecko_id("S", "fantom")
@@ -273,113 +715,757 @@ class Database:
     def fix_space_asset(self):
         """Fix the SPACE asset by updating its CoinGecko ID."""
         return self.update_asset_coingecko_id("SPACE", "space")
-    
+        
+    def bulk_record_prices(self, rows, source="api"):
+        """Record prices and market caps for many assets in one transaction.
+        
+        Args:
+            rows: Iterable of (asset_id, price_usd, market_cap) tuples. A
+                market_cap of None leaves the asset's stored market cap as is.
+            source: Source label stored with every price row.
+            
+        Returns:
+            The number of price rows written.
+        """
+        rows = list(rows)
+        if not rows:
+            return 0
+            
+        now = datetime.now()
+        with self.batch():
+            self.cursor.executemany(
+                "INSERT OR REPLACE INTO prices (asset_id, price_usd, source) VALUES (?, ?, ?)",
+                [(asset_id, price_usd, source) for asset_id, price_usd, _ in rows]
+            )
+            self.cursor.executemany(
+                "UPDATE assets SET market_cap = ?, last_updated = ? WHERE id = ?",
+                [(market_cap, now, asset_id) for asset_id, _, market_cap in rows if market_cap is not None]
+            )
+        return len(rows)
+        
+    def ingest_price_history(self, asset_id, points, source="backfill", chunk_size=1000):
+        """Insert historical prices for an asset in chunked transactions.
+        
+        Points whose (asset_id, timestamp) is already stored are skipped, so
+        an interrupted ingestion can simply be run again.
+        
+        Args:
+            asset_id: Asset the prices belong to.
+            points: Iterable of (timestamp, price_usd) pairs; timestamps are
+                UTC strings in SQLite's "YYYY-MM-DD HH:MM:SS" format.
+            source: Source label stored with every price row.
+            chunk_size: Number of rows committed per transaction.
+            
+        Returns:
+            The number of rows inserted.
+        """
+        points = list(points)
+        inserted = 0
+        
+        for i in range(0, len(points), chunk_size):
+            chunk = points[i:i + chunk_size]
+            with self.batch():
+                self.cursor.executemany(
+                    "INSERT OR IGNORE INTO prices (asset_id, timestamp, price_usd, source) VALUES (?, ?, ?, ?)",
+                    [(asset_id, timestamp, price_usd, source) for timestamp, price_usd in chunk]
+                )
+                # rowcount counts only rows inserted into prices, not ignored
+                # duplicates or the trigger's writes to latest_prices
+                inserted += self.cursor.rowcount
+                
+        return inserted
+        
+    def get_last_price_timestamp(self, asset_id, source=None):
+        """Get the timestamp of the newest stored price of an asset, optionally from one source."""
+        with self.reader() as cursor:
+            if source is None:
+                cursor.execute("SELECT MAX(timestamp) FROM prices WHERE asset_id = ?", (asset_id,))
+            else:
+                cursor.execute("SELECT MAX(timestamp) FROM prices WHERE asset_id = ? AND source = ?", (asset_id, source))
+            return cursor.fetchone()[0]
+            
+    def get_prices_at(self, asset_ids, timestamp):
+        """Get each asset's last known price at or before a UTC timestamp.
+        
+        Returns a dict mapping asset_id to price_usd; assets without a price
+        that old are left out.
+        """
+        results = {}
+        with self.reader() as cursor:
+            for asset_id in dict.fromkeys(asset_ids):
+                # One index seek per asset on (asset_id, timestamp)
+                cursor.execute("""
+                    SELECT price_usd FROM prices
+                    WHERE asset_id = ? AND timestamp <= ?
+                    ORDER BY timestamp DESC
+                    LIMIT 1
+                """, (asset_id, timestamp))
+                row = cursor.fetchone()
+                if row:
+                    results[asset_id] = row['price_usd']
+        return results
+        
+    def rollup_candles(self, interval, asset_id=None, since=None, replace=True):
+        """Aggregate raw prices into candles of one interval.
+        
+        Each asset resumes from its newest candle, which may have been partial,
+        unless since is given (e.g. after ingesting older history). since is
+        rounded down to a bucket boundary and buckets are recomputed in full,
+        so running a rollup twice is harmless.
+        
+        Args:
+            interval: Candle interval, a CANDLE_INTERVALS key.
+            asset_id: Optional asset to roll up; every priced asset if None.
+            since: Optional UTC timestamp of the first bucket to roll up.
+            replace: Whether existing candles are recomputed; if False only
+                missing buckets are added, leaving candles built before the
+                prices were thinned intact.
+                
+        Returns:
+            The number of candles written.
+        """
+        seconds = CANDLE_INTERVALS[interval]
+        
+        if asset_id is None:
+            with self.reader() as cursor:
+                cursor.execute("SELECT asset_id FROM latest_prices")
+                asset_ids = [row['asset_id'] for row in cursor.fetchall()]
+        else:
+            asset_ids = [asset_id]
+            
+        written = 0
+        with self.batch():
+            for asset_id in asset_ids:
+                start = since
+                if start is None:
+                    self.cursor.execute(
+                        "SELECT MAX(bucket_start) FROM candles WHERE asset_id = ? AND interval = ?",
+                        (asset_id, interval)
+                    )
+                    start = self.cursor.fetchone()[0] or "1970-01-01 00:00:00"
+                    
+                # Open and close are the prices at the first and last timestamp
+                # of each bucket, looked up through the unique (asset_id, timestamp) index
+                self.cursor.execute(f"""
+                    INSERT OR {'REPLACE' if replace else 'IGNORE'} INTO candles (asset_id, interval, bucket_start, open, high, low, close, samples)
+                    SELECT b.asset_id, ?, datetime(b.bucket, 'unixepoch'),
+                           (SELECT price_usd FROM prices WHERE asset_id = b.asset_id AND timestamp = b.first_timestamp),
+                           b.high, b.low,
+                           (SELECT price_usd FROM prices WHERE asset_id = b.asset_id AND timestamp = b.last_timestamp),
+                           b.samples
+                    FROM (
+                        SELECT asset_id,
+                               CAST(strftime('%s', timestamp) AS INTEGER) / ? * ? AS bucket,
+                               MIN(timestamp) AS first_timestamp,
+                               MAX(timestamp) AS last_timestamp,
+                               MAX(price_usd) AS high,
+                               MIN(price_usd) AS low,
+                               COUNT(*) AS samples
+                        FROM prices
+                        WHERE asset_id = ?
+                          AND timestamp >= datetime(CAST(strftime('%s', ?) AS INTEGER) / ? * ?, 'unixepoch')
+                        GROUP BY bucket
+                    ) b
+                """, (interval, seconds, seconds, asset_id, start, seconds, seconds))
+                written += self.cursor.rowcount
+                
+        return written
+        
+    def rollup_all_candles(self, asset_id=None, since=None, replace=True):
+        """Roll up raw prices into every candle interval; returns candles written per interval."""
+        return {interval: self.rollup_candles(interval, asset_id, since, replace) for interval in CANDLE_INTERVALS}
+        
+    def get_candles(self, asset_ids, interval, start, end=None):
+        """Get candles for several assets between two UTC timestamps.
+        
+        The candle containing start is included.
+        
+        Returns:
+            A dict mapping asset_id to its candles, oldest first.
+        """
+        seconds = CANDLE_INTERVALS[interval]
+        results = {}
+        with self.reader() as cursor:
+            for asset_id in dict.fromkeys(asset_ids):
+                cursor.execute("""
+                    SELECT bucket_start, open, high, low, close, volume
+                    FROM candles
+                    WHERE asset_id = ? AND interval = ?
+                      AND bucket_start >= datetime(CAST(strftime('%s', ?) AS INTEGER) / ? * ?, 'unixepoch')
+                      AND bucket_start <= ?
+                    ORDER BY bucket_start
+                """, (asset_id, interval, start, seconds, seconds, end or "9999-12-31 23:59:59"))
+                results[asset_id] = [dict(row) for row in cursor.fetchall()]
+        return results
+        
+    def get_price_series(self, asset_id, start=None, end=None):
+        """Get an asset's raw price history as a compact column store.
+        
+        Args:
+            start: Optional UTC timestamp of the first price to include.
+            end: Optional UTC timestamp to stop before.
+            
+        Returns:
+            A PriceSeries, oldest price first.
+        """
+        with self.reader() as cursor:
+            cursor.execute("""
+                SELECT id, asset_id, price_usd, CAST(strftime('%s', timestamp) AS INTEGER) AS timestamp, source
+                FROM prices
+                WHERE asset_id = ? AND timestamp >= ? AND timestamp < ?
+                ORDER BY timestamp
+            """, (asset_id, start or "0000-00-00 00:00:00", end or "9999-12-31 23:59:59"))
+            return PriceSeries.from_rows(cursor.fetchall())
+            
+    def thin_prices(self, asset_id, interval, start, end):
+        """Keep only the last raw price per candle bucket between two UTC timestamps.
+        
+        start and end are rounded down to a bucket boundary, so a bucket is
+        never thinned from part of its rows. Roll up candles first; thinning
+        throws away the samples their high and low were built from.
+        
+        Returns:
+            The number of raw price rows deleted.
+        """
+        seconds = CANDLE_INTERVALS[interval]
+        with self.write_lock:
+            self.cursor.execute("""
+                SELECT datetime(CAST(strftime('%s', ?) AS INTEGER) / ? * ?, 'unixepoch'),
+                       datetime(CAST(strftime('%s', ?) AS INTEGER) / ? * ?, 'unixepoch')
+            """, (start, seconds, seconds, end, seconds, seconds))
+            start, end = self.cursor.fetchone()
+            
+            self.cursor.execute("""
+                DELETE FROM prices
+                WHERE asset_id = ? AND timestamp >= ? AND timestamp < ?
+                  AND timestamp NOT IN (
+                      SELECT MAX(timestamp)
+                      FROM prices
+                      WHERE asset_id = ? AND timestamp >= ? AND timestamp < ?
+                      GROUP BY CAST(strftime('%s', timestamp) AS INTEGER) / ?
+                  )
+            """, (asset_id, start, end, asset_id, start, end, seconds))
+            deleted = self.cursor.rowcount
+            self._commit()
+        return deleted
+        
+    def delete_candles(self, asset_id, interval, before):
+        """Delete an asset's candles of one interval that start before a UTC timestamp.
+        
+        Returns:
+            The number of candles deleted.
+        """
+        with self.write_lock:
+            self.cursor.execute(
+                "DELETE FROM candles WHERE asset_id = ? AND interval = ? AND bucket_start < ?",
+                (asset_id, interval, before)
+            )
+            deleted = self.cursor.rowcount
+            self._commit()
+        return deleted
+        
+    def get_first_price_timestamp(self, asset_id):
+        """Get the timestamp of the oldest raw price stored for an asset."""
+        with self.reader() as cursor:
+            cursor.execute("SELECT MIN(timestamp) FROM prices WHERE asset_id = ?", (asset_id,))
+            return cursor.fetchone()[0]
+            
+    def get_storage_stats(self):
+        """Get the size of the database file and how much of it is free pages.
+        
+        Returns:
+            A dict with page_size, page_count, freelist_count, auto_vacuum
+            (0 none, 1 full, 2 incremental) and size and free sizes in bytes.
+        """
+        with self.write_lock:
+            stats = {
+                name: self.connection.execute(f"PRAGMA {name}").fetchone()[0]
+                for name in ("page_size", "page_count", "freelist_count", "auto_vacuum")
+            }
+        stats["size_bytes"] = stats["page_size"] * stats["page_count"]
+        stats["free_bytes"] = stats["page_size"] * stats["freelist_count"]
+        return stats
+        
+    def enable_incremental_vacuum(self):
+        """Switch the database file to auto_vacuum=INCREMENTAL.
+        
+        An existing database only changes mode after a full VACUUM, which
+        rewrites the whole file once and blocks writers while it runs.
+        
+        Returns:
+            True if the file was converted, False if it already was incremental.
+        """
+        with self.write_lock:
+            if self.connection.execute("PRAGMA auto_vacuum").fetchone()[0] == 2:
+                return False
+                
+            self.connection.commit()
+            self.connection.execute("PRAGMA auto_vacuum = INCREMENTAL")
+            self.connection.execute("VACUUM")
+            return True
+            
+    def incremental_vacuum(self, max_pages=None):
+        """Return free pages to the filesystem; needs auto_vacuum=INCREMENTAL.
+        
+        Args:
+            max_pages: Maximum number of pages to release, or None for all.
+            
+        Returns:
+            The number of bytes the database file shrank by.
+        """
+        with self.write_lock:
+            page_size = self.connection.execute("PRAGMA page_size").fetchone()[0]
+            before = self.connection.execute("PRAGMA page_count").fetchone()[0]
+            
+            # PRAGMA does not accept bound parameters, and execute() would
+            # stop after the first page; executescript() runs it to completion
+            pages = int(max_pages) if max_pages else 0
+            self.connection.commit()
+            self.connection.executescript(f"PRAGMA incremental_vacuum({pages})")
+            
+            after = self.connection.execute("PRAGMA page_count").fetchone()[0]
+        return (before - after) * page_size
+        
     def update_asset_market_cap(self, asset_id, market_cap):
         """Update market cap for an asset."""
-        self.cursor.execute(
-            "UPDATE assets SET market_cap = ?, last_updated = ? WHERE id = ?",
-            (market_cap, datetime.now(), asset_id)
-        )
-        self.connection.commit()
-        
+        with self.write_lock:
+            self.cursor.execute(
+                "UPDATE assets SET market_cap = ?, last_updated = ? WHERE id = ?",
+                (market_cap, datetime.now(), asset_id)
+            )
+            self._commit()
+            
     def add_holding(self, user_id, asset_id, amount, purchase_price_per_unit, notes=None):
         """Add a new holding for a user."""
-        self.cursor.execute(
-            "INSERT INTO holdings (user_id, asset_id, amount, purchase_price_per_unit, notes) VALUES (?, ?, ?, ?, ?)",
-            (user_id, asset_id, amount, purchase_price_per_unit, notes)
-        )
-        self.connection.commit()
-        return self.cursor.lastrowid
+        with self.write_lock:
+            self.cursor.execute(
+                "INSERT INTO holdings (user_id, asset_id, amount, purchase_price_per_unit, notes) VALUES (?, ?, ?, ?, ?)",
+                (user_id, asset_id, amount, purchase_price_per_unit, notes)
+            )
+            self._commit()
+            return self.cursor.lastrowid
+            
+    def bulk_add_holdings(self, user_id, rows, transaction_type="BUY"):
+        """Add many holdings, and a transaction for each, in one transaction.
+        
+        Args:
+            user_id: User the holdings belong to.
+            rows: Iterable of (asset_id, amount, purchase_price_per_unit, notes) tuples.
+            transaction_type: Type of the transaction recorded with each holding.
+            
+        Returns:
+            The number of holdings added. If any row fails, none are added.
+        """
+        rows = [(user_id, asset_id, amount, price, notes) for asset_id, amount, price, notes in rows]
+        if not rows:
+            return 0
+            
+        with self.batch():
+            self.cursor.executemany(
+                "INSERT INTO holdings (user_id, asset_id, amount, purchase_price_per_unit, notes) VALUES (?, ?, ?, ?, ?)",
+                rows
+            )
+            self.cursor.executemany(
+                "INSERT INTO transactions (user_id, asset_id, transaction_type, amount, price_per_unit, notes) VALUES (?, ?, ?, ?, ?, ?)",
+                [(user_id, asset_id, transaction_type, amount, price, notes) for user_id, asset_id, amount, price, notes in rows]
+            )
+        return len(rows)
         
     def update_holding(self, user_id, holding_id, amount, purchase_price_per_unit=None, notes=None):
         """Update an existing holding."""
-        self.cursor.execute(
-            "UPDATE holdings SET amount = ?, purchase_price_per_unit = ?, notes = ? WHERE id = ? AND user_id = ?",
-            (amount, purchase_price_per_unit, notes, holding_id, user_id)
-        )
-        self.connection.commit()
-        
-    def delete_holding(self, user_id, holding_id):
-        """Delete a holding."""
-        try:
-            # First, check if the holding exists for this user
+        with self.write_lock:
             self.cursor.execute(
-                "SELECT COUNT(*) FROM holdings WHERE id = ? AND user_id = ?",
-                (holding_id, user_id)
+                "UPDATE holdings SET amount = ?, purchase_price_per_unit = ?, notes = ? WHERE id = ? AND user_id = ?",
+                (amount, purchase_price_per_unit, notes, holding_id, user_id)
             )
-            count = self.cursor.fetchone()[0]
+            self._commit()
             
-            if count == 0:
-                print(f"Warning: No holding found with ID {holding_id} for user {user_id}")
+    def delete_holding(self, user_id, holding_id):
+        """Delete a holding."""
+        with self.write_lock:
+            try:
+                # First, check if the holding exists for this user
+                self.cursor.execute(
+                    "SELECT COUNT(*) FROM holdings WHERE id = ? AND user_id = ?",
+                    (holding_id, user_id)
+                )
+                count = self.cursor.fetchone()[0]
+                
+                if count == 0:
+                    print(f"Warning: No holding found with ID {holding_id} for user {user_id}")
+                    return False
+                    
+                # Delete the holding
+                self.cursor.execute(
+                    "DELETE FROM holdings WHERE id = ? AND user_id = ?",
+                    (holding_id, user_id)
+                )
+                rows_affected = self.cursor.rowcount
+                self._commit()
+                
+                print(f"Deleted holding {holding_id} for user {user_id}, rows affected: {rows_affected}")
+                return rows_affected > 0
+            except Exception as e:
+                print(f"Error deleting holding: {str(e)}")
                 return False
                 
-            # Delete the holding
-            self.cursor.execute(
-                "DELETE FROM holdings WHERE id = ? AND user_id = ?",
-                (holding_id, user_id)
-            )
-            rows_affected = self.cursor.rowcount
-            self.connection.commit()
+    def get_holding(self, user_id, holding_id):
+        """Get a single holding of a user with asset information."""
+        with self.reader() as cursor:
+            cursor.execute("""
+                SELECT h.*, a.symbol, a.name, a.market_cap
+                FROM holdings h
+                JOIN assets a ON h.asset_id = a.id
+                WHERE h.id = ? AND h.user_id = ?
+            """, (holding_id, user_id))
+            row = cursor.fetchone()
+            return dict(row) if row else None
             
-            print(f"Deleted holding {holding_id} for user {user_id}, rows affected: {rows_affected}")
-            return rows_affected > 0
-        except Exception as e:
-            print(f"Error deleting holding: {str(e)}")
-            return False
-        
     def get_user_holdings(self, user_id):
         """Get all holdings for a user with asset information."""
-        self.cursor.execute("""
-            SELECT h.*, a.symbol, a.name, a.market_cap 
-            FROM holdings h
-            JOIN assets a ON h.asset_id = a.id
-            WHERE h.user_id = ?
-        """, (user_id,))
-        return [dict(row) for row in self.cursor.fetchall()]
-        
+        with self.reader() as cursor:
+            cursor.execute("""
+                SELECT h.*, a.symbol, a.name, a.market_cap
+                FROM holdings h
+                JOIN assets a ON h.asset_id = a.id
+                WHERE h.user_id = ?
+            """, (user_id,))
+            return [dict(row) for row in cursor.fetchall()]
+            
     def add_transaction(self, user_id, asset_id, transaction_type, amount, price_per_unit, notes=None):
         """Record a transaction."""
-        self.cursor.execute(
-            "INSERT INTO transactions (user_id, asset_id, transaction_type, amount, price_per_unit, notes) VALUES (?, ?, ?, ?, ?, ?)",
-            (user_id, asset_id, transaction_type, amount, price_per_unit, notes)
-        )
-        self.connection.commit()
-        return self.cursor.lastrowid
+        with self.write_lock:
+            self.cursor.execute(
+                "INSERT INTO transactions (user_id, asset_id, transaction_type, amount, price_per_unit, notes) VALUES (?, ?, ?, ?, ?, ?)",
+                (user_id, asset_id, transaction_type, amount, price_per_unit, notes)
+            )
+            self._commit()
+            return self.cursor.lastrowid
+            
+    def add_imported_transactions(self, user_id, rows):
+        """Record imported transactions, skipping rows whose source hash is already stored.
         
-    def get_user_transactions(self, user_id, limit=100):
-        """Get transactions for a user with asset information."""
-        self.cursor.execute("""
-            SELECT t.*, a.symbol, a.name
-            FROM transactions t
-            JOIN assets a ON t.asset_id = a.id
-            WHERE t.user_id = ?
-            ORDER BY t.timestamp DESC
-            LIMIT ?
-        """, (user_id, limit))
-        return [dict(row) for row in self.cursor.fetchall()]
+        Args:
+            user_id: User the transactions belong to.
+            rows: List of (asset_id, transaction_type, amount, price_per_unit,
+                timestamp, notes, source_hash) tuples.
+                
+        Returns:
+            The list of rows actually inserted.
+        """
+        with self.batch():
+            existing = set()
+            hashes = [row[6] for row in rows]
+            # Stay well below SQLite's bound parameter limit
+            for i in range(0, len(hashes), 500):
+                chunk = hashes[i:i + 500]
+                self.cursor.execute(
+                    f"SELECT source_hash FROM transactions WHERE user_id = ? AND source_hash IN ({', '.join('?' * len(chunk))})",
+                    [user_id, *chunk]
+                )
+                existing.update(row['source_hash'] for row in self.cursor.fetchall())
+                
+            new_rows = []
+            for row in rows:
+                if row[6] not in existing:
+                    existing.add(row[6])
+                    new_rows.append(row)
+                    
+            self.cursor.executemany(
+                "INSERT INTO transactions (user_id, asset_id, transaction_type, amount, price_per_unit, timestamp, notes, source_hash) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                [(user_id, *row) for row in new_rows]
+            )
+        return new_rows
         
-    def delete_transaction(self, transaction_id, user_id):
-        """Delete a transaction by ID and user ID for security."""
-        try:
+    def apply_holding_changes(self, user_id, changes):
+        """Apply imported amount changes to each asset's newest holding.
+        
+        Bought amounts are averaged into the holding's purchase price. An
+        asset without a holding gets a new one, which may go negative until
+        the rest of an import is applied; see delete_empty_holdings().
+        
+        Args:
+            user_id: User whose holdings are changed.
+            changes: Dict mapping asset_id to (amount_delta, bought_amount,
+                bought_cost) tuples.
+        """
+        with self.batch():
+            for asset_id, (amount_delta, bought_amount, bought_cost) in changes.items():
+                self.cursor.execute(
+                    "SELECT id, amount, purchase_price_per_unit FROM holdings WHERE user_id = ? AND asset_id = ? ORDER BY id DESC LIMIT 1",
+                    (user_id, asset_id)
+                )
+                holding = self.cursor.fetchone()
+                
+                if holding is None:
+                    price = bought_cost / bought_amount if bought_amount > 0 else 0
+                    self.cursor.execute(
+                        "INSERT INTO holdings (user_id, asset_id, amount, purchase_price_per_unit, notes) VALUES (?, ?, ?, ?, ?)",
+                        (user_id, asset_id, amount_delta, price, "Imported")
+                    )
+                    continue
+                    
+                held = max(holding['amount'], 0)
+                price = holding['purchase_price_per_unit']
+                if bought_amount > 0:
+                    price = (held * price + bought_cost) / (held + bought_amount)
+                self.cursor.execute(
+                    "UPDATE holdings SET amount = ?, purchase_price_per_unit = ? WHERE id = ?",
+                    (holding['amount'] + amount_delta, price, holding['id'])
+                )
+                
+    def delete_empty_holdings(self, user_id, asset_ids):
+        """Delete a user's holdings of the given assets that are sold out.
+        
+        Returns:
+            The number of holdings deleted.
+        """
+        asset_ids = list(asset_ids)
+        if not asset_ids:
+            return 0
+            
+        with self.batch():
+            # Tolerate float dust left over from summing many trades
             self.cursor.execute(
-                "DELETE FROM transactions WHERE id = ? AND user_id = ?",
-                (transaction_id, user_id)
+                f"DELETE FROM holdings WHERE user_id = ? AND amount <= 1e-12 AND asset_id IN ({', '.join('?' * len(asset_ids))})",
+                [user_id, *asset_ids]
             )
-            self.connection.commit()
-            return self.cursor.rowcount > 0  # Returns True if a row was deleted
-        except Exception as e:
-            print(f"Error deleting transaction: {str(e)}")
-            return False 
+            return self.cursor.rowcount
+            
+    def get_user_transactions(self, user_id, limit=100, before_timestamp=None, before_id=None,
+                              transaction_type=None, asset_id=None, start=None, end=None):
+        """Get a page of a user's transactions with asset information, newest first.
+        
+        Pages are read with a keyset cursor: pass the timestamp and id of the
+        last transaction of a page to get the next one. Unlike an offset,
+        this reads only the rows returned, however deep into the history.
+        
+        Args:
+            user_id: User whose transactions are read.
+            limit: Largest number of transactions returned.
+            before_timestamp: Only return transactions older than this
+                timestamp, or as old with an id below before_id if given.
+            before_id: Id of the last transaction of the previous page.
+            transaction_type: Only return transactions of this type, such
+                as 'BUY' or 'STAKING'.
+            asset_id: Only return transactions of this asset.
+            start: Only return transactions at or after this timestamp.
+            end: Only return transactions before this timestamp.
+            
+        Returns:
+            A list of transaction dicts with the asset's symbol and name.
+        """
+        conditions = ["t.user_id = :user_id"]
+        if before_timestamp is not None and before_id is not None:
+            # Ties on the timestamp are broken by id, matching the order
+            conditions.append("(t.timestamp, t.id) < (:before_timestamp, :before_id)")
+        elif before_timestamp is not None:
+            conditions.append("t.timestamp < :before_timestamp")
+        if transaction_type is not None:
+            conditions.append("t.transaction_type = :transaction_type")
+        if asset_id is not None:
+            conditions.append("t.asset_id = :asset_id")
+        if start is not None:
+            conditions.append("t.timestamp >= :start")
+        if end is not None:
+            conditions.append("t.timestamp < :end")
+            
+        with self.reader() as cursor:
+            cursor.execute(f"""
+                SELECT t.*, a.symbol, a.name
+                FROM transactions t
+                JOIN assets a ON t.asset_id = a.id
+                WHERE {' AND '.join(conditions)}
+                ORDER BY t.timestamp DESC, t.id DESC
+                LIMIT :limit
+            """, {
+                "user_id": user_id,
+                "limit": limit,
+                "before_timestamp": before_timestamp,
+                "before_id": before_id,
+                "transaction_type": transaction_type,
+                "asset_id": asset_id,
+                "start": start,
+                "end": end
+            })
+            return [dict(row) for row in cursor.fetchall()]
+            
+    def iter_user_transactions(self, user_id, batch_size=1000, **filters):
+        """Stream all of a user's transactions, newest first.
+        
+        Each batch is a separate keyset page, so no reader connection is
+        held while the caller processes the transactions.
+        
+        Args:
+            user_id: User whose transactions are read.
+            batch_size: Transactions read per query.
+            **filters: transaction_type, asset_id, start and end, as for
+                get_user_transactions().
+                
+        Yields:
+            Transaction dicts with the asset's symbol and name.
+        """
+        before_timestamp = before_id = None
+        while True:
+            page = self.get_user_transactions(
+                user_id, batch_size, before_timestamp=before_timestamp, before_id=before_id, **filters
+            )
+            yield from page
+            if len(page) < batch_size:
+                return
+            before_timestamp, before_id = page[-1]['timestamp'], page[-1]['id']
+            
+    def get_transaction_log(self, user_id):
+        """Get all transactions of a user as a compact column store, oldest first."""
+        with self.reader() as cursor:
+            cursor.execute("""
+                SELECT t.id, t.user_id, t.asset_id, t.transaction_type, t.amount, t.price_per_unit,
+                       CAST(strftime('%s', t.timestamp) AS INTEGER) AS timestamp, t.notes, a.symbol, a.name
+                FROM transactions t
+                JOIN assets a ON t.asset_id = a.id
+                WHERE t.user_id = ?
+                ORDER BY t.timestamp
+            """, (user_id,))
+            return TransactionLog.from_rows(cursor.fetchall())
+            
+    def iter_keyset_batches(self, columns, source, key, params, batch_size):
+        """Read a query in batches, each its own query resuming after the last row read.
+        
+        No connection is held between batches, so a slow consumer never
+        blocks the writer, which serves reads when there is no reader pool.
+        
+        Args:
+            columns: Selected columns, as SQL.
+            source: FROM clause with a WHERE condition, as SQL.
+            key: Unique sort key, as a tuple of SQL columns; the rows are
+                read in its order.
+            params: Named parameters of the source.
+            batch_size: Rows read per batch.
+            
+        Yields:
+            (columns, rows) tuples, where columns are the column names and
+            rows a non-empty list of value tuples.
+        """
+        key_columns = ", ".join(key)
+        after = ", ".join(f":after_{i}" for i in range(len(key)))
+        query = f"SELECT {columns}, {key_columns} FROM {source} {{}} ORDER BY {key_columns} LIMIT :limit"
+        first_query = query.format("")
+        next_query = query.format(f"AND ({key_columns}) > ({after})")
+        
+        params = dict(params, limit=batch_size)
+        while True:
+            with self.reader() as cursor:
+                cursor.execute(next_query if "after_0" in params else first_query, params)
+                names = [description[0] for description in cursor.description][:-len(key)]
+                rows = cursor.fetchall()
+                
+            if not rows:
+                return
+            # The key is selected after the columns
+            params.update((f"after_{i}", value) for i, value in enumerate(tuple(rows[-1])[-len(key):]))
+            yield names, [tuple(row)[:-len(key)] for row in rows]
+            if len(rows) < batch_size:
+                return
+                
+    def iter_export_rows(self, table, user_id, batch_size=5000):
+        """Stream a user's rows of one exportable table in batches.
+        
+        Batches are read with iter_keyset_batches(), so no connection is
+        held while the caller writes a batch out.
+        
+        Args:
+            table: One of EXPORT_TABLES; prices covers every asset the user
+                holds or has a transaction of.
+            user_id: User whose data is exported.
+            batch_size: Rows fetched per batch.
+            
+        Yields:
+            (columns, rows) tuples, where rows is a list of value tuples;
+            a single batch with no rows if the table is empty.
+        """
+        if table == "holdings":
+            queries = [(
+                "h.id, a.symbol, a.name, h.amount, h.purchase_price_per_unit, h.purchase_date, h.notes",
+                "holdings h JOIN assets a ON h.asset_id = a.id WHERE h.user_id = :user_id",
+                ("h.id",),
+                {"user_id": user_id}
+            )]
+            columns = ["id", "symbol", "name", "amount", "purchase_price_per_unit", "purchase_date", "notes"]
+        elif table == "transactions":
+            queries = [(
+                "t.id, a.symbol, t.transaction_type, t.amount, t.price_per_unit, t.timestamp, t.notes",
+                "transactions t JOIN assets a ON t.asset_id = a.id WHERE t.user_id = :user_id",
+                ("t.id",),
+                {"user_id": user_id}
+            )]
+            columns = ["id", "symbol", "transaction_type", "amount", "price_per_unit", "timestamp", "notes"]
+        elif table == "prices":
+            with self.reader() as cursor:
+                cursor.execute("""
+                    SELECT asset_id FROM holdings WHERE user_id = :user_id
+                    UNION
+                    SELECT asset_id FROM transactions WHERE user_id = :user_id
+                    ORDER BY asset_id
+                """, {"user_id": user_id})
+                asset_ids = [row['asset_id'] for row in cursor.fetchall()]
+                
+            # One asset at a time, so every batch is a seek on the (asset_id, timestamp) index
+            queries = [(
+                "a.symbol, p.timestamp, p.price_usd, p.source",
+                "prices p JOIN assets a ON p.asset_id = a.id WHERE p.asset_id = :asset_id",
+                ("p.timestamp",),
+                {"asset_id": asset_id}
+            ) for asset_id in asset_ids]
+            columns = ["symbol", "timestamp", "price_usd", "source"]
+        else:
+            raise ValueError(f"Unknown export table: {table}")
+            
+        empty = True
+        for query_columns, source, key, params in queries:
+            for _, rows in self.iter_keyset_batches(query_columns, source, key, params, batch_size):
+                empty = False
+                yield columns, rows
+                
+        # Still report the columns, so an empty export gets its header
+        if empty:
+            yield columns, []
             
+    def get_user_staking_transactions(self, user_id):
+        """Get all staking transactions for a user, oldest first."""
+        with self.reader() as cursor:
+            cursor.execute("""
+                SELECT t.*, a.symbol, a.name
+                FROM transactions t
+                JOIN assets a ON t.asset_id = a.id
+                WHERE t.user_id = ? AND t.transaction_type = 'STAKING'
+                ORDER BY t.timestamp
+            """, (user_id,))
+            return [dict(row) for row in cursor.fetchall()]
+            
+    def delete_transaction(self, transaction_id, user_id):
+        """Delete a transaction by ID and user ID for security."""
+        with self.write_lock:
+            try:
+                self.cursor.execute(
+                    "DELETE FROM transactions WHERE id = ? AND user_id = ?",
+                    (transaction_id, user_id)
+                )
+                self._commit()
+                return self.cursor.rowcount > 0  # Returns True if a row was deleted
+            except Exception as e:
+                print(f"Error deleting transaction: {str(e)}")
+                return False
+                
     def update_transaction(self, transaction_id, user_id, notes=None):
         """Update a transaction's details by ID and user ID for security."""
-        try:
-            self.cursor.execute(
-                "UPDATE transactions SET notes = ? WHERE id = ? AND user_id = ?",
-                (notes, transaction_id, user_id)
-            )
-            self.connection.commit()
-            return self.cursor.rowcount > 0  # Returns True if a row was updated
-        except Exception as e:
-            print(f"Error updating transaction: {str(e)}")
-            return False 
\ No newline at end of file
+        with self.write_lock:
+            try:
+                self.cursor.execute(
+                    "UPDATE transactions SET notes = ? WHERE id = ? AND user_id = ?",
+                    (notes, transaction_id, user_id)
+                )
+                self._commit()
+                return self.cursor.rowcount > 0  # Returns True if a row was updated
+            except Exception as e:
+                print(f"Error updating transaction: {str(e)}")
+                return False
\ No newline at end of file
@@ -0,0 +1,306 @@
+import re
+from datetime import datetime, timezone
+
+# Quote currencies valued 1:1 with USD; trades against them record no quote leg
+USD_CURRENCIES = {"USD", "USDT", "USDC", "BUSD", "FDUSD", "TUSD", "DAI", "USDP"}
+
+FIAT_CURRENCIES = {"EUR", "GBP", "CAD", "JPY", "AUD", "CHF", "TRY", "BRL"}
+
+# Longest first, so "BTCUSDT" splits into BTC/USDT rather than BTCUSD/T
+QUOTE_CURRENCIES = sorted(USD_CURRENCIES | FIAT_CURRENCIES | {"BTC", "ETH", "BNB", "XBT"}, key=len, reverse=True)
+
+KRAKEN_ASSETS = {
+    "XXBT": "BTC", "XBT": "BTC", "XXDG": "DOGE", "XDG": "DOGE", "XETH": "ETH", "ETH2": "ETH",
+    "XLTC": "LTC", "XXRP": "XRP", "XXLM": "XLM", "XXMR": "XMR", "XZEC": "ZEC", "XETC": "ETC",
+    "XMLN": "MLN", "XREP": "REP", "ZUSD": "USD", "ZEUR": "EUR", "ZGBP": "GBP", "ZCAD": "CAD",
+    "ZJPY": "JPY", "ZAUD": "AUD", "ZCHF": "CHF"
+}
+
+AMOUNT_PATTERN = re.compile(r"^([-+]?[\d.]+(?:[eE][-+]?\d+)?)\s*([A-Za-z0-9]*)$")
+
+def parse_number(value):
+    """Parse an exchange-formatted number such as "$1,234.56"; empty values are 0."""
+    value = (value or "").strip().replace(",", "").lstrip("$€£")
+    return float(value) if value else 0.0
+
+def parse_amount(value):
+    """Split a Binance amount such as "0.5BTC" into (0.5, "BTC")."""
+    match = AMOUNT_PATTERN.match((value or "").strip().replace(",", ""))
+    if not match:
+        raise ValueError(f"Invalid amount: {value}")
+    return float(match.group(1)), match.group(2).upper()
+
+def parse_timestamp(value):
+    """Parse an exchange timestamp into SQLite's UTC "YYYY-MM-DD HH:MM:SS" format.
+    
+    Timestamps without a timezone are taken to be UTC, which is what every
+    supported export uses.
+    """
+    value = value.strip()
+    # Already in SQLite's format, as Binance and most Kraken rows are
+    if len(value) == 19 and value[10] == " ":
+        return value
+        
+    value = value.replace(" UTC", "").replace("Z", "+00:00")
+    # Kraken writes four fractional digits; fromisoformat wants three or six
+    value = re.sub(r"(\.\d+)", lambda match: match.group(1)[:7].ljust(7, "0"), value)
+    timestamp = datetime.fromisoformat(value)
+    if timestamp.tzinfo is not None:
+        timestamp = timestamp.astimezone(timezone.utc).replace(tzinfo=None)
+    return timestamp.strftime("%Y-%m-%d %H:%M:%S")
+
+def split_pair(pair, quotes=QUOTE_CURRENCIES):
+    """Split a trading pair such as "BTCUSDT", "BTC/USD" or "BTC-USD" into (base, quote).
+    
+    Args:
+        pair: The pair as written by the exchange.
+        quotes: Quote currencies tried as suffixes of unseparated pairs,
+            longest first.
+    """
+    pair = pair.strip().upper()
+    for separator in ("/", "-", "_"):
+        if separator in pair:
+            base, quote = pair.split(separator, 1)
+            return base, quote
+            
+    for quote in quotes:
+        if pair.endswith(quote) and len(pair) > len(quote):
+            return pair[:-len(quote)], quote
+    raise ValueError(f"Unknown trading pair: {pair}")
+
+def kraken_asset(code):
+    """Translate a Kraken asset code such as "XXBT" or "DOT.S" into a ticker symbol."""
+    # Staked and earn balances carry a suffix: DOT.S, ETH2.S, USDC.M
+    code = code.strip().upper().split(".")[0]
+    return KRAKEN_ASSETS.get(code, code)
+
+def entry(timestamp, symbol, transaction_type, amount, price, currency, notes):
+    """Build one transaction entry as produced by ExchangeFormat.parse_row().
+    
+    price is per unit in currency; the importer converts it to USD. A price
+    of 1 in the entry's own symbol asks for the asset's stored USD price.
+    """
+    return {
+        "timestamp": timestamp,
+        "symbol": symbol,
+        "transaction_type": transaction_type,
+        "amount": amount,
+        "price": price,
+        "currency": currency,
+        "notes": notes
+    }
+
+class ExchangeFormat:
+    """A CSV export layout of one exchange.
+    
+    Subclasses set name, label and columns (the header columns that identify
+    the layout) and implement parse_row().
+    """
+    name = None
+    label = None
+    columns = ()
+    
+    def matches(self, header):
+        """Check whether a CSV header row is this layout."""
+        return set(self.columns) <= {column.strip() for column in header}
+        
+    def parse_row(self, row):
+        """Translate one CSV row into transaction entries.
+        
+        Returns:
+            A list of entry() dicts; empty for rows that are not trades or
+            rewards, such as deposits and withdrawals.
+        """
+        raise NotImplementedError
+        
+    def trade_entries(self, timestamp, base, quote, side, amount, total, fee=0.0, fee_currency=None, notes=""):
+        """Build the entries of a trade of amount base for total quote.
+        
+        A fee in the quote currency is folded into the price, a fee in the
+        base asset into the amount, and a fee in any other asset becomes a
+        SELL of that asset. Trades against a crypto quote also record the
+        opposite leg in the quote asset.
+        """
+        if side not in ("BUY", "SELL"):
+            raise ValueError(f"Unknown trade side: {side}")
+        buy = side == "BUY"
+        fee_currency = fee_currency or quote
+        
+        if fee and fee_currency == quote:
+            total = total + fee if buy else total - fee
+        elif fee and fee_currency == base:
+            amount = amount - fee if buy else amount + fee
+            
+        if amount <= 0:
+            raise ValueError(f"Invalid trade amount: {amount}")
+            
+        notes = notes or f"{self.label} {side.lower()} {base}/{quote}"
+        entries = [entry(timestamp, base, side, amount, total / amount, quote, notes)]
+        
+        if quote not in USD_CURRENCIES and quote not in FIAT_CURRENCIES:
+            entries.append(entry(timestamp, quote, "SELL" if buy else "BUY", total, 1.0, quote, notes))
+            
+        if fee and fee_currency not in (base, quote):
+            entries.append(entry(timestamp, fee_currency, "SELL", fee, 1.0, fee_currency, f"{self.label} trading fee"))
+        return entries
+
+EXCHANGE_FORMATS = {}
+
+def register_format(format_class):
+    """Register an ExchangeFormat subclass for detection; usable as a class decorator."""
+    EXCHANGE_FORMATS[format_class.name] = format_class()
+    return format_class
+
+def detect_format(header):
+    """Get the registered format whose columns the header has, or None."""
+    for exchange_format in EXCHANGE_FORMATS.values():
+        if exchange_format.matches(header):
+            return exchange_format
+    return None
+
+@register_format
+class BinanceTrades(ExchangeFormat):
+    """Binance spot trade history (Orders > Trade History > Export)."""
+    name = "binance_trades"
+    label = "Binance"
+    columns = ("Date(UTC)", "Pair", "Side", "Price", "Executed", "Amount", "Fee")
+    
+    def parse_row(self, row):
+        base, quote = split_pair(row['Pair'])
+        amount, _ = parse_amount(row['Executed'])
+        total, _ = parse_amount(row['Amount'])
+        fee, fee_currency = parse_amount(row['Fee'])
+        return self.trade_entries(
+            parse_timestamp(row['Date(UTC)']),
+            base,
+            quote,
+            row['Side'].strip().upper(),
+            amount,
+            total,
+            fee,
+            fee_currency or quote
+        )
+
+@register_format
+class BinanceStatement(ExchangeFormat):
+    """Binance transaction history statement; only rewards are imported.
+    
+    The statement records each trade as unpriced balance changes, so trades
+    are taken from the trade history export instead.
+    """
+    name = "binance_statement"
+    label = "Binance"
+    columns = ("UTC_Time", "Operation", "Coin", "Change")
+    reward_operations = {
+        "Staking Rewards", "ETH 2.0 Staking Rewards", "POS savings interest", "Savings Interest",
+        "Simple Earn Flexible Interest", "Simple Earn Locked Rewards", "Launchpool Interest"
+    }
+    
+    def parse_row(self, row):
+        operation = row['Operation'].strip()
+        change = parse_number(row['Change'])
+        if operation not in self.reward_operations or change <= 0:
+            return []
+            
+        symbol = row['Coin'].strip().upper()
+        return [entry(parse_timestamp(row['UTC_Time']), symbol, "STAKING", change, 1.0, symbol, f"Binance {operation}")]
+
+@register_format
+class CoinbaseTransactions(ExchangeFormat):
+    """Coinbase transaction report, in the pre-2024 and current layouts."""
+    name = "coinbase"
+    label = "Coinbase"
+    columns = ("Timestamp", "Transaction Type", "Asset", "Quantity Transacted")
+    buy_types = {"Buy", "Advanced Trade Buy"}
+    sell_types = {"Sell", "Advanced Trade Sell"}
+    reward_types = {"Staking Income", "Rewards Income", "Inflation Reward"}
+    convert_pattern = re.compile(r"Converted ([\d.,]+) (\w+) to ([\d.,]+) (\w+)")
+    
+    def parse_row(self, row):
+        transaction_type = row['Transaction Type'].strip()
+        timestamp = parse_timestamp(row['Timestamp'])
+        symbol = row['Asset'].strip().upper()
+        amount = abs(parse_number(row['Quantity Transacted']))
+        currency = (row.get('Spot Price Currency') or row.get('Price Currency') or "USD").strip().upper()
+        spot_price = parse_number(row.get('Spot Price at Transaction') or row.get('Price at Transaction'))
+        total = abs(parse_number(row.get('Total (inclusive of fees and/or spread)')))
+        
+        if transaction_type in self.buy_types or transaction_type in self.sell_types:
+            side = "BUY" if transaction_type in self.buy_types else "SELL"
+            # The total includes fees: paid on buys, deducted on sells
+            price = total / amount if total and amount else spot_price
+            return [entry(timestamp, symbol, side, amount, price, currency, f"Coinbase {transaction_type.lower()}")]
+            
+        if transaction_type in self.reward_types:
+            return [entry(timestamp, symbol, "STAKING", amount, spot_price, currency, f"Coinbase {transaction_type.lower()}")]
+            
+        if transaction_type == "Convert":
+            match = self.convert_pattern.search(row.get('Notes') or "")
+            if not match:
+                raise ValueError(f"Unrecognized conversion: {row.get('Notes')}")
+                
+            target_amount = parse_number(match.group(3))
+            target = match.group(4).upper()
+            value = abs(parse_number(row.get('Subtotal'))) or amount * spot_price
+            notes = f"Coinbase convert {symbol} to {target}"
+            return [
+                entry(timestamp, symbol, "SELL", amount, value / amount, currency, notes),
+                entry(timestamp, target, "BUY", target_amount, (total or value) / target_amount, currency, notes)
+            ]
+            
+        return []
+
+@register_format
+class KrakenTrades(ExchangeFormat):
+    """Kraken trades export (History > Export > Trades)."""
+    name = "kraken_trades"
+    label = "Kraken"
+    columns = ("txid", "pair", "time", "type", "price", "cost", "fee", "vol")
+    # Kraken lists no TUSD markets, so "DOTUSD" must not split into DO/TUSD
+    quotes = ("USDT", "USDC", "ZUSD", "ZEUR", "XXBT", "XETH", "USD", "EUR", "GBP", "CAD", "JPY", "AUD", "CHF", "XBT", "ETH", "DAI")
+    
+    def split_kraken_pair(self, pair):
+        """Split a Kraken pair such as "XXBTZUSD" or "DOTUSD" into ticker symbols."""
+        pair = pair.strip().upper()
+        # Legacy pairs join two four-letter codes: XXBTZUSD, XETHXXBT
+        if len(pair) == 8 and pair[:4] in KRAKEN_ASSETS and pair[4:] in KRAKEN_ASSETS:
+            return KRAKEN_ASSETS[pair[:4]], KRAKEN_ASSETS[pair[4:]]
+            
+        base, quote = split_pair(pair, self.quotes)
+        return kraken_asset(base), kraken_asset(quote)
+        
+    def parse_row(self, row):
+        base, quote = self.split_kraken_pair(row['pair'])
+        # Kraken charges trade fees in the quote currency
+        return self.trade_entries(
+            parse_timestamp(row['time']),
+            base,
+            quote,
+            row['type'].strip().upper(),
+            parse_number(row['vol']),
+            parse_number(row['cost']),
+            parse_number(row['fee']),
+            quote,
+            f"Kraken {row['type'].strip().lower()} {base}/{quote} ({row['txid'].strip()})"
+        )
+
+@register_format
+class KrakenLedgers(ExchangeFormat):
+    """Kraken ledgers export; only staking rewards are imported.
+    
+    Ledgers record each trade as two unpriced legs, so trades are taken
+    from the trades export instead.
+    """
+    name = "kraken_ledgers"
+    label = "Kraken"
+    columns = ("txid", "refid", "time", "type", "asset", "amount", "fee", "balance")
+    
+    def parse_row(self, row):
+        ledger_type = row['type'].strip().lower()
+        subtype = (row.get('subtype') or "").strip().lower()
+        amount = parse_number(row['amount']) - parse_number(row['fee'])
+        if amount <= 0 or not (ledger_type == "staking" or (ledger_type == "earn" and subtype == "reward")):
+            return []
+            
+        symbol = kraken_asset(row['asset'])
+        return [entry(parse_timestamp(row['time']), symbol, "STAKING", amount, 1.0, symbol, f"Kraken staking reward ({row['txid'].strip()})")]
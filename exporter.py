@@ -0,0 +1,194 @@
+import argparse
+import csv
+import json
+import os
+
+from database import EXPORT_TABLES, Database
+
+# File extension of each export format
+EXPORT_FORMATS = {
+    "csv": "csv",
+    "jsonl": "jsonl",
+    "parquet": "parquet",
+}
+
+# Parquet column types; every other column is written as a string
+PARQUET_TYPES = {
+    "id": "int64",
+    "amount": "float64",
+    "purchase_price_per_unit": "float64",
+    "price_per_unit": "float64",
+    "price_usd": "float64",
+}
+
+def parquet_available():
+    """Check whether pyarrow, needed for Parquet export, is installed."""
+    try:
+        import pyarrow
+    except ImportError:
+        return False
+    return True
+
+class DataExporter:
+    def __init__(self, db, batch_size=5000):
+        """Initialize the exporter of a user's holdings, transactions and price history.
+        
+        Rows are streamed from the database in batches and written as they
+        arrive, so exports of any size run in constant memory.
+        
+        Args:
+            db: Database the data is read from.
+            batch_size: Rows read and written per batch.
+        """
+        self.db = db
+        self.batch_size = batch_size
+        self.stop_requested = False
+        
+    def stop(self):
+        """Ask a running export to stop after the current batch."""
+        self.stop_requested = True
+        
+    def write_csv(self, file_path, batches, progress):
+        """Write batches to a CSV file with a header row; returns the rows written."""
+        written = 0
+        with open(file_path, 'w', newline='', encoding='utf-8') as export_file:
+            writer = csv.writer(export_file)
+            for columns, rows in batches:
+                if not written:
+                    writer.writerow(columns)
+                writer.writerows(rows)
+                written += len(rows)
+                progress(written)
+        return written
+        
+    def write_jsonl(self, file_path, batches, progress):
+        """Write batches to a JSON Lines file, one object per row; returns the rows written."""
+        written = 0
+        with open(file_path, 'w', encoding='utf-8') as export_file:
+            for columns, rows in batches:
+                export_file.writelines(json.dumps(dict(zip(columns, row))) + "\n" for row in rows)
+                written += len(rows)
+                progress(written)
+        return written
+        
+    def write_parquet(self, file_path, batches, progress):
+        """Write batches to a Parquet file, one row group per batch; returns the rows written."""
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        
+        written = 0
+        writer = None
+        try:
+            for columns, rows in batches:
+                if writer is None:
+                    schema = pa.schema([(column, PARQUET_TYPES.get(column, "string")) for column in columns])
+                    writer = pq.ParquetWriter(file_path, schema)
+                arrays = [list(values) for values in zip(*rows)] or [[] for _ in columns]
+                writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+                written += len(rows)
+                progress(written)
+        finally:
+            if writer is not None:
+                writer.close()
+        return written
+        
+    def export_table(self, table, user_id, file_path, export_format="csv", progress=None):
+        """Export one of a user's tables to a file.
+        
+        Args:
+            table: One of database.EXPORT_TABLES.
+            user_id: User whose data is exported.
+            file_path: File written; an empty table still gets its header or schema.
+            export_format: One of EXPORT_FORMATS.
+            progress: Optional callable called with (table, rows_written)
+                after each batch.
+                
+        Returns:
+            The number of rows written.
+        """
+        writers = {"csv": self.write_csv, "jsonl": self.write_jsonl, "parquet": self.write_parquet}
+        
+        def batches():
+            for batch in self.db.iter_export_rows(table, user_id, self.batch_size):
+                yield batch
+                if self.stop_requested:
+                    return
+                    
+        def on_batch(written):
+            if progress:
+                progress(table, written)
+                
+        return writers[export_format](file_path, batches(), on_batch)
+        
+    def run(self, user_id, directory, export_format="csv", tables=EXPORT_TABLES, progress=None):
+        """Export a user's tables into a directory, one file per table.
+        
+        Meant to run on a background thread for large price histories.
+        
+        Args:
+            user_id: User whose data is exported.
+            directory: Directory the files are written to, created if missing.
+            export_format: One of EXPORT_FORMATS.
+            tables: Tables to export.
+            progress: Optional callable called with (table, rows_written)
+                after each batch.
+                
+        Returns:
+            A (files, error) tuple; files maps each exported table to a
+            (file_path, rows_written) tuple.
+        """
+        if export_format not in EXPORT_FORMATS:
+            return {}, f"Unknown export format: {export_format}"
+        if export_format == "parquet" and not parquet_available():
+            return {}, "Parquet export needs pyarrow; install it with 'pip install pyarrow'"
+            
+        self.stop_requested = False
+        try:
+            os.makedirs(directory, exist_ok=True)
+        except OSError as e:
+            return {}, f"Error creating export directory {directory}: {str(e)}"
+            
+        files = {}
+        table = None
+        try:
+            for table in tables:
+                if self.stop_requested:
+                    break
+                    
+                file_path = os.path.join(directory, f"{table}.{EXPORT_FORMATS[export_format]}")
+                files[table] = (file_path, self.export_table(table, user_id, file_path, export_format, progress))
+        except Exception as e:
+            return files, f"Error exporting {table}: {str(e)}"
+            
+        return files, None
+
+def main():
+    """Export a user's data from the command line, without starting the UI."""
+    parser = argparse.ArgumentParser(description="Export a CryptoJandie user's holdings, transactions and price history.")
+    parser.add_argument("username", help="User whose data is exported")
+    parser.add_argument("directory", help="Directory the export files are written to")
+    parser.add_argument("--format", choices=list(EXPORT_FORMATS), default="csv", help="File format (default: csv)")
+    parser.add_argument("--tables", nargs="+", choices=EXPORT_TABLES, default=list(EXPORT_TABLES), help="Tables to export (default: all)")
+    parser.add_argument("--db", default="cryptojandie.db", help="Database file (default: cryptojandie.db)")
+    args = parser.parse_args()
+    
+    db = Database(args.db)
+    try:
+        user = db.get_user(args.username)
+        if not user:
+            parser.exit(1, f"Unknown user: {args.username}\n")
+            
+        def progress(table, written):
+            print(f"\r{table}: {written} rows", end="", flush=True)
+            
+        files, error = DataExporter(db).run(user['id'], args.directory, args.format, args.tables, progress)
+        print()
+        for table, (file_path, written) in files.items():
+            print(f"{table}: {written} rows -> {file_path}")
+        if error:
+            parser.exit(1, f"{error}\n")
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,500 @@
+import csv
+import hashlib
+import itertools
+import os
+from bisect import bisect_right
+
+from exchanges import EXCHANGE_FORMATS, USD_CURRENCIES, detect_format
+
+class CsvImporter:
+    def __init__(self, db, chunk_size=1000, max_messages=100):
+        """Initialize the streaming CSV holdings importer.
+        
+        The file is read row by row and inserted in chunks, one transaction
+        per chunk, so large exchange exports neither load into memory at
+        once nor commit once per row.
+        
+        Args:
+            db: Database the holdings and their BUY transactions are added to.
+            chunk_size: Number of rows inserted per transaction.
+            max_messages: Maximum number of success messages kept for display;
+                errors are always all kept.
+        """
+        self.db = db
+        self.chunk_size = chunk_size
+        self.max_messages = max_messages
+        self.stop_requested = False
+        
+    def stop(self):
+        """Ask a running import to stop after the current chunk."""
+        self.stop_requested = True
+        
+    def parse_row(self, row, asset_ids):
+        """Validate one CSV row.
+        
+        Args:
+            row: Dict of the row's columns: symbol, amount, purchase_price and
+                optionally notes.
+            asset_ids: Dict mapping asset symbols to ids.
+            
+        Returns:
+            A (record, error) tuple; record is an (asset_id, amount,
+            purchase_price, notes) tuple.
+        """
+        symbol = (row.get('symbol') or '').strip().upper()
+        amount = (row.get('amount') or '').strip()
+        purchase_price = (row.get('purchase_price') or '').strip()
+        # A short row leaves its last columns empty; a missing price is not $0
+        if not symbol or not amount or not purchase_price:
+            return None, f"Invalid data for row: {row}"
+            
+        try:
+            amount = float(amount)
+            purchase_price = float(purchase_price)
+        except ValueError as e:
+            return None, f"Invalid number for {symbol}: {str(e)}"
+            
+        if amount <= 0:
+            return None, f"Invalid data for row: {row}"
+            
+        asset_id = asset_ids.get(symbol)
+        if asset_id is None:
+            return None, f"Asset not found: {symbol}"
+            
+        return (asset_id, amount, purchase_price, row.get('notes') or ''), None
+        
+    def read_rows(self, csv_file, position):
+        """Read the rows of a binary CSV file, tracking how many bytes were consumed.
+        
+        Returns:
+            A csv.DictReader; position[0] holds the bytes read so far.
+        """
+        def lines():
+            for line in csv_file:
+                position[0] += len(line)
+                # A BOM can only open the first line
+                yield line.decode('utf-8-sig')
+                
+        return csv.DictReader(lines())
+        
+    def insert_chunk(self, user_id, chunk, results):
+        """Insert a chunk of parsed rows, isolating failing rows if the chunk fails.
+        
+        Args:
+            user_id: User the holdings belong to.
+            chunk: List of (line_number, symbol, record) tuples.
+            results: Results dict updated with the outcome of every row.
+        """
+        try:
+            self.db.bulk_add_holdings(user_id, [record for _, _, record in chunk])
+            inserted = chunk
+        except Exception as e:
+            if len(chunk) == 1:
+                line_number, symbol, _ = chunk[0]
+                results["errors"].append(f"Line {line_number}: Failed to add holding for {symbol} - {str(e)}")
+                return
+                
+            # The batch was rolled back; retry row by row to find the bad ones
+            inserted = []
+            for entry in chunk:
+                errors_before = len(results["errors"])
+                self.insert_chunk(user_id, [entry], results)
+                if len(results["errors"]) == errors_before:
+                    inserted.append(entry)
+                    
+        results["imported"] += len(inserted)
+        for _, symbol, (_, amount, purchase_price, _) in inserted:
+            if len(results["success"]) >= self.max_messages:
+                break
+            results["success"].append(f"Added {amount} {symbol} at ${purchase_price}")
+            
+    def run(self, file_path, user_id, progress=None):
+        """Import holdings from a CSV file.
+        
+        Meant to run on a background thread. Invalid rows are reported and
+        skipped without aborting the import.
+        
+        Args:
+            file_path: Path to a CSV file with symbol, amount, purchase_price
+                and optional notes columns.
+            user_id: User the holdings are added for.
+            progress: Optional callable called with (rows_done, bytes_read,
+                total_bytes) after each chunk.
+                
+        Returns:
+            A dict with imported (number of holdings added), success (up to
+            max_messages messages) and errors (one message per failed row).
+        """
+        self.stop_requested = False
+        results = {"imported": 0, "success": [], "errors": []}
+        
+        try:
+            # One query instead of a lookup per row
+            asset_ids = self.db.get_asset_ids_by_symbol()
+            total_bytes = os.path.getsize(file_path)
+            position = [0]
+            rows_done = 0
+            chunk = []
+            
+            with open(file_path, 'rb') as csv_file:
+                reader = self.read_rows(csv_file, position)
+                for row in reader:
+                    rows_done += 1
+                    record, error = self.parse_row(row, asset_ids)
+                    if error:
+                        results["errors"].append(f"Line {reader.line_num}: {error}")
+                    else:
+                        chunk.append((reader.line_num, row['symbol'].strip().upper(), record))
+                        
+                    if rows_done % self.chunk_size == 0:
+                        self.insert_chunk(user_id, chunk, results)
+                        chunk = []
+                        if progress:
+                            progress(rows_done, position[0], total_bytes)
+                        if self.stop_requested:
+                            break
+                            
+                if chunk:
+                    self.insert_chunk(user_id, chunk, results)
+                    
+            if progress:
+                progress(rows_done, position[0], total_bytes)
+        except Exception as e:
+            results["errors"].append(f"Error reading CSV file: {str(e)}")
+            
+        return results
+
+class ExchangeImporter:
+    def __init__(self, db, chunk_size=5000, header_lines=20, max_messages=100):
+        """Initialize the exchange export importer.
+        
+        Trades, rewards and fees are read from a registered exchange CSV
+        layout (see exchanges.EXCHANGE_FORMATS), recorded as BUY, SELL and
+        STAKING transactions and applied to the user's holdings. Each row's
+        transactions carry a hash of the row, so importing the same export
+        twice adds nothing the second time.
+        
+        Args:
+            db: Database the transactions are recorded in.
+            chunk_size: Number of CSV rows applied per transaction.
+            header_lines: Lines searched for the header row; some exports
+                open with a preamble.
+            max_messages: Maximum number of success messages kept for display.
+        """
+        self.db = db
+        self.chunk_size = chunk_size
+        self.header_lines = header_lines
+        self.max_messages = max_messages
+        self.stop_requested = False
+        self.asset_ids = {}
+        self.symbols = {}
+        self.closes = {}
+        self.changed_asset_ids = set()
+        self.unpriced_hashes = set()
+        
+    def stop(self):
+        """Ask a running import to stop after the current chunk."""
+        self.stop_requested = True
+        
+    def open_rows(self, csv_file, position, format_name=None):
+        """Find the header row of an export and read the rows below it.
+        
+        Args:
+            csv_file: CSV file opened in binary mode.
+            position: One-item list updated with the bytes read so far.
+            format_name: Optional registered format name; detected from the
+                header if not given.
+                
+        Returns:
+            A (format, reader, header_line) tuple; reader is a csv.DictReader
+            and header_line the 1-based line number of the header.
+        """
+        def lines():
+            for line in csv_file:
+                position[0] += len(line)
+                yield line.decode('utf-8-sig')
+                
+        stream = lines()
+        preamble = []
+        for line in itertools.islice(stream, self.header_lines):
+            preamble.append(line)
+            header = next(csv.reader([line]), [])
+            if format_name:
+                exchange_format = EXCHANGE_FORMATS[format_name]
+                if not exchange_format.matches(header):
+                    continue
+            else:
+                exchange_format = detect_format(header)
+                if exchange_format is None:
+                    continue
+                    
+            return exchange_format, csv.DictReader(itertools.chain([line], stream)), len(preamble)
+            
+        raise ValueError("Unrecognized exchange export; no known header found")
+        
+    @classmethod
+    def detect(cls, file_path, header_lines=20):
+        """Get the registered format of an export file, or None if it is not one."""
+        with open(file_path, 'rb') as csv_file:
+            for line in itertools.islice(csv_file, header_lines):
+                # A file that is not UTF-8 is no known export; leave reporting it to the importer
+                exchange_format = detect_format(next(csv.reader([line.decode('utf-8-sig', errors='replace')]), []))
+                if exchange_format:
+                    return exchange_format
+        return None
+        
+    def get_usd_rate(self, currency, timestamp):
+        """Get the USD value of one unit of a currency at a UTC timestamp.
+        
+        Assets are valued at the close of their stored daily candle.
+        
+        Returns:
+            The rate, or None if the currency has no stored price history.
+        """
+        if currency in USD_CURRENCIES:
+            return 1.0
+            
+        asset_id = self.asset_ids.get(currency)
+        if asset_id is None:
+            return None
+            
+        if asset_id not in self.closes:
+            candles = self.db.get_candles([asset_id], "1d", "1970-01-01 00:00:00")[asset_id]
+            self.closes[asset_id] = (
+                [candle['bucket_start'] for candle in candles],
+                [candle['close'] for candle in candles]
+            )
+            
+        bucket_starts, values = self.closes[asset_id]
+        position = bisect_right(bucket_starts, timestamp) - 1
+        return values[position] if position >= 0 else None
+        
+    def to_record(self, entry, source_hash):
+        """Turn a parsed entry into an add_imported_transactions() row.
+        
+        Returns:
+            A (record, error) tuple.
+        """
+        asset_id = self.asset_ids.get(entry['symbol'])
+        if asset_id is None:
+            return None, f"Asset not found: {entry['symbol']}"
+            
+        notes = entry['notes']
+        rate = self.get_usd_rate(entry['currency'], entry['timestamp'])
+        if rate is not None:
+            price = entry['price'] * rate
+        elif entry['currency'] == entry['symbol']:
+            price = 0.0
+            notes += " (no price)"
+        else:
+            # Kept as quoted rather than guessed, e.g. trades priced in EUR
+            price = entry['price']
+            notes += f" (price in {entry['currency']})"
+            self.unpriced_hashes.add(source_hash)
+            
+        return (asset_id, entry['transaction_type'], entry['amount'], price, entry['timestamp'], notes, source_hash), None
+        
+    def apply_chunk(self, user_id, chunk, results):
+        """Record a chunk of transactions and apply them to the holdings.
+        
+        If the chunk fails it is retried row by row, so only the failing
+        rows are lost.
+        
+        Args:
+            user_id: User the transactions belong to.
+            chunk: List of (line_number, records) tuples, one per CSV row.
+            results: Results dict updated with the outcome of every row.
+        """
+        try:
+            with self.db.batch():
+                records = [record for _, row_records in chunk for record in row_records]
+                inserted = self.db.add_imported_transactions(user_id, records)
+                
+                changes = {}
+                for asset_id, transaction_type, amount, price, _, _, source_hash in inserted:
+                    amount_delta, bought_amount, bought_cost = changes.get(asset_id, (0.0, 0.0, 0.0))
+                    if transaction_type == "SELL":
+                        amount_delta -= amount
+                    else:
+                        amount_delta += amount
+                    # Prices left in another currency stay out of the USD cost basis
+                    if transaction_type == "BUY" and source_hash not in self.unpriced_hashes:
+                        bought_amount += amount
+                        bought_cost += amount * price
+                    changes[asset_id] = (amount_delta, bought_amount, bought_cost)
+                self.db.apply_holding_changes(user_id, changes)
+        except Exception as e:
+            if len(chunk) == 1:
+                results["errors"].append(f"Line {chunk[0][0]}: Failed to import - {str(e)}")
+                return
+                
+            for row in chunk:
+                self.apply_chunk(user_id, [row], results)
+            return
+            
+        results["imported"] += len(inserted)
+        results["duplicates"] += len(records) - len(inserted)
+        self.changed_asset_ids.update(changes)
+        for asset_id, transaction_type, amount, _, timestamp, _, _ in inserted[:self.max_messages - len(results["success"])]:
+            results["success"].append(f"{timestamp}: {transaction_type} {amount} {self.symbols[asset_id]}")
+            
+    def run(self, file_path, user_id, format_name=None, progress=None):
+        """Import an exchange export.
+        
+        Meant to run on a background thread. Rows that fail to parse are
+        reported and skipped without aborting the import.
+        
+        Args:
+            file_path: Path to the exported CSV file.
+            user_id: User the transactions are recorded for.
+            format_name: Optional registered format name; detected if not given.
+            progress: Optional callable called with (rows_done, bytes_read,
+                total_bytes) after each chunk.
+                
+        Returns:
+            A dict with format (the detected layout), imported (transactions
+            added), duplicates (transactions already imported), ignored (rows
+            that are not trades or rewards), success (up to max_messages
+            messages) and errors (one message per failed row).
+        """
+        self.stop_requested = False
+        self.closes = {}
+        self.changed_asset_ids = set()
+        self.unpriced_hashes = set()
+        results = {"format": None, "imported": 0, "duplicates": 0, "ignored": 0, "success": [], "errors": []}
+        
+        try:
+            self.asset_ids = self.db.get_asset_ids_by_symbol()
+            self.symbols = {asset_id: symbol for symbol, asset_id in self.asset_ids.items()}
+            total_bytes = os.path.getsize(file_path)
+            position = [0]
+            rows_done = 0
+            chunk = []
+            previous_digest = None
+            occurrence = 0
+            
+            with open(file_path, 'rb') as csv_file:
+                exchange_format, reader, header_line = self.open_rows(csv_file, position, format_name)
+                results["format"] = exchange_format.name
+                
+                for row in reader:
+                    rows_done += 1
+                    line_number = header_line + reader.line_num - 1
+                    
+                    try:
+                        # Identical rows (fills of one order in the same second)
+                        # are told apart by their position in the run
+                        fields = [str(row.get(name) or "") for name in reader.fieldnames]
+                        digest = hashlib.sha1("\x1f".join([exchange_format.name, *fields]).encode()).hexdigest()
+                        occurrence = occurrence + 1 if digest == previous_digest else 0
+                        previous_digest = digest
+                        
+                        entries = exchange_format.parse_row(row)
+                    except Exception as e:
+                        results["errors"].append(f"Line {line_number}: {str(e)}")
+                        entries = None
+                        
+                    if entries == []:
+                        results["ignored"] += 1
+                    elif entries:
+                        records = []
+                        for index, entry in enumerate(entries):
+                            record, error = self.to_record(entry, f"{digest}:{occurrence}:{index}")
+                            if error:
+                                results["errors"].append(f"Line {line_number}: {error}")
+                                records = None
+                                break
+                            records.append(record)
+                        if records:
+                            chunk.append((line_number, records))
+                            
+                    if rows_done % self.chunk_size == 0:
+                        if chunk:
+                            self.apply_chunk(user_id, chunk, results)
+                        chunk = []
+                        if progress:
+                            progress(rows_done, position[0], total_bytes)
+                        if self.stop_requested:
+                            break
+                            
+                if chunk:
+                    self.apply_chunk(user_id, chunk, results)
+                    
+            if progress:
+                progress(rows_done, position[0], total_bytes)
+        except Exception as e:
+            results["errors"].append(f"Error reading export: {str(e)}")
+            
+        # Holdings may dip below zero mid-import when a sale is read before its purchase
+        try:
+            self.db.delete_empty_holdings(user_id, self.changed_asset_ids)
+        except Exception as e:
+            results["errors"].append(f"Error removing emptied holdings: {str(e)}")
+        return results
+        
+def create_importer(db, file_path):
+    """Get the importer for a CSV file: ExchangeImporter for a known exchange export, else CsvImporter."""
+    if ExchangeImporter.detect(file_path):
+        return ExchangeImporter(db)
+    return CsvImporter(db)
+
+def benchmark(row_count=300000):
+    """Time importing a generated Binance trade history into a scratch database, twice.
+    
+    Returns:
+        A dict with the row count and the rows per second and results of the
+        first import and of the repeated, fully duplicate one.
+    """
+    import tempfile
+    import time
+    from datetime import datetime, timedelta
+    
+    from database import Database
+    
+    with tempfile.TemporaryDirectory() as directory:
+        file_path = os.path.join(directory, "binance.csv")
+        start = datetime(2021, 1, 1)
+        with open(file_path, 'w', newline='') as csv_file:
+            writer = csv.writer(csv_file)
+            writer.writerow(["Date(UTC)", "Pair", "Side", "Price", "Executed", "Amount", "Fee"])
+            for i in range(row_count):
+                base = ("BTC", "ETH", "SOL")[i % 3]
+                side = "BUY" if i % 4 else "SELL"
+                price = 100.0 + i % 997
+                amount = 0.01 + (i % 13) / 100
+                fee = f"{amount * price * 0.001:.8f}USDT" if i % 2 else "0.0001BNB"
+                writer.writerow([
+                    (start + timedelta(seconds=i * 60)).strftime("%Y-%m-%d %H:%M:%S"),
+                    f"{base}USDT", side, price, f"{amount:.8f}{base}", f"{amount * price:.8f}USDT", fee
+                ])
+                
+        db = Database(os.path.join(directory, "benchmark.db"))
+        db.initialize_default_assets()
+        if not db.get_asset_by_symbol("BNB"):
+            db.add_asset("BNB", "BNB", "binancecoin")
+        user_id = db.add_user("benchmark")
+        importer = ExchangeImporter(db)
+        
+        results = {"rows": row_count}
+        for run in ("first", "repeat"):
+            started = time.perf_counter()
+            outcome = importer.run(file_path, user_id)
+            elapsed = time.perf_counter() - started
+            results[run] = {
+                "rows_per_second": row_count / elapsed,
+                "imported": outcome["imported"],
+                "duplicates": outcome["duplicates"],
+                "errors": len(outcome["errors"])
+            }
+        db.close()
+        return results
+        
+if __name__ == "__main__":
+    results = benchmark()
+    print(f"Binance trade history, {results['rows']} rows:")
+    for run in ("first", "repeat"):
+        outcome = results[run]
+        print(
+            f"  {run:6} import {outcome['rows_per_second']:10,.0f} rows/s  "
+            f"imported {outcome['imported']}  duplicates {outcome['duplicates']}  errors {outcome['errors']}"
+        )
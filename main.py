@@ -9,13 +9,18 @@ import tkinter.messagebox as messagebox
 
 # Import our modules
 from database import Database
-from api import CryptoAPI
+from api import CryptoAPI, AsyncCryptoAPI
+from backfill import PriceBackfill
+from cache import PriceCache
+from coin_index import CoinIndex
+from portfolio import PortfolioEngine
+from refresher import PriceRefresher
+from retention import PriceRetention
+from charts import ChartRenderer
 from ui.login import LoginScreen
-from ui.dashboard import PortfolioDashboard
-from ui.assets import AssetManagement
-from ui.analysis import AnalysisDashboard
-from ui.staking import StakingDashboard
-from ui.settings import SettingsPage
+
+# The other screens are imported when first shown, so the login screen
+# comes up without loading them; see startup.py for the time budget
 
 # Set appearance mode and default color theme
 ctk.set_appearance_mode("dark")  # Options: "dark" (default), "light", "system"
@@ -33,6 +38,26 @@ class CryptoJandieApp:
         self.db = Database()
         self.db.initialize_default_assets()
         self.api = CryptoAPI()
+        self.price_cache = PriceCache(self.api, self.db, AsyncCryptoAPI(self.api))
+        self.price_cache.load_from_db()
+        self.price_refresher = PriceRefresher(self.root, self.db, self.api, self.price_cache)
+        
+        # Holdings valuation shared by every tab
+        self.portfolio = PortfolioEngine(self.db)
+        
+        # Charts of every tab are drawn offscreen on one shared render thread
+        self.chart_renderer = ChartRenderer()
+        
+        # Load the coin list for asset lookup, downloading it when stale
+        self.coin_index = CoinIndex(self.api, self.db)
+        threading.Thread(target=self.coin_index.refresh_if_stale, daemon=True).start()
+        
+        # Backfill price history for the 24h change and charts; resumes from
+        # the last stored point and is paced by the API rate limiter. Old
+        # history is then thinned so the database stops growing.
+        self.price_retention = PriceRetention(self.db, raw_days=30, hourly_days=365)
+        self.price_backfill = PriceBackfill(self.api, self.db, retention=self.price_retention)
+        threading.Thread(target=self.maintain_price_history, daemon=True).start()
         
         # Configure the root layout
         self.root.grid_rowconfigure(0, weight=1)
@@ -47,6 +72,14 @@ class CryptoJandieApp:
         # Show login screen
         self.show_login_screen()
         
+    def maintain_price_history(self):
+        """Backfill missing price history, then apply the retention policy."""
+        self.price_backfill.run()
+        try:
+            self.price_retention.run()
+        except Exception as e:
+            print(f"Error applying price retention: {str(e)}")
+            
     def show_login_screen(self):
         """Show the login screen."""
         # Destroy current frame if exists
@@ -109,6 +142,9 @@ class CryptoJandieApp:
             tab.grid_rowconfigure(0, weight=1)
             tab.grid_columnconfigure(0, weight=1)
         
+        from ui.dashboard import PortfolioDashboard
+        from ui.assets import AssetManagement
+        
         # Load dashboard content
         print("Initializing Dashboard...")
         self.dashboard = PortfolioDashboard(
@@ -116,7 +152,9 @@ class CryptoJandieApp:
             self.current_user, 
             self.db, 
             self.api,
-            self.refresh_prices
+            self.refresh_prices,
+            self.portfolio,
+            self.chart_renderer
         )
         self.dashboard.grid(row=0, column=0, padx=0, pady=0, sticky="nsew")
         
@@ -127,7 +165,9 @@ class CryptoJandieApp:
             self.current_user,
             self.db,
             self.api,
-            self.refresh_prices
+            self.refresh_prices,
+            self.coin_index,
+            self.portfolio
         )
         self.assets.grid(row=0, column=0, padx=0, pady=0, sticky="nsew")
         
@@ -268,11 +308,14 @@ class CryptoJandieApp:
             self.analysis_frame.destroy()
             
             # Create the actual Analysis Dashboard
+            from ui.analysis import AnalysisDashboard
             self.analysis = AnalysisDashboard(
                 self.tab_analysis,
                 self.current_user,
                 self.db,
-                self.api
+                self.api,
+                self.portfolio,
+                self.chart_renderer
             )
             self.analysis.grid(row=0, column=0, padx=0, pady=0, sticky="nsew")
             print("Analysis Dashboard loaded successfully")
@@ -290,11 +333,13 @@ class CryptoJandieApp:
             self.staking_frame.destroy()
             
             # Create the actual Staking Dashboard
+            from ui.staking import StakingDashboard
             self.staking = StakingDashboard(
                 self.tab_staking,
                 self.current_user,
                 self.db,
-                self.api
+                self.api,
+                chart_renderer=self.chart_renderer
             )
             self.staking.grid(row=0, column=0, padx=0, pady=0, sticky="nsew")
             print("Staking Dashboard loaded successfully")
@@ -312,6 +357,7 @@ class CryptoJandieApp:
             self.settings_frame.destroy()
             
             # Create the actual Settings Page
+            from ui.settings import SettingsPage
             self.settings_page = SettingsPage(
                 self.tab_settings,
                 self.current_user,
@@ -329,61 +375,27 @@ class CryptoJandieApp:
         
     def logout(self):
         """Handle user logout."""
+        self.portfolio.invalidate(self.current_user['id'])
         self.current_user = None
         self.show_login_screen()
         
-    def refresh_prices(self):
-        """Refresh cryptocurrency prices from API."""
-        # Get all assets
-        self.cursor = self.db.connection.cursor()
-        self.cursor.execute("SELECT id, coingecko_id FROM assets WHERE coingecko_id IS NOT NULL")
-        assets = self.cursor.fetchall()
-        
-        # Filter out assets without CoinGecko ID
-        assets_with_id = [asset for asset in assets if asset['coingecko_id']]
+    def refresh_prices(self, on_complete=None):
+        """Refresh cryptocurrency prices from API in the background.
         
-        if not assets_with_id:
-            return
-            
-        # Check API cooldown
-        if not self.api.can_make_request():
-            remaining = int(self.api.get_remaining_cooldown())
-            print(f"API cooldown active. Please wait {remaining} seconds.")
-            return
-            
-        # Split assets into batches to avoid too long URLs
-        batch_size = 50
-        asset_batches = [assets_with_id[i:i + batch_size] for i in range(0, len(assets_with_id), batch_size)]
+        on_complete is called on the Tk main loop with the number of prices
+        updated once the refresh finishes. Repeated calls while a refresh is
+        running attach to it instead of starting another fetch.
+        """
+        # Callbacks run in order, so the shared portfolio is revalued before any tab reloads
+        started = self.price_refresher.refresh(self.on_prices_refreshed)
+        self.price_refresher.refresh(on_complete)
+        return started
         
-        updated_count = 0
+    def on_prices_refreshed(self, updated_count):
+        """Apply freshly stored prices to the shared portfolio valuation."""
+        if updated_count:
+            self.portfolio.reload_prices()
         
-        # Process each batch
-        for batch in asset_batches:
-            coingecko_ids = [asset['coingecko_id'] for asset in batch]
-            
-            # Get prices from API
-            prices, error = self.api.get_multiple_prices(coingecko_ids)
-            
-            if error:
-                print(f"API Error: {error}")
-                continue
-                
-            if not prices:
-                continue
-                
-            # Update prices in database
-            for asset in batch:
-                asset_id = asset['id']
-                coingecko_id = asset['coingecko_id']
-                
-                if coingecko_id in prices:
-                    price_data = prices[coingecko_id]
-                    self.db.add_price(asset_id, price_data['price_usd'], "api")
-                    self.db.update_asset_market_cap(asset_id, price_data.get('market_cap', 0))
-                    updated_count += 1
-                    
-        print(f"Updated prices for {updated_count} assets")
-
     def check_initial_tab(self):
         """Check if initial tab content is loaded and load if not."""
         current_tab = self.tabview.get()
@@ -1,7 +1,10 @@
-from datetime import datetime
+from array import array
+from datetime import datetime, timezone
 import json
 
 class User:
+    __slots__ = ("id", "username", "created_at", "last_login", "settings", "password")
+    
     def __init__(self, id=None, username=None, created_at=None, last_login=None, settings=None, password=None):
         self.id = id
         self.username = username
@@ -44,6 +47,8 @@ class User:
         }
 
 class Asset:
+    __slots__ = ("id", "symbol", "name", "coingecko_id", "market_cap", "last_updated")
+    
     def __init__(self, id=None, symbol=None, name=None, coingecko_id=None, market_cap=0, last_updated=None):
         self.id = id
         self.symbol = symbol
@@ -79,6 +84,9 @@ class Asset:
         }
 
 class Price:
+    # Slots drop the per-instance __dict__; loaded price history can hold millions of these
+    __slots__ = ("id", "asset_id", "price_usd", "timestamp", "source")
+    
     def __init__(self, id=None, asset_id=None, price_usd=None, timestamp=None, source=None):
         self.id = id
         self.asset_id = asset_id
@@ -111,6 +119,8 @@ class Price:
         }
 
 class Holding:
+    __slots__ = ("id", "user_id", "asset_id", "amount", "purchase_price_per_unit", "purchase_date", "notes", "symbol", "name", "market_cap")
+    
     def __init__(self, id=None, user_id=None, asset_id=None, amount=None, 
                  purchase_price_per_unit=None, purchase_date=None, notes=None,
                  symbol=None, name=None, market_cap=None):
@@ -182,6 +192,8 @@ class Holding:
         }
 
 class Transaction:
+    __slots__ = ("id", "user_id", "asset_id", "transaction_type", "amount", "price_per_unit", "timestamp", "notes", "symbol", "name")
+    
     def __init__(self, id=None, user_id=None, asset_id=None, transaction_type=None, 
                  amount=None, price_per_unit=None, timestamp=None, notes=None,
                  symbol=None, name=None):
@@ -234,4 +246,274 @@ class Transaction:
         
     def total_value(self):
         """Calculate total value of the transaction."""
-        return self.amount * self.price_per_unit 
\ No newline at end of file
+        return self.amount * self.price_per_unit
+
+def to_epoch(timestamp):
+    """Convert a timestamp to integer UTC epoch seconds.
+    
+    Accepts epoch numbers, datetimes (naive ones are taken as UTC) and
+    strings formatted like SQLite's CURRENT_TIMESTAMP.
+    """
+    if isinstance(timestamp, (int, float)):
+        return int(timestamp)
+    if isinstance(timestamp, str):
+        timestamp = datetime.fromisoformat(timestamp)
+    if timestamp.tzinfo is None:
+        timestamp = timestamp.replace(tzinfo=timezone.utc)
+    return int(timestamp.timestamp())
+
+def from_epoch(seconds):
+    """Format UTC epoch seconds like SQLite's CURRENT_TIMESTAMP."""
+    return datetime.fromtimestamp(seconds, timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+
+def row_columns(rows, columns):
+    """Split rows into one sequence per column.
+    
+    Rows may be mappings (dicts, sqlite3.Row) keyed by column name or
+    tuples in column order.
+    """
+    if not rows:
+        return [() for _ in columns]
+    if isinstance(rows[0], (tuple, list)):
+        return list(zip(*rows))
+    return [[row[column] for row in rows] for column in columns]
+
+class PriceSeries:
+    """Price history stored column-wise in typed arrays.
+    
+    A row costs about 33 bytes instead of a Price object plus its boxed
+    fields. Rows are materialized as Price objects only when indexed.
+    """
+    __slots__ = ("ids", "asset_ids", "prices", "timestamps", "source_codes", "sources")
+    
+    COLUMNS = ("id", "asset_id", "price_usd", "timestamp", "source")
+    
+    def __init__(self):
+        self.ids = array("q")
+        self.asset_ids = array("q")
+        self.prices = array("d")
+        self.timestamps = array("q")  # UTC epoch seconds
+        self.source_codes = array("B")  # Index into sources
+        self.sources = []
+        
+    @classmethod
+    def from_rows(cls, rows):
+        """Build a series from price rows in one pass per column.
+        
+        Args:
+            rows: Mappings or tuples with id, asset_id, price_usd, timestamp
+                and source; timestamps may be epoch seconds or strings.
+        """
+        rows = rows if isinstance(rows, list) else list(rows)
+        ids, asset_ids, prices, timestamps, sources = row_columns(rows, cls.COLUMNS)
+        
+        series = cls()
+        series.ids.extend(ids)
+        series.asset_ids.extend(asset_ids)
+        series.prices.extend(prices)
+        series.timestamps.extend(map(to_epoch, timestamps))
+        
+        # Sources repeat a handful of values, so store each as a one-byte code
+        source_codes = {}
+        for source in sources:
+            if source not in source_codes:
+                source_codes[source] = len(series.sources)
+                series.sources.append(source)
+        series.source_codes.extend(source_codes[source] for source in sources)
+        return series
+        
+    def append(self, id, asset_id, price_usd, timestamp, source):
+        """Add one price row."""
+        if source not in self.sources:
+            self.sources.append(source)
+        self.ids.append(id)
+        self.asset_ids.append(asset_id)
+        self.prices.append(price_usd)
+        self.timestamps.append(to_epoch(timestamp))
+        self.source_codes.append(self.sources.index(source))
+        
+    def __len__(self):
+        return len(self.ids)
+        
+    def __getitem__(self, index):
+        """Materialize one row as a Price."""
+        return Price(
+            id=self.ids[index],
+            asset_id=self.asset_ids[index],
+            price_usd=self.prices[index],
+            timestamp=from_epoch(self.timestamps[index]),
+            source=self.sources[self.source_codes[index]]
+        )
+        
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self[index]
+            
+    def nbytes(self):
+        """Get the size of the column buffers in bytes."""
+        return sum(column.itemsize * len(column) for column in (self.ids, self.asset_ids, self.prices, self.timestamps, self.source_codes))
+        
+    def to_numpy(self):
+        """Get zero-copy NumPy views of the numeric columns."""
+        # NumPy is only needed for this view, so the model module stays light to import
+        import numpy as np
+        
+        return {
+            "id": np.frombuffer(self.ids, dtype=np.int64),
+            "asset_id": np.frombuffer(self.asset_ids, dtype=np.int64),
+            "price_usd": np.frombuffer(self.prices, dtype=np.float64),
+            "timestamp": np.frombuffer(self.timestamps, dtype=np.int64)
+        }
+
+class TransactionLog:
+    """Transactions stored column-wise in typed arrays.
+    
+    Transaction types are stored as one-byte codes, notes only where set
+    and symbol and name once per asset.
+    """
+    __slots__ = ("ids", "user_ids", "asset_ids", "type_codes", "amounts", "prices_per_unit", "timestamps", "types", "notes", "assets")
+    
+    COLUMNS = ("id", "user_id", "asset_id", "transaction_type", "amount", "price_per_unit", "timestamp", "notes", "symbol", "name")
+    
+    def __init__(self):
+        self.ids = array("q")
+        self.user_ids = array("q")
+        self.asset_ids = array("q")
+        self.type_codes = array("B")  # Index into types
+        self.amounts = array("d")
+        self.prices_per_unit = array("d")
+        self.timestamps = array("q")  # UTC epoch seconds
+        self.types = []
+        self.notes = {}  # row index -> notes, only for rows that have them
+        self.assets = {}  # asset_id -> (symbol, name)
+        
+    @classmethod
+    def from_rows(cls, rows):
+        """Build a log from transaction rows in one pass per column.
+        
+        Args:
+            rows: Mappings or tuples with id, user_id, asset_id,
+                transaction_type, amount, price_per_unit, timestamp, notes,
+                symbol and name; timestamps may be epoch seconds or strings.
+        """
+        rows = rows if isinstance(rows, list) else list(rows)
+        ids, user_ids, asset_ids, types, amounts, prices, timestamps, notes, symbols, names = row_columns(rows, cls.COLUMNS)
+        
+        log = cls()
+        log.ids.extend(ids)
+        log.user_ids.extend(user_ids)
+        log.asset_ids.extend(asset_ids)
+        log.amounts.extend(amounts)
+        log.prices_per_unit.extend(prices)
+        log.timestamps.extend(map(to_epoch, timestamps))
+        
+        type_codes = {}
+        for transaction_type in types:
+            if transaction_type not in type_codes:
+                type_codes[transaction_type] = len(log.types)
+                log.types.append(transaction_type)
+        log.type_codes.extend(type_codes[transaction_type] for transaction_type in types)
+        
+        log.notes = {index: note for index, note in enumerate(notes) if note}
+        log.assets = dict(zip(asset_ids, zip(symbols, names)))
+        return log
+        
+    def __len__(self):
+        return len(self.ids)
+        
+    def __getitem__(self, index):
+        """Materialize one row as a Transaction."""
+        asset_id = self.asset_ids[index]
+        symbol, name = self.assets.get(asset_id, (None, None))
+        return Transaction(
+            id=self.ids[index],
+            user_id=self.user_ids[index],
+            asset_id=asset_id,
+            transaction_type=self.types[self.type_codes[index]],
+            amount=self.amounts[index],
+            price_per_unit=self.prices_per_unit[index],
+            timestamp=from_epoch(self.timestamps[index]),
+            notes=self.notes.get(index),
+            symbol=symbol,
+            name=name
+        )
+        
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self[index]
+            
+    def nbytes(self):
+        """Get the size of the column buffers in bytes."""
+        columns = (self.ids, self.user_ids, self.asset_ids, self.type_codes, self.amounts, self.prices_per_unit, self.timestamps)
+        return sum(column.itemsize * len(column) for column in columns)
+        
+    def to_numpy(self):
+        """Get zero-copy NumPy views of the numeric columns."""
+        # NumPy is only needed for this view, so the model module stays light to import
+        import numpy as np
+        
+        return {
+            "id": np.frombuffer(self.ids, dtype=np.int64),
+            "user_id": np.frombuffer(self.user_ids, dtype=np.int64),
+            "asset_id": np.frombuffer(self.asset_ids, dtype=np.int64),
+            "amount": np.frombuffer(self.amounts, dtype=np.float64),
+            "price_per_unit": np.frombuffer(self.prices_per_unit, dtype=np.float64),
+            "timestamp": np.frombuffer(self.timestamps, dtype=np.int64)
+        }
+
+def benchmark(row_count=1000000):
+    """Measure the memory of 1M price rows materialized from SQLite in each representation.
+    
+    Returns:
+        A dict of bytes held per representation.
+    """
+    import gc
+    import sqlite3
+    import tracemalloc
+    
+    class DictPrice:
+        """The Price class as it was before __slots__."""
+        def __init__(self, id=None, asset_id=None, price_usd=None, timestamp=None, source=None):
+            self.id = id
+            self.asset_id = asset_id
+            self.price_usd = price_usd
+            self.timestamp = timestamp
+            self.source = source
+            
+    connection = sqlite3.connect(":memory:")
+    connection.execute("CREATE TABLE prices (id INTEGER PRIMARY KEY, asset_id INTEGER, price_usd REAL, timestamp TEXT, source TEXT)")
+    connection.execute("""
+        WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < ?)
+        INSERT INTO prices (asset_id, price_usd, timestamp, source)
+        SELECT i % 50 + 1, 100.0 + i * 0.001, datetime(1700000000 + i * 60, 'unixepoch'), 'api' FROM n
+    """, (row_count,))
+    
+    def fetch():
+        return connection.execute("SELECT id, asset_id, price_usd, timestamp, source FROM prices").fetchall()
+        
+    def measure(build):
+        gc.collect()
+        tracemalloc.start()
+        result = build()
+        size = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        del result
+        return size
+        
+    columns = PriceSeries.COLUMNS
+    results = {
+        "rows": row_count,
+        "dicts": measure(lambda: [dict(zip(columns, row)) for row in fetch()]),
+        "dict_objects": measure(lambda: [DictPrice(*row) for row in fetch()]),
+        "slotted_objects": measure(lambda: [Price(*row) for row in fetch()]),
+        "price_series": measure(lambda: PriceSeries.from_rows(fetch()))
+    }
+    connection.close()
+    return results
+
+if __name__ == "__main__":
+    results = benchmark()
+    baseline = results["dict_objects"]
+    print(f"{results['rows']} price rows materialized from SQLite:")
+    for name in ("dicts", "dict_objects", "slotted_objects", "price_series"):
+        print(f"  {name:16} {results[name] / 2 ** 20:8.1f} MB  {baseline / results[name]:5.1f}x vs dict-backed Price")
@@ -0,0 +1,269 @@
+import threading
+from collections.abc import Sequence
+
+import numpy as np
+
+from analytics import analyze, holdings_columns, price_lookup
+
+class HoldingRows(Sequence):
+    def __init__(self, holdings, columns, order):
+        """Initialize a read-only list of valuation rows backed by column arrays.
+        
+        Rows are built as dicts only when read, so a snapshot costs the
+        array arithmetic rather than one dict per holding.
+        
+        Args:
+            holdings: List of holding dicts by position, for the symbol,
+                name, market_cap and notes.
+            columns: Dict of arrays by position: id, asset_id, amount,
+                price, purchase_price, value, cost, profit_loss,
+                profit_loss_pct and allocation.
+            order: Array of positions in the order the rows are listed.
+        """
+        self.holdings = holdings
+        self.columns = columns
+        self.order = order
+        self.lists = None  # Columns as Python lists in row order, built on first read
+        
+    def __len__(self):
+        return len(self.order)
+        
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("holding row index out of range")
+            
+        if self.lists is None:
+            order = self.order
+            self.lists = {name: column[order].tolist() for name, column in self.columns.items()}
+            self.lists["position"] = order.tolist()
+            
+        lists = self.lists
+        holding = self.holdings[lists["position"][index]]
+        return {
+            "id": lists["id"][index],
+            "asset_id": lists["asset_id"][index],
+            "symbol": holding['symbol'],
+            "name": holding['name'],
+            "amount": lists["amount"][index],
+            "price": lists["price"][index],
+            "value": lists["value"][index],
+            "purchase_price": lists["purchase_price"][index],
+            "cost": lists["cost"][index],
+            "profit_loss": lists["profit_loss"][index],
+            "profit_loss_pct": lists["profit_loss_pct"][index],
+            "allocation": lists["allocation"][index],
+            "market_cap": holding.get('market_cap') or 0,
+            "notes": holding.get('notes')
+        }
+
+class PortfolioEngine:
+    def __init__(self, db):
+        """Initialize the portfolio valuation engine.
+        
+        Holds each loaded user's holdings and latest prices in memory as
+        column arrays and values them in one vectorized pass, so every tab
+        reads the same snapshot instead of recomputing it.
+        
+        Args:
+            db: Database holdings and prices are loaded from.
+        """
+        self.db = db
+        self.portfolios = {}  # user_id -> portfolio state, see load()
+        self.lock = threading.RLock()
+        
+    def load(self, user_id):
+        """Load a user's holdings and their latest prices from the database."""
+        holdings = self.db.get_user_holdings(user_id)
+        asset_ids = list({holding['asset_id'] for holding in holdings})
+        prices = {
+            asset_id: price_data['price_usd']
+            for asset_id, price_data in self.db.get_latest_prices(asset_ids).items()
+        }
+        
+        columns = holdings_columns(holdings, prices)
+        
+        with self.lock:
+            self.portfolios[user_id] = {
+                "holdings": holdings,  # Holding dict at each position of the columns
+                "columns": columns,
+                "positions": {holding_id: position for position, holding_id in enumerate(columns['id'].tolist())},
+                "prices": prices,
+                "snapshot": None
+            }
+            
+    def get_portfolio(self, user_id):
+        """Get a user's portfolio state, loading it on first use."""
+        with self.lock:
+            portfolio = self.portfolios.get(user_id)
+        if portfolio is None:
+            self.load(user_id)
+            with self.lock:
+                portfolio = self.portfolios[user_id]
+        return portfolio
+        
+    def invalidate(self, user_id=None):
+        """Drop a user's portfolio, or every portfolio, so it is reloaded on next use.
+        
+        Use after bulk changes such as a CSV import.
+        """
+        with self.lock:
+            if user_id is None:
+                self.portfolios.clear()
+            else:
+                self.portfolios.pop(user_id, None)
+                
+    def set_holding(self, portfolio, holding_id, holding):
+        """Replace, add or remove (holding None) one holding in a portfolio's columns."""
+        columns = portfolio['columns']
+        position = portfolio['positions'].get(holding_id)
+        
+        if holding is None:
+            if position is None:
+                return
+            # Move the last holding into the freed position
+            last = len(portfolio['holdings']) - 1
+            if position != last:
+                portfolio['holdings'][position] = portfolio['holdings'][last]
+                portfolio['positions'][int(columns['id'][last])] = position
+                for column in columns.values():
+                    column[position] = column[last]
+            del portfolio['positions'][holding_id]
+            portfolio['holdings'].pop()
+            for name, column in columns.items():
+                columns[name] = column[:last]
+        else:
+            if position is None:
+                position = len(portfolio['holdings'])
+                portfolio['positions'][holding_id] = position
+                portfolio['holdings'].append(None)
+                for name, column in columns.items():
+                    columns[name] = np.append(column, 0)
+                    
+            portfolio['holdings'][position] = holding
+            columns['id'][position] = holding_id
+            columns['asset_id'][position] = holding['asset_id']
+            columns['amount'][position] = holding['amount']
+            columns['purchase_price'][position] = holding['purchase_price_per_unit']
+            columns['price'][position] = portfolio['prices'].get(holding['asset_id'], 0)
+            
+        portfolio['snapshot'] = None
+        
+    def update_prices(self, prices):
+        """Apply new prices to every loaded portfolio.
+        
+        Portfolios none of whose assets changed price are left as they are.
+        
+        Args:
+            prices: Dict mapping asset_id to its price in USD.
+        """
+        with self.lock:
+            for portfolio in self.portfolios.values():
+                columns = portfolio['columns']
+                held = set(np.unique(columns['asset_id']).tolist())
+                changed = {
+                    asset_id: price for asset_id, price in prices.items()
+                    if asset_id in held and portfolio['prices'].get(asset_id) != price
+                }
+                if not changed:
+                    continue
+                    
+                portfolio['prices'].update(changed)
+                columns['price'] = price_lookup(columns['asset_id'], portfolio['prices'])
+                portfolio['snapshot'] = None
+                
+    def reload_prices(self):
+        """Read the latest stored prices of every held asset and apply the changes.
+        
+        Returns:
+            The number of assets whose price was read.
+        """
+        with self.lock:
+            asset_ids = set()
+            for portfolio in self.portfolios.values():
+                asset_ids.update(np.unique(portfolio['columns']['asset_id']).tolist())
+            
+        if not asset_ids:
+            return 0
+            
+        latest_prices = self.db.get_latest_prices(list(asset_ids))
+        self.update_prices({asset_id: price_data['price_usd'] for asset_id, price_data in latest_prices.items()})
+        return len(latest_prices)
+        
+    def update_holding(self, user_id, holding_id):
+        """Reload one added or changed holding from the database and revalue it."""
+        with self.lock:
+            if user_id not in self.portfolios:
+                return
+                
+        holding = self.db.get_holding(user_id, holding_id)
+        
+        with self.lock:
+            portfolio = self.portfolios.get(user_id)
+            if portfolio is None:
+                return
+                
+            if holding is None:
+                self.set_holding(portfolio, holding_id, None)
+                return
+                
+            asset_id = holding['asset_id']
+            if asset_id not in portfolio['prices']:
+                latest_price = self.db.get_latest_price(asset_id)
+                portfolio['prices'][asset_id] = latest_price['price_usd'] if latest_price else 0
+                
+            self.set_holding(portfolio, holding_id, holding)
+            
+    def remove_holding(self, user_id, holding_id):
+        """Drop a deleted holding from a loaded portfolio."""
+        with self.lock:
+            portfolio = self.portfolios.get(user_id)
+            if portfolio is not None:
+                self.set_holding(portfolio, holding_id, None)
+                
+    def get_totals(self, user_id):
+        """Get a user's total value, cost and profit/loss without building a snapshot."""
+        portfolio = self.get_portfolio(user_id)
+        with self.lock:
+            if portfolio['snapshot'] is not None:
+                snapshot = portfolio['snapshot']
+            else:
+                columns = portfolio['columns']
+                _, snapshot = analyze(columns['amount'], columns['purchase_price'], columns['price'])
+                
+        return {
+            name: snapshot[name]
+            for name in ("total_value", "total_cost", "total_profit", "total_profit_pct", "asset_count")
+        }
+        
+    def get_snapshot(self, user_id):
+        """Get a user's valuation, rebuilt only if something changed since the last call.
+        
+        The snapshot is shared between callers and must be treated as read-only.
+        
+        Returns:
+            A dict with the get_totals() values, hhi (concentration, see
+            analytics.analyze), holdings (a HoldingRows of valuation rows
+            with an allocation percentage, highest value first) and prices
+            (asset_id -> latest price).
+        """
+        portfolio = self.get_portfolio(user_id)
+        with self.lock:
+            if portfolio['snapshot'] is not None:
+                return portfolio['snapshot']
+                
+            # Copies, as the portfolio's columns change in place
+            columns = {name: column.copy() for name, column in portfolio['columns'].items()}
+            analysis, totals = analyze(columns['amount'], columns['purchase_price'], columns['price'])
+            columns.update(analysis)
+            
+            # Highest value first; a stable sort keeps ties in holding order
+            order = np.argsort(-columns['value'], kind="stable")
+            holdings = HoldingRows(list(portfolio['holdings']), columns, order)
+            
+            snapshot = dict(totals, holdings=holdings, prices=dict(portfolio['prices']))
+            portfolio['snapshot'] = snapshot
+            return snapshot
@@ -0,0 +1,111 @@
+import threading
+
+from cache import PriceCache
+
+class PriceRefresher:
+    def __init__(self, root, db, api, cache=None, poll_interval=100):
+        """Initialize the background price refresher.
+        
+        Args:
+            root: Tk root window; completion callbacks are run on its main loop.
+            db: Database the fetched prices are written to.
+            api: CryptoAPI used to fetch prices.
+            cache: PriceCache prices are read through; one without async
+                fetching is created if None.
+            poll_interval: Milliseconds between checks for a finished refresh.
+        """
+        self.root = root
+        self.db = db
+        self.api = api
+        self.cache = cache or PriceCache(api, db)
+        self.poll_interval = poll_interval
+        self.worker = None
+        self.callbacks = []
+        self.result = None
+        self.lock = threading.Lock()
+        
+    def is_running(self):
+        """Check if a refresh is currently in flight."""
+        return self.worker is not None
+        
+    def refresh(self, on_complete=None):
+        """Start a background price refresh.
+        
+        If a refresh is already in flight no second fetch is started; the
+        callback is attached to the running one instead. Callbacks are called
+        on the Tk main loop with the number of prices updated.
+        
+        Must be called from the Tk main thread.
+        
+        Returns:
+            True if a new refresh was started, False if one was already running.
+        """
+        if on_complete and on_complete not in self.callbacks:
+            self.callbacks.append(on_complete)
+            
+        if self.worker is not None:
+            return False
+            
+        self.result = None
+        self.worker = threading.Thread(target=self.run, name="PriceRefresher", daemon=True)
+        self.worker.start()
+        self.root.after(self.poll_interval, self.check_finished)
+        return True
+        
+    def run(self):
+        """Worker thread body: fetch and store prices."""
+        try:
+            updated_count = self.fetch_and_store()
+        except Exception as e:
+            print(f"Error refreshing prices: {str(e)}")
+            updated_count = 0
+            
+        with self.lock:
+            self.result = updated_count
+            
+    def check_finished(self):
+        """Poll the worker from the Tk main loop and run callbacks when it is done."""
+        with self.lock:
+            finished = self.result is not None
+            updated_count = self.result
+            
+        if not finished:
+            self.root.after(self.poll_interval, self.check_finished)
+            return
+            
+        self.worker = None
+        callbacks, self.callbacks = self.callbacks, []
+        
+        for callback in callbacks:
+            try:
+                callback(updated_count)
+            except Exception as e:
+                # A callback may belong to a widget destroyed during the refresh
+                print(f"Error in price refresh callback: {str(e)}")
+                
+    def fetch_and_store(self):
+        """Fetch prices for all assets with a CoinGecko ID and store them.
+        
+        Runs on the worker thread; touches only the database and API, never Tk.
+        
+        Returns:
+            The number of prices updated.
+        """
+        # Get all assets that can be priced via the API
+        assets_with_id = self.db.get_assets_with_coingecko_id()
+        
+        if not assets_with_id:
+            return 0
+            
+        coingecko_ids = [asset['coingecko_id'] for asset in assets_with_id]
+        
+        # Prices fetched within the cache TTL are reused; fetched ones are
+        # written to the database by the cache. An explicit refresh should not
+        # settle for stale prices.
+        prices, error = self.cache.get_prices(coingecko_ids, allow_stale=False)
+        if error:
+            print(f"API Error: {error}")
+            
+        updated_count = sum(1 for asset in assets_with_id if asset['coingecko_id'] in prices)
+        print(f"Updated prices for {updated_count} assets")
+        return updated_count
@@ -0,0 +1,169 @@
+import time
+from datetime import datetime, timedelta, timezone
+
+from database import CANDLE_INTERVALS
+
+class PriceRetention:
+    def __init__(self, db, raw_days=30, hourly_days=365, chunk_days=7, pause=0.05, vacuum=True, vacuum_pages=2000):
+        """Initialize the price history retention job.
+        
+        Raw prices are kept at full resolution for raw_days, thinned to one
+        price per hour until hourly_days and to one per day beyond that.
+        Candles are rolled up before anything is thinned, and candles finer
+        than a tier's resolution are dropped with it.
+        
+        Args:
+            db: Database whose prices table is thinned.
+            raw_days: Days of history kept at full resolution.
+            hourly_days: Days of history kept at hourly resolution; 0 thins
+                everything past raw_days straight to daily.
+            chunk_days: Days of one asset's history thinned per transaction,
+                so other writers are never blocked for long.
+            pause: Seconds to sleep between chunks.
+            vacuum: Whether to switch the database to auto_vacuum=INCREMENTAL
+                and return freed pages to the filesystem.
+            vacuum_pages: Pages released per incremental vacuum step.
+        """
+        self.db = db
+        self.raw_days = raw_days
+        self.hourly_days = max(hourly_days, raw_days)
+        self.chunk_days = chunk_days
+        self.pause = pause
+        self.vacuum = vacuum
+        self.vacuum_pages = vacuum_pages
+        self.stop_requested = False
+        
+    def stop(self):
+        """Ask a running retention pass to stop after the current chunk."""
+        self.stop_requested = True
+        
+    def get_cutoff(self, now=None):
+        """Get the UTC timestamp before which raw prices are thinned.
+        
+        Candles older than this were built before thinning and are more
+        detailed than the raw prices left, so they must not be recomputed.
+        """
+        return self.get_tiers(now)[-1][2].strftime("%Y-%m-%d %H:%M:%S")
+        
+    def get_tiers(self, now=None):
+        """Get the (interval, start, end) ranges to thin, as UTC timestamps.
+        
+        Boundaries are whole days so no hourly or daily bucket straddles two tiers.
+        """
+        now = now or datetime.now(timezone.utc)
+        today = now.replace(hour=0, minute=0, second=0, microsecond=0)
+        raw_start = today - timedelta(days=self.raw_days)
+        hourly_start = today - timedelta(days=self.hourly_days)
+        
+        tiers = [("1d", datetime(1970, 1, 1, tzinfo=timezone.utc), hourly_start)]
+        if hourly_start < raw_start:
+            tiers.append(("1h", hourly_start, raw_start))
+        return tiers
+        
+    def thin_asset(self, asset_id, tiers):
+        """Thin one asset's raw prices tier by tier, a chunk per transaction.
+        
+        Returns:
+            The number of raw price rows deleted.
+        """
+        for interval, _, end in tiers:
+            for finer, seconds in CANDLE_INTERVALS.items():
+                if seconds < CANDLE_INTERVALS[interval]:
+                    self.db.delete_candles(asset_id, finer, end.strftime("%Y-%m-%d %H:%M:%S"))
+                    
+        first_timestamp = self.db.get_first_price_timestamp(asset_id)
+        if not first_timestamp:
+            return 0
+            
+        # SQLite CURRENT_TIMESTAMP values are UTC
+        first = datetime.fromisoformat(str(first_timestamp)).replace(tzinfo=timezone.utc)
+        
+        deleted = 0
+        for interval, start, end in tiers:
+            # Skip the empty years before the oldest stored price
+            chunk_start = max(start, first.replace(hour=0, minute=0, second=0, microsecond=0))
+            while chunk_start < end:
+                if self.stop_requested:
+                    return deleted
+                    
+                chunk_end = min(chunk_start + timedelta(days=self.chunk_days), end)
+                deleted += self.db.thin_prices(
+                    asset_id,
+                    interval,
+                    chunk_start.strftime("%Y-%m-%d %H:%M:%S"),
+                    chunk_end.strftime("%Y-%m-%d %H:%M:%S")
+                )
+                chunk_start = chunk_end
+                
+                if self.pause:
+                    time.sleep(self.pause)
+                    
+        return deleted
+        
+    def reclaim_space(self):
+        """Release free pages to the filesystem in small steps.
+        
+        The first call converts the database to incremental auto-vacuum,
+        which compacts the whole file at once.
+        
+        Returns:
+            The number of bytes the database shrank by.
+        """
+        size_before = self.db.get_storage_stats()["size_bytes"]
+        if self.db.enable_incremental_vacuum():
+            print("Switched database to incremental auto-vacuum")
+            
+        while not self.stop_requested:
+            if not self.db.incremental_vacuum(self.vacuum_pages):
+                break
+                
+            if self.pause:
+                time.sleep(self.pause)
+                
+        return size_before - self.db.get_storage_stats()["size_bytes"]
+        
+    def run(self, asset_ids=None):
+        """Apply the retention policy to every asset, or only the given ones.
+        
+        Meant to run on a background thread; each chunk is its own short
+        transaction, so the UI and price refreshes keep writing in between.
+        
+        Returns:
+            A dict with rows_deleted, bytes_reclaimed and the database size
+            in bytes before and after.
+        """
+        self.stop_requested = False
+        size_before = self.db.get_storage_stats()["size_bytes"]
+        
+        # Candles keep the full-resolution high/low of everything thinned below
+        self.db.rollup_all_candles()
+        
+        tiers = self.get_tiers()
+        if asset_ids is None:
+            asset_ids = [asset['id'] for asset in self.db.get_all_assets()]
+            
+        rows_deleted = 0
+        for asset_id in asset_ids:
+            if self.stop_requested:
+                break
+                
+            try:
+                rows_deleted += self.thin_asset(asset_id, tiers)
+            except Exception as e:
+                print(f"Error thinning prices for asset {asset_id}: {str(e)}")
+                
+        bytes_reclaimed = 0
+        if self.vacuum and not self.stop_requested:
+            try:
+                bytes_reclaimed = self.reclaim_space()
+            except Exception as e:
+                print(f"Error reclaiming database space: {str(e)}")
+                
+        size_after = self.db.get_storage_stats()["size_bytes"]
+        print(f"Retention removed {rows_deleted} old prices and reclaimed {bytes_reclaimed} bytes")
+        return {
+            "rows_deleted": rows_deleted,
+            "bytes_reclaimed": bytes_reclaimed,
+            "size_before": size_before,
+            "size_after": size_after
+        }
@@ -0,0 +1,110 @@
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+# Milliseconds importing main may take; it imports everything the login
+# screen needs, so this bounds the time before the login screen can show
+STARTUP_BUDGET_MS = 750
+
+# Modules that must not be loaded before the login screen is shown
+DEFERRED_MODULES = (
+    "matplotlib",
+    "ui.dashboard",
+    "ui.assets",
+    "ui.analysis",
+    "ui.staking",
+    "ui.settings",
+)
+
+def parse_importtime(output):
+    """Parse the report written by python -X importtime.
+    
+    Returns:
+        A list of (module, depth, self_us, cumulative_us) tuples in report
+        order; depth is 0 for modules imported directly by the command.
+    """
+    imports = []
+    for line in output.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        if not self_us.strip().isdigit():
+            continue  # Column header
+        module = name.strip()
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        imports.append((module, depth, int(self_us), int(cumulative_us)))
+    return imports
+
+def measure_startup(module="main"):
+    """Import a module in a fresh interpreter, as the application does on launch.
+    
+    Returns:
+        A (total_ms, imports) tuple; total_ms is the cumulative import time
+        of the module and imports is the parsed importtime report.
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        capture_output=True,
+        text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{result.stderr}")
+        
+    imports = parse_importtime(result.stderr)
+    total_us = next(cumulative for name, depth, _, cumulative in imports if name == module and depth == 0)
+    return total_us / 1000, imports
+
+def check_startup(budget_ms=STARTUP_BUDGET_MS, runs=5, module="main"):
+    """Measure the startup imports and check them against the budget.
+    
+    Args:
+        budget_ms: Largest allowed median import time in milliseconds.
+        runs: Fresh interpreters measured; the median is compared.
+        module: Module the application starts from.
+        
+    Returns:
+        A list of problems found; empty if startup is within budget.
+    """
+    totals = []
+    for _ in range(runs):
+        total_ms, imports = measure_startup(module)
+        totals.append(total_ms)
+    median_ms = statistics.median(totals)
+    
+    print(f"import {module}: median {median_ms:.0f} ms over {runs} runs "
+          f"(min {min(totals):.0f}, max {max(totals):.0f}), budget {budget_ms} ms")
+          
+    # Heaviest modules imported directly by the application
+    direct = [entry for entry in imports if entry[1] == 1]
+    direct.sort(key=lambda entry: entry[3], reverse=True)
+    for name, _, _, cumulative_us in direct[:10]:
+        print(f"  {cumulative_us / 1000:8.1f} ms  {name}")
+        
+    problems = []
+    if median_ms > budget_ms:
+        problems.append(f"Startup imports take {median_ms:.0f} ms, over the {budget_ms} ms budget")
+        
+    loaded = {name for name, _, _, _ in imports}
+    for deferred in DEFERRED_MODULES:
+        if deferred in loaded:
+            problems.append(f"{deferred} is imported at startup; import it when first used instead")
+    return problems
+
+def main():
+    """Check the startup budget from the command line; exits with 1 if it is exceeded."""
+    parser = argparse.ArgumentParser(description="Check the time CryptoJandie takes to reach the login screen.")
+    parser.add_argument("--budget", type=float, default=STARTUP_BUDGET_MS, help=f"Budget in milliseconds (default: {STARTUP_BUDGET_MS})")
+    parser.add_argument("--runs", type=int, default=5, help="Fresh interpreters measured (default: 5)")
+    args = parser.parse_args()
+    
+    problems = check_startup(args.budget, args.runs)
+    for problem in problems:
+        print(problem)
+    if problems:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,28 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import Database
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+@pytest.fixture
+def fixture_path():
+    """Get the path of a file in tests/fixtures."""
+    return lambda name: os.path.join(FIXTURES, name)
+
+@pytest.fixture
+def db(tmp_path):
+    """A scratch database with the default assets."""
+    database = Database(str(tmp_path / "test.db"))
+    database.initialize_default_assets()
+    yield database
+    database.close()
+
+@pytest.fixture
+def user_id(db):
+    """Id of a user in the scratch database."""
+    return db.add_user("tester")
@@ -0,0 +1,233 @@
+import gzip
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+
+from api import AsyncCryptoAPI, CryptoAPI
+
+# Budget high enough that the rate limiters never delay a test by themselves
+NO_LIMITS = {endpoint: (60000, 1000) for endpoint in ("simple/price", "search", "market_chart", "coins/list")}
+
+def price_body(ids):
+    """Build a simple/price response for the given CoinGecko ids."""
+    return json.dumps({coin_id: {"usd": 1.5, "usd_market_cap": 1000} for coin_id in ids}).encode()
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # Keep-alive, so connection reuse is visible
+    
+    def do_GET(self):
+        server = self.server
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+        with server.lock:
+            server.requests.append({
+                "time": time.perf_counter(),
+                "path": url.path,
+                "query": query,
+                "headers": dict(self.headers),
+                "client": self.client_address,
+            })
+            server.in_flight += 1
+            server.max_in_flight = max(server.max_in_flight, server.in_flight)
+            queued = server.responses.pop(0) if server.responses else None
+            
+        try:
+            if server.delay:
+                time.sleep(server.delay)
+            if queued:
+                status, headers, body = queued
+            else:
+                status, headers, body = server.respond(query)
+                
+            if "gzip" in self.headers.get("Accept-Encoding", "") and server.compress:
+                body = gzip.compress(body)
+                headers = dict(headers, **{"Content-Encoding": "gzip"})
+                
+            self.send_response(status)
+            for name, value in headers.items():
+                self.send_header(name, value)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        finally:
+            with server.lock:
+                server.in_flight -= 1
+                
+    def log_message(self, format, *args):
+        pass
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+    
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), StubHandler)
+        self.lock = threading.Lock()
+        self.requests = []
+        self.responses = []  # Queued (status, headers, body) answers, used first
+        self.delay = 0
+        self.compress = False
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.url = f"http://127.0.0.1:{self.server_address[1]}/api/v3"
+        
+    def respond(self, query):
+        """Answer a request that has no queued response."""
+        ids = query.get("ids", [""])[0].split(",")
+        return 200, {}, price_body(ids)
+        
+    def gaps(self):
+        """Get the seconds between consecutive requests."""
+        times = [request["time"] for request in self.requests]
+        return [later - earlier for earlier, later in zip(times, times[1:])]
+
+@pytest.fixture
+def stub():
+    """A CoinGecko stand-in on a local port."""
+    server = StubServer()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+def stub_api(stub, **options):
+    """Create a CryptoAPI that talks to the stub server."""
+    api = CryptoAPI(**dict({"rate_limits": NO_LIMITS}, **options))
+    api.coingecko_base_url = stub.url
+    return api
+
+def test_session_reuses_connection(stub):
+    api = stub_api(stub)
+    for _ in range(5):
+        prices, error = api.get_price("bitcoin")
+        assert error is None
+        assert prices["price_usd"] == 1.5
+    api.close()
+    
+    assert len(stub.requests) == 5
+    assert len({request["client"] for request in stub.requests}) == 1
+
+def test_gzip_response_is_decoded(stub):
+    stub.compress = True
+    api = stub_api(stub)
+    prices, error = api.get_multiple_prices(["bitcoin", "ethereum"])
+    api.close()
+    
+    assert error is None
+    assert set(prices) == {"bitcoin", "ethereum"}
+    assert "gzip" in stub.requests[0]["headers"]["Accept-Encoding"]
+
+def test_retries_server_errors_with_backoff(stub):
+    stub.responses = [(503, {}, b"{}"), (502, {}, b"{}")]
+    api = stub_api(stub, backoff_factor=0.1)
+    prices, error = api.get_price("bitcoin")
+    api.close()
+    
+    assert error is None
+    assert len(stub.requests) == 3
+    # Delays are backoff_factor * 2 ** attempt with jitter of 0.5-1.0
+    first, second = stub.gaps()
+    assert 0.05 <= first < 0.1 + 0.5
+    assert 0.1 <= second < 0.2 + 0.5
+
+def test_gives_up_after_max_retries(stub):
+    stub.responses = [(500, {}, b"{}")] * 3
+    api = stub_api(stub, max_retries=2, backoff_factor=0.01)
+    prices, error = api.get_price("bitcoin")
+    api.close()
+    
+    assert prices is None
+    assert error == "API request failed with status code 500."
+    assert len(stub.requests) == 3
+
+def test_honors_retry_after_on_429(stub):
+    stub.responses = [(429, {"Retry-After": "0.5"}, b"{}")]
+    # Backoff alone would wait 5-10 seconds; Retry-After takes precedence
+    api = stub_api(stub, backoff_factor=10)
+    started = time.perf_counter()
+    prices, error = api.get_price("bitcoin")
+    elapsed = time.perf_counter() - started
+    api.close()
+    
+    assert error is None
+    assert len(stub.requests) == 2
+    assert 0.5 <= stub.gaps()[0] < 1.5
+    assert elapsed < 2
+
+def test_retry_after_is_capped_by_max_backoff(stub):
+    stub.responses = [(429, {"Retry-After": "120"}, b"{}")]
+    api = stub_api(stub, max_backoff=0.2)
+    prices, error = api.get_price("bitcoin")
+    api.close()
+    
+    assert error is None
+    assert 0.2 <= stub.gaps()[0] < 1
+
+def test_token_bucket_paces_requests(stub):
+    # 10 requests per second with a burst of 2
+    api = stub_api(stub, rate_limits={"simple/price": (600, 2)})
+    started = time.perf_counter()
+    for _ in range(6):
+        prices, error = api.get_price("bitcoin")
+        assert error is None
+    elapsed = time.perf_counter() - started
+    api.close()
+    
+    # The burst goes out at once, then one request every 0.1 seconds
+    gaps = stub.gaps()
+    assert gaps[0] < 0.05
+    for gap in gaps[1:]:
+        assert gap == pytest.approx(0.1, abs=0.04)
+    assert 0.38 <= elapsed < 0.8
+    
+def test_rate_limited_search_gives_up(stub):
+    api = stub_api(stub, rate_limits={"search": (0.6, 1)})
+    stub.respond = lambda query: (200, {}, json.dumps({"coins": [{"id": "bitcoin"}]}).encode())
+    coins, error = api.search_cryptocurrency("bit")
+    assert error is None
+    
+    # The next token is 100 seconds away, over the 5 second limit
+    started = time.perf_counter()
+    coins, error = api.search_cryptocurrency("bit")
+    api.close()
+    assert error == "API rate limit reached. Please try again later."
+    assert time.perf_counter() - started < 0.1
+    assert len(stub.requests) == 1
+
+def test_async_batches_are_concurrent_and_bounded(stub):
+    stub.delay = 0.2
+    api = AsyncCryptoAPI(stub_api(stub), max_concurrency=3)
+    coin_ids = [f"coin-{i}" for i in range(16)]
+    started = time.perf_counter()
+    prices, error = api.get_multiple_prices(coin_ids, batch_size=2)
+    elapsed = time.perf_counter() - started
+    api.close()
+    api.api.close()
+    
+    assert error is None
+    assert set(prices) == set(coin_ids)
+    assert len(stub.requests) == 8
+    assert stub.max_in_flight == 3
+    # Eight 0.2 second requests, three at a time: three rounds instead of eight
+    assert 0.6 <= elapsed < 1.2
+    
+def test_async_partial_failure_merges_successful_batches(stub):
+    def respond(query):
+        ids = query["ids"][0].split(",")
+        if "coin-bad" in ids:
+            return 404, {}, b"{}"
+        return 200, {}, price_body(ids)
+        
+    stub.respond = respond
+    api = AsyncCryptoAPI(stub_api(stub), max_concurrency=4)
+    prices, error = api.get_multiple_prices(["coin-1", "coin-2", "coin-bad", "coin-3", "coin-4", "coin-5"], batch_size=2)
+    api.close()
+    api.api.close()
+    
+    assert set(prices) == {"coin-1", "coin-2", "coin-4", "coin-5"}
+    assert error == "1 of 3 batches failed: API request failed with status code 404."
@@ -0,0 +1,56 @@
+from datetime import datetime, timedelta, timezone
+
+from backfill import PriceBackfill
+from retention import PriceRetention
+
+class StubAPI:
+    """Answers market chart requests with one price per day."""
+    
+    def __init__(self, price):
+        self.price = price
+        
+    def get_market_chart(self, coingecko_id, days, interval=None):
+        today = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+        return [
+            ((today - timedelta(days=day)).strftime("%Y-%m-%d %H:%M:%S"), self.price)
+            for day in range(days, 0, -1)
+        ], None
+
+def day_start(days_ago):
+    today = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+    return today - timedelta(days=days_ago)
+
+def daily_candle(db, asset_id, days_ago):
+    bucket_start = day_start(days_ago).strftime("%Y-%m-%d %H:%M:%S")
+    candles = db.get_candles([asset_id], "1d", bucket_start, bucket_start)[asset_id]
+    return candles[0] if candles else None
+
+def test_backfill_keeps_candles_of_thinned_history(db):
+    asset_id = db.get_asset_by_symbol("BTC")['id']
+    # A day in the hourly tier, priced every 10 minutes with a short spike
+    start = day_start(60)
+    db.ingest_price_history(asset_id, [
+        ((start + timedelta(minutes=minute)).strftime("%Y-%m-%d %H:%M:%S"), 999.0 if minute == 730 else 100.0)
+        for minute in range(10, 24 * 60, 10)
+    ], source="refresh")
+    
+    retention = PriceRetention(db, raw_days=30, hourly_days=365, pause=0, vacuum=False)
+    retention.run([asset_id])
+    assert daily_candle(db, asset_id, 60)['high'] == 999.0
+    
+    backfill = PriceBackfill(StubAPI(50.0), db, retention=retention)
+    inserted, error = backfill.backfill_asset(asset_id, "bitcoin", days=400)
+    assert error is None
+    assert inserted == 400
+    
+    # The spike was thinned away; its candle is kept rather than rebuilt
+    assert daily_candle(db, asset_id, 60)['high'] == 999.0
+    # Older history gets the candles it was missing
+    assert daily_candle(db, asset_id, 200)['close'] == 50.0
+    # Newer than the cutoff, buckets are rolled up as usual
+    assert daily_candle(db, asset_id, 10)['close'] == 50.0
+
+def test_retention_cutoff_is_start_of_raw_tier():
+    retention = PriceRetention(None, raw_days=30, hourly_days=365)
+    now = datetime(2024, 6, 15, 13, 30, tzinfo=timezone.utc)
+    assert retention.get_cutoff(now) == "2024-05-16 00:00:00"
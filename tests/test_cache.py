@@ -0,0 +1,29 @@
+from datetime import datetime, timedelta, timezone
+
+from cache import PriceCache
+
+def test_persist_keeps_stored_market_cap_when_missing(db):
+    btc = db.get_asset_by_symbol("BTC")['id']
+    eth = db.get_asset_by_symbol("ETH")['id']
+    db.update_asset_market_cap(btc, 1.5e12)
+    
+    PriceCache(None, db).persist({
+        "bitcoin": {"price_usd": 60000.0},
+        "ethereum": {"price_usd": 3000.0, "market_cap": 4e11}
+    })
+    
+    assert db.get_asset_by_symbol("BTC")['market_cap'] == 1.5e12
+    assert db.get_asset_by_symbol("ETH")['market_cap'] == 4e11
+    assert db.get_latest_price(btc)['price_usd'] == 60000.0
+
+def test_persist_rolls_up_only_written_assets(db):
+    btc = db.get_asset_by_symbol("BTC")['id']
+    sol = db.get_asset_by_symbol("SOL")['id']
+    db.add_price(sol, 150.0)  # Stored but not yet rolled into candles
+    
+    PriceCache(None, db).persist({"bitcoin": {"price_usd": 60000.0, "market_cap": 1.2e12}})
+    
+    start = (datetime.now(timezone.utc) - timedelta(days=1)).strftime("%Y-%m-%d %H:%M:%S")
+    candles = db.get_candles([btc, sol], "1h", start)
+    assert candles[btc]
+    assert candles[sol] == []
@@ -0,0 +1,141 @@
+import sqlite3
+import threading
+
+import pytest
+
+from database import Database
+
+@pytest.fixture
+def writer_db(tmp_path):
+    """A scratch database that reads through its writer connection, so every query can be traced."""
+    database = Database(str(tmp_path / "test.db"), read_pool_size=0)
+    database.initialize_default_assets()
+    yield database
+    database.close()
+
+def query_plans(db, call):
+    """Run call and get the EXPLAIN QUERY PLAN details of every SELECT it sent."""
+    statements = []
+    db.connection.set_trace_callback(statements.append)
+    try:
+        call()
+    finally:
+        db.connection.set_trace_callback(None)
+        
+    plans = []
+    for statement in statements:
+        if statement.lstrip().upper().startswith("SELECT"):
+            rows = db.connection.execute(f"EXPLAIN QUERY PLAN {statement}").fetchall()
+            plans.append(" / ".join(row['detail'] for row in rows))
+    assert plans, "no SELECT was traced"
+    return plans
+
+def index_names(db):
+    rows = db.connection.execute("SELECT name FROM sqlite_master WHERE type = 'index'").fetchall()
+    return {row['name'] for row in rows}
+
+def test_new_database_is_at_latest_version(writer_db):
+    assert writer_db.get_schema_version() == len(writer_db.get_migrations())
+    assert {
+        "idx_transactions_user_timestamp",
+        "idx_holdings_user_asset",
+        "idx_prices_asset_timestamp_unique",
+    } <= index_names(writer_db)
+
+def test_migrates_unversioned_database(tmp_path):
+    path = str(tmp_path / "old.db")
+    # The schema as it was before migrations: no indexes, no password column
+    connection = sqlite3.connect(path)
+    connection.executescript("""
+        CREATE TABLE users (id INTEGER PRIMARY KEY, username TEXT UNIQUE NOT NULL, created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP);
+        CREATE TABLE assets (id INTEGER PRIMARY KEY, symbol TEXT UNIQUE NOT NULL, name TEXT NOT NULL, coingecko_id TEXT, market_cap REAL DEFAULT 0, updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP);
+        CREATE TABLE prices (id INTEGER PRIMARY KEY, asset_id INTEGER NOT NULL, price_usd REAL NOT NULL, timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP, source TEXT NOT NULL);
+        INSERT INTO users (username) VALUES ('jandie');
+        INSERT INTO assets (symbol, name) VALUES ('BTC', 'Bitcoin');
+        INSERT INTO prices (asset_id, price_usd, timestamp, source) VALUES (1, 100, '2024-01-01 00:00:00', 'api');
+        INSERT INTO prices (asset_id, price_usd, timestamp, source) VALUES (1, 200, '2024-01-02 00:00:00', 'api');
+    """)
+    connection.close()
+    
+    db = Database(path, read_pool_size=0)
+    try:
+        assert db.get_schema_version() == len(db.get_migrations())
+        assert db.get_user("jandie")['password'] == "password123"
+        assert db.get_latest_price(1)['price_usd'] == 200
+        assert "idx_transactions_user_timestamp" in index_names(db)
+    finally:
+        db.close()
+
+def test_transaction_pages_use_index(writer_db):
+    user_id = writer_db.add_user("tester")
+    for plan in query_plans(writer_db, lambda: [
+        writer_db.get_user_transactions(user_id),
+        writer_db.get_user_transactions(user_id, before_timestamp="2024-01-01 00:00:00", before_id=10),
+    ]):
+        assert "USING INDEX idx_transactions_user_timestamp" in plan
+        assert "TEMP B-TREE" not in plan  # Rows come out of the index in order
+
+def test_holdings_use_index(writer_db):
+    user_id = writer_db.add_user("tester")
+    plan, = query_plans(writer_db, lambda: writer_db.get_user_holdings(user_id))
+    assert "USING INDEX idx_holdings_user_asset" in plan
+
+def test_price_lookups_use_index(writer_db):
+    for plan in query_plans(writer_db, lambda: [
+        writer_db.get_prices_at([1, 2], "2024-01-01 00:00:00"),
+        writer_db.get_last_price_timestamp(1),
+    ]):
+        assert "idx_prices_asset_timestamp_unique" in plan
+        assert "TEMP B-TREE" not in plan
+
+@pytest.fixture
+def export_db(writer_db):
+    """The scratch database with a holding, transactions and prices to export."""
+    user_id = writer_db.add_user("tester")
+    btc = writer_db.get_asset_by_symbol("BTC")['id']
+    eth = writer_db.get_asset_by_symbol("ETH")['id']
+    writer_db.add_imported_transactions(user_id, [
+        (btc if i % 2 else eth, "BUY", 1.0, 100.0 + i, f"2024-01-01 00:{i // 60:02d}:{i % 60:02d}", None, f"hash-{i}")
+        for i in range(25)
+    ])
+    writer_db.ingest_price_history(btc, [(f"2024-01-{day:02d} 00:00:00", 100.0 + day) for day in range(1, 12)])
+    writer_db.ingest_price_history(eth, [(f"2024-01-{day:02d} 00:00:00", 10.0 + day) for day in range(1, 8)])
+    return writer_db, user_id
+
+@pytest.mark.parametrize("table, count", [("transactions", 25), ("prices", 18), ("holdings", 0)])
+def test_export_batches_cover_every_row(export_db, table, count):
+    db, user_id = export_db
+    batches = list(db.iter_export_rows(table, user_id, batch_size=4))
+    rows = [row for _, batch in batches for row in batch]
+    
+    assert len(rows) == count
+    assert len(set(rows)) == count
+    assert all(len(batch) <= 4 for _, batch in batches)
+    assert all(columns == batches[0][0] for columns, _ in batches)
+    if table == "prices":
+        assert batches[0][0] == ["symbol", "timestamp", "price_usd", "source"]
+        assert rows == sorted(rows, key=lambda row: (row[0] != "BTC", row[1]))  # BTC has the lower asset id
+    if not count:
+        assert batches == [(batches[0][0], [])]
+
+def test_export_does_not_hold_the_writer_between_batches(export_db):
+    db, user_id = export_db
+    batches = db.iter_export_rows("transactions", user_id, batch_size=10)
+    next(batches)
+    
+    # The export is suspended mid-table; a write from another thread must not wait for it
+    finished = threading.Event()
+    thread = threading.Thread(target=lambda: (db.add_user("writer"), finished.set()))
+    thread.start()
+    assert finished.wait(2)
+    thread.join()
+    assert sum(len(batch) for _, batch in batches) == 15
+    
+def test_export_prices_use_index(export_db):
+    db, user_id = export_db
+    plans = query_plans(db, lambda: list(db.iter_export_rows("prices", user_id, batch_size=4)))
+    # The first query lists the user's assets; every batch after it is an index seek
+    assert len(plans) > 2
+    for plan in plans[1:]:
+        assert "SEARCH p USING INDEX idx_prices_asset_timestamp_unique" in plan
+        assert "TEMP B-TREE" not in plan
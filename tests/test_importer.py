@@ -0,0 +1,145 @@
+import pytest
+
+from exchanges import detect_format
+from importer import CsvImporter, ExchangeImporter, benchmark, create_importer
+
+def imported(db, user_id):
+    """Get the user's transactions, oldest first."""
+    return sorted(db.get_user_transactions(user_id, limit=1000), key=lambda transaction: (transaction['timestamp'], transaction['id']))
+
+def holding_amounts(db, user_id):
+    """Get the user's holdings as a dict of symbol -> amount."""
+    return {holding['symbol']: holding['amount'] for holding in db.get_user_holdings(user_id)}
+
+@pytest.mark.parametrize("name, format_name", [
+    ("binance_trades.csv", "binance_trades"),
+    ("coinbase_transactions.csv", "coinbase"),
+    ("kraken_trades.csv", "kraken_trades"),
+])
+def test_detect_format(fixture_path, name, format_name):
+    assert ExchangeImporter.detect(fixture_path(name)).name == format_name
+
+def test_detect_format_ignores_unknown_header():
+    assert detect_format(["Date", "Symbol", "Amount"]) is None
+
+def test_create_importer_falls_back_to_csv_importer(tmp_path, db):
+    file_path = tmp_path / "holdings.csv"
+    file_path.write_bytes(b"symbol,amount\n\xe4\xf6,1\n")  # Not UTF-8
+    assert isinstance(create_importer(db, str(file_path)), CsvImporter)
+
+def test_binance_trades(fixture_path, db, user_id):
+    results = ExchangeImporter(db).run(fixture_path("binance_trades.csv"), user_id)
+    assert results["format"] == "binance_trades"
+    assert results["errors"] == []
+    assert results["imported"] == 7
+    
+    rows = [(t['timestamp'], t['symbol'], t['transaction_type'], t['amount']) for t in imported(db, user_id)]
+    assert rows == [
+        ("2024-03-01 10:00:00", "BTC", "BUY", pytest.approx(0.1)),
+        ("2024-03-02 11:30:00", "ETH", "BUY", pytest.approx(1.998)),  # Fee in the base asset
+        ("2024-03-03 12:45:00", "BTC", "SELL", pytest.approx(0.05)),
+        ("2024-03-03 12:45:00", "BNB", "SELL", pytest.approx(0.001)),  # Fee in a third asset
+        ("2024-03-04 09:15:00", "ETH", "BUY", pytest.approx(1.0)),
+        ("2024-03-04 09:15:00", "BTC", "SELL", pytest.approx(0.05)),  # Crypto quote leg
+        ("2024-03-04 09:15:00", "BNB", "SELL", pytest.approx(0.0001)),
+    ]
+    
+    prices = [t['price_per_unit'] for t in imported(db, user_id)]
+    assert prices[0] == pytest.approx(60060)  # Quote fee folded into the price
+    assert prices[1] == pytest.approx(6000 / 1.998)
+    assert prices[2] == pytest.approx(62000)
+    
+    assert holding_amounts(db, user_id) == {"ETH": pytest.approx(2.998)}
+
+def test_coinbase_transactions_with_preamble(fixture_path, db, user_id):
+    results = ExchangeImporter(db).run(fixture_path("coinbase_transactions.csv"), user_id)
+    assert results["format"] == "coinbase"
+    assert results["errors"] == []
+    assert results["imported"] == 3
+    assert results["ignored"] == 1  # Send
+    
+    rows = [(t['symbol'], t['transaction_type'], t['amount'], t['price_per_unit']) for t in imported(db, user_id)]
+    assert rows == [
+        ("BTC", "BUY", pytest.approx(0.01), pytest.approx(61000)),  # Total includes the fee
+        ("ETH", "STAKING", pytest.approx(0.001), pytest.approx(3200)),
+        ("BTC", "SELL", pytest.approx(0.004), pytest.approx(63750)),  # Fee deducted from the proceeds
+    ]
+    assert holding_amounts(db, user_id) == {"BTC": pytest.approx(0.006), "ETH": pytest.approx(0.001)}
+
+def test_kraken_trades(fixture_path, db, user_id):
+    results = ExchangeImporter(db).run(fixture_path("kraken_trades.csv"), user_id)
+    assert results["format"] == "kraken_trades"
+    assert results["errors"] == []
+    assert results["imported"] == 3
+    
+    rows = [(t['timestamp'], t['symbol'], t['transaction_type'], t['amount'], t['price_per_unit']) for t in imported(db, user_id)]
+    assert rows == [
+        ("2024-03-01 10:00:00", "BTC", "BUY", pytest.approx(0.05), pytest.approx(60096)),
+        ("2024-03-02 11:00:00", "DOT", "BUY", pytest.approx(10), pytest.approx(8.02)),
+        ("2024-03-03 12:00:00", "DOT", "SELL", pytest.approx(4), pytest.approx(8.975)),
+    ]
+    assert holding_amounts(db, user_id) == {"BTC": pytest.approx(0.05), "DOT": pytest.approx(6)}
+
+@pytest.mark.parametrize("name", ["binance_trades.csv", "coinbase_transactions.csv", "kraken_trades.csv"])
+def test_reimport_adds_nothing(fixture_path, db, user_id, name):
+    importer = ExchangeImporter(db)
+    first = importer.run(fixture_path(name), user_id)
+    holdings = holding_amounts(db, user_id)
+    
+    repeat = importer.run(fixture_path(name), user_id)
+    assert repeat["imported"] == 0
+    assert repeat["duplicates"] == first["imported"]
+    assert len(imported(db, user_id)) == first["imported"]
+    assert holding_amounts(db, user_id) == holdings
+
+def test_unknown_asset_is_reported(tmp_path, db, user_id):
+    file_path = tmp_path / "binance.csv"
+    file_path.write_text(
+        "Date(UTC),Pair,Side,Price,Executed,Amount,Fee\n"
+        "2024-03-01 10:00:00,NOPEUSDT,BUY,1,5NOPE,5USDT,0USDT\n"
+        "2024-03-01 10:01:00,BTCUSDT,SIDEWAYS,1,1BTC,1USDT,0USDT\n"
+    )
+    results = ExchangeImporter(db).run(str(file_path), user_id)
+    assert results["imported"] == 0
+    assert results["errors"] == ["Line 2: Asset not found: NOPE", "Line 3: Unknown trade side: SIDEWAYS"]
+
+def test_import_throughput():
+    results = benchmark(row_count=20000)
+    assert results["first"]["errors"] == 0
+    assert results["first"]["imported"] == 30000
+    assert results["repeat"]["imported"] == 0
+    # Measured around 28,000 rows/s; the floor leaves room for slow machines
+    assert results["first"]["rows_per_second"] > 5000
+    assert results["repeat"]["rows_per_second"] > 5000
+
+def test_malformed_rows_are_reported_and_skipped(tmp_path, db, user_id):
+    file_path = tmp_path / "binance.csv"
+    file_path.write_text(
+        "Date(UTC),Pair,Side,Price,Executed,Amount,Fee\n"
+        "2024-03-01 10:00:00,BTCUSDT,BUY,60000,0.1BTC,6000USDT,6USDT\n"
+        "2024-03-01 10:01:00,BTCUSDT,BUY,60000\n"
+        "2024-03-01 10:02:00,ETHUSDT,BUY,3000,1ETH,3000USDT,3USDT,extra\n"
+        "2024-03-01 10:03:00,ETHUSDT,BUY,3000,2ETH,6000USDT,6USDT\n"
+    )
+    results = ExchangeImporter(db).run(str(file_path), user_id)
+    
+    assert results["imported"] == 3
+    assert len(results["errors"]) == 1
+    assert results["errors"][0].startswith("Line 3: ")
+    assert holding_amounts(db, user_id) == {"BTC": pytest.approx(0.1), "ETH": pytest.approx(3)}
+
+def test_holdings_csv_requires_purchase_price(tmp_path, db, user_id):
+    file_path = tmp_path / "holdings.csv"
+    file_path.write_text(
+        "symbol,amount,purchase_price,notes\n"
+        "BTC,2\n"
+        "ETH,1,,no price\n"
+        "SOL,abc,10\n"
+        "ADA,100,0.5,cold wallet\n"
+    )
+    results = CsvImporter(db).run(str(file_path), user_id)
+    
+    assert results["imported"] == 1
+    assert results["success"] == ["Added 100.0 ADA at $0.5"]
+    assert [error.split(":")[0] for error in results["errors"]] == ["Line 2", "Line 3", "Line 4"]
+    assert holding_amounts(db, user_id) == {"ADA": pytest.approx(100)}
@@ -0,0 +1,91 @@
+import pytest
+
+from portfolio import PortfolioEngine
+
+@pytest.fixture
+def portfolio(db, user_id):
+    """An engine over a user holding BTC, ETH and an unpriced SOL."""
+    btc = db.get_asset_by_symbol("BTC")['id']
+    eth = db.get_asset_by_symbol("ETH")['id']
+    sol = db.get_asset_by_symbol("SOL")['id']
+    db.add_price(btc, 100.0)
+    db.add_price(eth, 10.0)
+    holding_ids = {
+        "btc": db.add_holding(user_id, btc, 2.0, 50.0),
+        "eth": db.add_holding(user_id, eth, 30.0, 20.0),
+        "sol": db.add_holding(user_id, sol, 5.0, 1.0),
+    }
+    return PortfolioEngine(db), {"btc": btc, "eth": eth, "sol": sol}, holding_ids
+
+def test_snapshot_values_every_holding(portfolio, user_id):
+    engine, _, holding_ids = portfolio
+    snapshot = engine.get_snapshot(user_id)
+    
+    assert snapshot['total_value'] == pytest.approx(500)
+    assert snapshot['total_cost'] == pytest.approx(705)
+    assert snapshot['total_profit'] == pytest.approx(-205)
+    assert snapshot['asset_count'] == 3
+    assert snapshot['hhi'] == pytest.approx(0.4 ** 2 + 0.6 ** 2)
+    
+    # Highest value first
+    holdings = list(snapshot['holdings'])
+    assert [holding['id'] for holding in holdings] == [holding_ids["eth"], holding_ids["btc"], holding_ids["sol"]]
+    eth = holdings[0]
+    assert eth['symbol'] == "ETH"
+    assert eth['value'] == pytest.approx(300)
+    assert eth['cost'] == pytest.approx(600)
+    assert eth['profit_loss'] == pytest.approx(-300)
+    assert eth['profit_loss_pct'] == pytest.approx(-50)
+    assert eth['allocation'] == pytest.approx(60)
+    assert holdings[2]['price'] == 0
+    assert snapshot['holdings'][-1] == holdings[2]
+    
+def test_snapshot_is_cached_until_a_change(portfolio, user_id):
+    engine, assets, _ = portfolio
+    snapshot = engine.get_snapshot(user_id)
+    assert engine.get_snapshot(user_id) is snapshot
+    
+    engine.update_prices({assets["btc"]: 100.0})  # Unchanged
+    assert engine.get_snapshot(user_id) is snapshot
+    
+    engine.update_prices({assets["btc"]: 200.0})
+    updated = engine.get_snapshot(user_id)
+    assert updated is not snapshot
+    assert updated['total_value'] == pytest.approx(700)
+    assert snapshot['total_value'] == pytest.approx(500)  # Earlier snapshots are not changed
+    
+def test_update_prices_values_unpriced_assets(portfolio, user_id):
+    engine, assets, _ = portfolio
+    engine.get_snapshot(user_id)
+    engine.update_prices({assets["sol"]: 4.0})
+    assert engine.get_totals(user_id)['total_value'] == pytest.approx(520)
+    
+def test_holding_changes(db, portfolio, user_id):
+    engine, assets, holding_ids = portfolio
+    engine.get_snapshot(user_id)
+    
+    db.update_holding(user_id, holding_ids["btc"], 3.0, 50.0)
+    engine.update_holding(user_id, holding_ids["btc"])
+    assert engine.get_totals(user_id)['total_value'] == pytest.approx(600)
+    
+    new_id = db.add_holding(user_id, assets["eth"], 1.0, 5.0)
+    engine.update_holding(user_id, new_id)
+    assert engine.get_totals(user_id)['total_value'] == pytest.approx(610)
+    
+    # Removing a holding from the middle moves the last one into its place
+    db.delete_holding(user_id, holding_ids["eth"])
+    engine.remove_holding(user_id, holding_ids["eth"])
+    snapshot = engine.get_snapshot(user_id)
+    assert snapshot['total_value'] == pytest.approx(310)
+    assert {holding['id'] for holding in snapshot['holdings']} == {holding_ids["btc"], holding_ids["sol"], new_id}
+    
+    # A reload from the database agrees with the incremental changes
+    engine.invalidate(user_id)
+    reloaded = engine.get_snapshot(user_id)
+    assert list(reloaded['holdings']) == list(snapshot['holdings'])
+    
+def test_empty_portfolio(db, user_id):
+    snapshot = PortfolioEngine(db).get_snapshot(user_id)
+    assert snapshot['total_value'] == 0
+    assert snapshot['hhi'] == 0
+    assert list(snapshot['holdings']) == []
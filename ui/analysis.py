@@ -1,27 +1,34 @@
 import customtkinter as ctk
 from PIL import Image, ImageTk
 import os
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 import tkinter as tk
-import pandas as pd
-import matplotlib
-matplotlib.use("TkAgg")
-from matplotlib.figure import Figure
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
-import numpy as np
 
-from utils import format_currency, format_percentage, embed_chart, create_pie_chart, create_bar_chart
+from analytics import diversification_score
+from charts import (
+    ChartManager, pie_chart_data, draw_pie_chart, update_pie_chart, bar_chart_data, draw_bar_chart,
+    update_bar_chart, value_history_data, draw_value_history_chart, update_value_history_chart
+)
+from database import choose_candle_interval
+from portfolio import PortfolioEngine
+from utils import format_currency, format_percentage
+
+HISTORY_RANGES = {"7D": 7, "30D": 30, "1Y": 365}
 
 class AnalysisDashboard(ctk.CTkFrame):
-    def __init__(self, master, user, db, api):
+    def __init__(self, master, user, db, api, portfolio=None, chart_renderer=None):
         """Initialize the analysis dashboard screen."""
         super().__init__(master)
         self.master = master
         self.user = user
         self.db = db
         self.api = api
+        self.portfolio = portfolio or PortfolioEngine(db)
+        self.charts = ChartManager(chart_renderer)
         self.current_prices = {}
         self.holdings = []
+        self.hhi = 0
+        self.history_range = "30D"
         
         # Configure layout
         self.grid_rowconfigure(0, weight=0)  # Title
@@ -120,17 +127,68 @@ class AnalysisDashboard(ctk.CTkFrame):
         self.bar_chart_frame = ctk.CTkFrame(self.allocation_frame, height=300)
         self.bar_chart_frame.grid(row=0, column=1, padx=(10, 0), pady=10, sticky="nsew")
         
+        # Chart titles sit below the charts, which are packed above them on first load
+        self.pie_title = ctk.CTkLabel(
+            self.pie_chart_frame,
+            text="Asset Allocation",
+            font=ctk.CTkFont(size=14, weight="bold")
+        )
+        self.bar_title = ctk.CTkLabel(
+            self.bar_chart_frame,
+            text="Top Assets by Value",
+            font=ctk.CTkFont(size=14, weight="bold")
+        )
+        
+        # Messages shown instead of the charts when there is nothing to plot
+        self.no_data_labels = [
+            ctk.CTkLabel(
+                frame,
+                text="No portfolio data available.\nAdd assets to see analysis.",
+                font=ctk.CTkFont(size=14),
+                text_color="gray"
+            )
+            for frame in (self.pie_chart_frame, self.bar_chart_frame)
+        ]
+        
+        # Value History Section
+        self.history_label = ctk.CTkLabel(
+            self.content_frame,
+            text="Portfolio Value History",
+            font=ctk.CTkFont(size=16, weight="bold")
+        )
+        self.history_label.grid(row=4, column=0, padx=0, pady=(10, 10), sticky="w")
+        
+        # Range selector
+        self.history_range_selector = ctk.CTkSegmentedButton(
+            self.content_frame,
+            values=list(HISTORY_RANGES),
+            command=self.change_history_range
+        )
+        self.history_range_selector.set(self.history_range)
+        self.history_range_selector.grid(row=4, column=0, padx=0, pady=(10, 10), sticky="e")
+        
+        # Value history chart frame
+        self.history_chart_frame = ctk.CTkFrame(self.content_frame, height=300)
+        self.history_chart_frame.grid(row=5, column=0, padx=0, pady=(0, 20), sticky="ew")
+        
+        self.no_history_label = ctk.CTkLabel(
+            self.history_chart_frame,
+            text="No price history available for this period yet.",
+            font=ctk.CTkFont(size=14),
+            text_color="gray"
+        )
+        
         # Performance Metrics Section
         self.performance_label = ctk.CTkLabel(
             self.content_frame,
             text="Performance Metrics",
             font=ctk.CTkFont(size=16, weight="bold")
         )
-        self.performance_label.grid(row=4, column=0, padx=0, pady=(10, 10), sticky="w")
+        self.performance_label.grid(row=6, column=0, padx=0, pady=(10, 10), sticky="w")
         
         # Performance table frame
         self.performance_frame = ctk.CTkFrame(self.content_frame)
-        self.performance_frame.grid(row=5, column=0, padx=0, pady=(0, 20), sticky="ew")
+        self.performance_frame.grid(row=7, column=0, padx=0, pady=(0, 20), sticky="ew")
         
         # Create treeview for performance data
         self.create_performance_table()
@@ -141,11 +199,11 @@ class AnalysisDashboard(ctk.CTkFrame):
             text="Risk Analysis",
             font=ctk.CTkFont(size=16, weight="bold")
         )
-        self.risk_label.grid(row=6, column=0, padx=0, pady=(10, 10), sticky="w")
+        self.risk_label.grid(row=8, column=0, padx=0, pady=(10, 10), sticky="w")
         
         # Risk analysis frame
         self.risk_frame = ctk.CTkFrame(self.content_frame, height=300)
-        self.risk_frame.grid(row=7, column=0, padx=0, pady=(0, 20), sticky="ew")
+        self.risk_frame.grid(row=9, column=0, padx=0, pady=(0, 20), sticky="ew")
         
         # Diversification Score
         self.diversification_frame = ctk.CTkFrame(self.risk_frame)
@@ -183,11 +241,11 @@ class AnalysisDashboard(ctk.CTkFrame):
             text="Recommendations",
             font=ctk.CTkFont(size=16, weight="bold")
         )
-        self.recommendations_label.grid(row=8, column=0, padx=0, pady=(10, 10), sticky="w")
+        self.recommendations_label.grid(row=10, column=0, padx=0, pady=(10, 10), sticky="w")
         
         # Recommendations frame
         self.recommendations_frame = ctk.CTkFrame(self.content_frame)
-        self.recommendations_frame.grid(row=9, column=0, padx=0, pady=(0, 20), sticky="ew")
+        self.recommendations_frame.grid(row=11, column=0, padx=0, pady=(0, 20), sticky="ew")
         
         # Recommendations text
         self.recommendations_text = ctk.CTkTextbox(self.recommendations_frame, height=150)
@@ -267,67 +325,23 @@ class AnalysisDashboard(ctk.CTkFrame):
         
     def load_data(self):
         """Load and analyze portfolio data."""
-        # Get user holdings
-        holdings_data = self.db.get_user_holdings(self.user['id'])
+        # Pick up prices stored since the last refresh, then read the shared valuation
+        self.portfolio.reload_prices()
+        snapshot = self.portfolio.get_snapshot(self.user['id'])
+        
+        # Holdings come sorted by value (descending) with allocation percentages
+        self.holdings = snapshot['holdings']
+        self.hhi = snapshot['hhi']
+        self.current_prices = snapshot['prices']
         
-        if not holdings_data:
+        if not self.holdings:
             self.show_no_data_message()
             return
-            
-        # Get latest prices for all assets
-        asset_ids = [holding['asset_id'] for holding in holdings_data]
-        self.current_prices = {}
-        
-        for asset_id in asset_ids:
-            price_data = self.db.get_latest_price(asset_id)
-            if price_data:
-                self.current_prices[asset_id] = price_data['price_usd']
-        
-        # Process holdings data
-        self.holdings = []
-        total_value = 0
-        total_cost = 0
-        
-        for holding in holdings_data:
-            price = self.current_prices.get(holding['asset_id'], 0)
-            amount = holding['amount']
-            purchase_price = holding['purchase_price_per_unit']
-            
-            value = amount * price
-            cost = amount * purchase_price
-            profit_loss = value - cost
-            profit_loss_pct = (profit_loss / cost) * 100 if cost > 0 else 0
-            
-            holding_data = {
-                "id": holding['id'],
-                "asset_id": holding['asset_id'],
-                "symbol": holding['symbol'],
-                "name": holding['name'],
-                "amount": amount,
-                "price": price,
-                "value": value,
-                "purchase_price": purchase_price,
-                "cost": cost,
-                "profit_loss": profit_loss,
-                "profit_loss_pct": profit_loss_pct,
-                "market_cap": holding['market_cap'] or 0
-            }
-            
-            self.holdings.append(holding_data)
-            total_value += value
-            total_cost += cost
-        
-        # Sort holdings by value (descending)
-        self.holdings.sort(key=lambda h: h["value"], reverse=True)
-        
-        # Calculate allocation percentages
-        for holding in self.holdings:
-            holding["allocation"] = (holding["value"] / total_value) * 100 if total_value > 0 else 0
         
         # Update UI
-        self.update_summary(total_value, len(self.holdings), total_value - total_cost, 
-                           ((total_value - total_cost) / total_cost) * 100 if total_cost > 0 else 0)
+        self.update_summary(snapshot['total_value'], snapshot['asset_count'], snapshot['total_profit'], snapshot['total_profit_pct'])
         self.update_charts()
+        self.update_value_history()
         self.update_performance_table()
         
         self.analyze_portfolio()
@@ -337,28 +351,14 @@ class AnalysisDashboard(ctk.CTkFrame):
         # Clear existing data
         self.update_summary(0, 0, 0, 0)
         
-        # Clear charts
-        for widget in self.pie_chart_frame.winfo_children():
-            widget.destroy()
-        for widget in self.bar_chart_frame.winfo_children():
-            widget.destroy()
-            
-        # Add messages to chart frames
-        no_data_label1 = ctk.CTkLabel(
-            self.pie_chart_frame,
-            text="No portfolio data available.\nAdd assets to see analysis.",
-            font=ctk.CTkFont(size=14),
-            text_color="gray"
-        )
-        no_data_label1.pack(expand=True)
-        
-        no_data_label2 = ctk.CTkLabel(
-            self.bar_chart_frame,
-            text="No portfolio data available.\nAdd assets to see analysis.",
-            font=ctk.CTkFont(size=14),
-            text_color="gray"
-        )
-        no_data_label2.pack(expand=True)
+        # Hide charts and show messages in their place
+        for name in ("allocation", "values", "history"):
+            self.charts.hide(name)
+        self.pie_title.pack_forget()
+        self.bar_title.pack_forget()
+        self.no_history_label.pack_forget()
+        for label in self.no_data_labels:
+            label.pack(expand=True)
         
         # Clear performance table
         for item in self.performance_tree.get_children():
@@ -393,41 +393,72 @@ class AnalysisDashboard(ctk.CTkFrame):
             self.most_valuable_asset_value.configure(text="None")
             
     def update_charts(self):
-        """Update portfolio charts."""
-        # Clear existing charts
-        for widget in self.pie_chart_frame.winfo_children():
-            widget.destroy()
-        for widget in self.bar_chart_frame.winfo_children():
-            widget.destroy()
-            
+        """Update portfolio charts in place; unchanged data is not redrawn."""
         if not self.holdings:
             return
             
-        # Create pie chart for allocation
-        pie_fig = create_pie_chart(self.holdings, self.current_prices, width=400, height=300)
-        if pie_fig:
-            pie_chart = embed_chart(pie_fig, self.pie_chart_frame)
-            pie_chart.pack(fill="both", expand=True)
+        for label in self.no_data_labels:
+            label.pack_forget()
             
-            pie_title = ctk.CTkLabel(
-                self.pie_chart_frame,
-                text="Asset Allocation",
-                font=ctk.CTkFont(size=14, weight="bold")
-            )
-            pie_title.pack(side="top", pady=(10, 0))
+        # Pie chart for allocation
+        self.charts.show(
+            "allocation",
+            self.pie_chart_frame,
+            pie_chart_data(self.holdings, self.current_prices),
+            draw_pie_chart,
+            update_pie_chart,
+            width=400,
+            height=300
+        )
+        self.pie_title.pack(side="top", pady=(10, 0))
+        
+        # Bar chart for asset values
+        self.charts.show(
+            "values",
+            self.bar_chart_frame,
+            bar_chart_data(self.holdings, self.current_prices),
+            draw_bar_chart,
+            update_bar_chart,
+            width=400,
+            height=300
+        )
+        self.bar_title.pack(side="top", pady=(10, 0))
+            
+    def change_history_range(self, value):
+        """Handle a change of the value history range."""
+        self.history_range = value
+        self.update_value_history()
+        
+    def update_value_history(self):
+        """Update the portfolio value history chart from stored candles."""
+        if not self.holdings:
+            return
+            
+        # Candle timestamps are UTC; pick an interval that keeps the point count bounded
+        end = datetime.now(timezone.utc)
+        start = end - timedelta(days=HISTORY_RANGES[self.history_range])
+        interval = choose_candle_interval(start, end)
         
-        # Create bar chart for asset values
-        bar_fig = create_bar_chart(self.holdings, self.current_prices, width=400, height=300)
-        if bar_fig:
-            bar_chart = embed_chart(bar_fig, self.bar_chart_frame)
-            bar_chart.pack(fill="both", expand=True)
+        amounts = {}
+        for holding in self.holdings:
+            amounts[holding['asset_id']] = amounts.get(holding['asset_id'], 0) + holding['amount']
             
-            bar_title = ctk.CTkLabel(
-                self.bar_chart_frame,
-                text="Top Assets by Value",
-                font=ctk.CTkFont(size=14, weight="bold")
+        candles = self.db.get_candles(list(amounts), interval, start.strftime("%Y-%m-%d %H:%M:%S"))
+        chart_data = value_history_data(candles, amounts)
+        if chart_data[0]:
+            self.no_history_label.pack_forget()
+            self.charts.show(
+                "history",
+                self.history_chart_frame,
+                chart_data,
+                draw_value_history_chart,
+                update_value_history_chart,
+                width=800,
+                height=300
             )
-            bar_title.pack(side="top", pady=(10, 0))
+        else:
+            self.charts.hide("history")
+            self.no_history_label.pack(expand=True, pady=20)
             
     def update_performance_table(self):
         """Update performance metrics table."""
@@ -495,24 +526,8 @@ class AnalysisDashboard(ctk.CTkFrame):
         
     def calculate_diversification_score(self):
         """Calculate a diversification score (0-10) based on portfolio composition."""
-        # Number of assets (more assets = higher score)
-        asset_count = len(self.holdings)
-        
-        # Calculate concentration (Herfindahl-Hirschman Index)
-        hhi = sum(holding["allocation"] ** 2 for holding in self.holdings) / 100
-        
-        # Number of assets score (max 5 points)
-        asset_score = min(5, asset_count / 2)
-        
-        # Concentration score (max 5 points)
-        # Lower HHI is better (less concentrated)
-        concentration_score = 5 * (1 - (hhi / 1))
-        
-        # Total score
-        total_score = asset_score + concentration_score
-        
-        # Cap at 10
-        return min(10, round(total_score))
+        # More assets and a lower concentration (Herfindahl-Hirschman Index) score higher
+        return diversification_score(len(self.holdings), self.hhi)
         
     def generate_recommendations(self, diversification_score):
         """Generate portfolio recommendations."""
@@ -2,13 +2,21 @@ import customtkinter as ctk
 from PIL import Image, ImageTk
 import os
 from datetime import datetime
+import threading
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
 
-from utils import format_currency, format_percentage, calculate_weighted_average, parse_csv_data, convert_comma_to_period, parse_numeric_input
+from exporter import DataExporter, parquet_available
+from importer import create_importer
+from portfolio import PortfolioEngine
+from utils import format_currency, format_percentage, calculate_weighted_average, convert_comma_to_period, parse_numeric_input
+from ui.widgets import VirtualTreeview, profit_tag
+
+# Transactions read per page as the history list is scrolled
+TRANSACTION_PAGE_SIZE = 200
 
 class AssetManagement(ctk.CTkFrame):
-    def __init__(self, master, user, db, api, refresh_callback):
+    def __init__(self, master, user, db, api, refresh_callback, coin_index=None, portfolio=None):
         """Initialize the asset management screen."""
         super().__init__(master)
         self.master = master
@@ -16,9 +24,12 @@ class AssetManagement(ctk.CTkFrame):
         self.db = db
         self.api = api
         self.refresh_callback = refresh_callback
+        self.coin_index = coin_index
+        self.portfolio = portfolio or PortfolioEngine(db)
         self.sort_by = "value"  # Default sort
         self.sort_ascending = False
         self.current_prices = {}
+        self.transactions_complete = False  # Whether the history list holds every transaction
         
         # Configure layout
         self.grid_rowconfigure(0, weight=0)  # Header
@@ -44,6 +55,7 @@ class AssetManagement(ctk.CTkFrame):
         self.header_frame.grid_columnconfigure(1, weight=0)
         self.header_frame.grid_columnconfigure(2, weight=0)
         self.header_frame.grid_columnconfigure(3, weight=0)
+        self.header_frame.grid_columnconfigure(4, weight=0)
         
         # Title
         self.title_label = ctk.CTkLabel(
@@ -71,6 +83,15 @@ class AssetManagement(ctk.CTkFrame):
         )
         self.import_button.grid(row=0, column=2, padx=(0, 10), pady=10, sticky="e")
         
+        # Export button
+        self.export_button = ctk.CTkButton(
+            self.header_frame,
+            text="Export",
+            command=self.show_export_dialog,
+            width=100
+        )
+        self.export_button.grid(row=0, column=3, padx=(0, 10), pady=10, sticky="e")
+        
         # Refresh button
         self.refresh_button = ctk.CTkButton(
             self.header_frame,
@@ -78,7 +99,7 @@ class AssetManagement(ctk.CTkFrame):
             command=self.refresh_data,
             width=120
         )
-        self.refresh_button.grid(row=0, column=3, padx=(0, 20), pady=10, sticky="e")
+        self.refresh_button.grid(row=0, column=4, padx=(0, 20), pady=10, sticky="e")
         
     def create_content(self):
         """Create content area with tabs."""
@@ -181,9 +202,11 @@ class AssetManagement(ctk.CTkFrame):
         self.tree_scrollbar_x = tk.Scrollbar(self.tree_container, orient="horizontal")
         self.tree_scrollbar_x.pack(side="bottom", fill="x")
         
-        # Create the treeview
-        self.holdings_tree = ttk.Treeview(
+        # Create the treeview; only the rows in view are materialized
+        self.holdings_tree = VirtualTreeview(
             self.tree_container,
+            self.format_holding_row,
+            lambda holding: holding['id'],
             columns=("symbol", "amount", "value", "price", "purchase", "profit", "profit_pct", "actions"),
             show="headings",
             height=20,
@@ -239,9 +262,12 @@ class AssetManagement(ctk.CTkFrame):
         self.trans_scrollbar_x = tk.Scrollbar(self.trans_tree_container, orient="horizontal")
         self.trans_scrollbar_x.pack(side="bottom", fill="x")
         
-        # Create the treeview
-        self.transaction_tree = ttk.Treeview(
+        # Create the treeview; only the rows in view are materialized
+        self.transaction_tree = VirtualTreeview(
             self.trans_tree_container,
+            self.format_transaction_row,
+            lambda transaction: transaction['id'],
+            load_more=self.load_more_transactions,
             columns=("date", "type", "symbol", "amount", "price", "total", "notes", "actions"),
             show="headings",
             height=20,
@@ -318,54 +344,47 @@ class AssetManagement(ctk.CTkFrame):
         # Reload the holdings list with the new sort
         self.load_assets_data()
         
-    def load_assets_data(self):
-        """Load asset data from database."""
-        # Clear existing data
-        self.holdings_tree.delete(*self.holdings_tree.get_children())
-        self.transaction_tree.delete(*self.transaction_tree.get_children())
+    def format_holding_row(self, holding):
+        """Get the column values and row tag of a holding."""
+        values = (
+            f"{holding['symbol']} ({holding['name']})",
+            f"{holding['amount']:.8f}",
+            format_currency(holding['value']),
+            format_currency(holding['price']),
+            format_currency(holding['purchase_price']),
+            format_currency(holding['profit_loss']),
+            format_percentage(holding['profit_loss_pct']),
+            "Update | Delete"
+        )
+        # Set row color based on profit/loss
+        return values, profit_tag(holding['profit_loss'])
+        
+    def format_transaction_row(self, transaction):
+        """Get the column values and row tag of a transaction."""
+        values = (
+            datetime.fromisoformat(transaction['timestamp']).strftime("%Y-%m-%d %H:%M:%S"),
+            transaction['transaction_type'],
+            transaction['symbol'],
+            f"{transaction['amount']:.8f}",
+            format_currency(transaction['price_per_unit']),
+            format_currency(transaction['amount'] * transaction['price_per_unit']),
+            transaction['notes'] or "",
+            "Edit | Delete"
+        )
+        return values, "neutral"
         
-        # Get user holdings
-        holdings_data = self.db.get_user_holdings(self.user['id'])
+    def load_assets_data(self):
+        """Load asset data from database.
         
-        if not holdings_data:
-            return
-            
-        # Get latest prices for all assets
-        asset_ids = [holding['asset_id'] for holding in holdings_data]
-        self.current_prices = {}
+        The lists only format the rows in view and rewrite the ones that
+        changed, so a reload keeps the scroll position and selection.
+        """
+        # Valued holdings from the shared portfolio
+        snapshot = self.portfolio.get_snapshot(self.user['id'])
+        self.current_prices = snapshot['prices']
         
-        for asset_id in asset_ids:
-            price_data = self.db.get_latest_price(asset_id)
-            if price_data:
-                self.current_prices[asset_id] = price_data['price_usd']
-        
-        # Process holdings data
-        holdings = []
-        
-        for holding in holdings_data:
-            price = self.current_prices.get(holding['asset_id'], 0)
-            amount = holding['amount']
-            purchase_price = holding['purchase_price_per_unit']
-            
-            value = amount * price
-            profit_loss = value - (amount * purchase_price)
-            profit_loss_pct = (profit_loss / (amount * purchase_price)) * 100 if purchase_price > 0 else 0
-            
-            holding_data = {
-                "id": holding['id'],
-                "asset_id": holding['asset_id'],
-                "symbol": holding['symbol'],
-                "name": holding['name'],
-                "amount": amount,
-                "price": price,
-                "value": value,
-                "purchase_price": purchase_price,
-                "profit_loss": profit_loss,
-                "profit_loss_pct": profit_loss_pct,
-                "market_cap": holding['market_cap'] or 0
-            }
-            
-            holdings.append(holding_data)
+        # The snapshot is shared, so sort a copy
+        holdings = list(snapshot['holdings'])
         
         # Sort holdings
         if self.sort_by == "value":
@@ -378,54 +397,32 @@ class AssetManagement(ctk.CTkFrame):
             holdings.sort(key=lambda h: h["profit_loss"], reverse=not self.sort_ascending)
         elif self.sort_by == "market_cap":
             holdings.sort(key=lambda h: h["market_cap"], reverse=not self.sort_ascending)
-        
-        # Populate holdings treeview
-        for holding in holdings:
-            row_id = self.holdings_tree.insert(
-                "",
-                "end",
-                values=(
-                    f"{holding['symbol']} ({holding['name']})",
-                    f"{holding['amount']:.8f}",
-                    format_currency(holding['value']),
-                    format_currency(holding['price']),
-                    format_currency(holding['purchase_price']),
-                    format_currency(holding['profit_loss']),
-                    format_percentage(holding['profit_loss_pct']),
-                    "Update | Delete"
-                ),
-                tags=(holding['id'],)
-            )
             
-            # Set row color based on profit/loss
-            if holding['profit_loss'] > 0:
-                self.holdings_tree.tag_configure(holding['id'], background="#2b2b2b", foreground="#2ecc71")
-            elif holding['profit_loss'] < 0:
-                self.holdings_tree.tag_configure(holding['id'], background="#2b2b2b", foreground="#e74c3c")
-            else:
-                self.holdings_tree.tag_configure(holding['id'], background="#2b2b2b", foreground="white")
-        
-        # Load transaction history
-        transactions = self.db.get_user_transactions(self.user['id'])
-        
-        for transaction in transactions:
-            transaction_id = transaction['id']
-            self.transaction_tree.insert(
-                "",
-                "end",
-                values=(
-                    datetime.fromisoformat(transaction['timestamp']).strftime("%Y-%m-%d %H:%M:%S"),
-                    transaction['transaction_type'],
-                    transaction['symbol'],
-                    f"{transaction['amount']:.8f}",
-                    format_currency(transaction['price_per_unit']),
-                    format_currency(transaction['amount'] * transaction['price_per_unit']),
-                    transaction['notes'] or "",
-                    "Edit | Delete"
-                ),
-                tags=(transaction_id,)
-            )
+        self.holdings_tree.set_records(holdings)
+        
+        # Load transaction history down to the rows in view, so the list
+        # keeps its place; older pages load again as it is scrolled
+        limit = self.transaction_tree.offset + TRANSACTION_PAGE_SIZE
+        transactions = self.db.get_user_transactions(self.user['id'], limit) if holdings else []
+        self.transactions_complete = len(transactions) < limit
+        self.transaction_tree.set_records(transactions)
+        
+    def load_more_transactions(self):
+        """Add the next page of older transactions to the history list."""
+        transactions = self.transaction_tree.records
+        if self.transactions_complete or not transactions:
+            return
             
+        # Continue from the oldest transaction shown
+        page = self.db.get_user_transactions(
+            self.user['id'],
+            TRANSACTION_PAGE_SIZE,
+            before_timestamp=transactions[-1]['timestamp'],
+            before_id=transactions[-1]['id']
+        )
+        self.transactions_complete = len(page) < TRANSACTION_PAGE_SIZE
+        self.transaction_tree.append_records(page)
+        
     def show_add_asset_dialog(self):
         """Show dialog to add a new asset."""
         dialog = ctk.CTkToplevel(self)
@@ -457,11 +454,7 @@ class AssetManagement(ctk.CTkFrame):
         asset_label.grid(row=0, column=0, padx=(20, 10), pady=(10, 0), sticky="w")
         
         # Get all assets
-        assets_data = []
-        self.cursor = self.db.connection.cursor()
-        self.cursor.execute("SELECT id, symbol, name FROM assets ORDER BY symbol")
-        for row in self.cursor.fetchall():
-            assets_data.append({"id": row[0], "symbol": row[1], "name": row[2]})
+        assets_data = self.db.get_all_assets()
         
         # Asset dropdown items
         asset_options = [f"{asset['symbol']} - {asset['name']}" for asset in assets_data]
@@ -578,7 +571,7 @@ class AssetManagement(ctk.CTkFrame):
         """Show dialog to add a custom asset."""
         dialog = ctk.CTkToplevel(self)
         dialog.title("Add Custom Asset")
-        dialog.geometry("400x400")
+        dialog.geometry("400x560")
         dialog.transient(parent_dialog)
         dialog.resizable(False, True)
         
@@ -593,9 +586,68 @@ class AssetManagement(ctk.CTkFrame):
         )
         title_label.grid(row=0, column=0, padx=20, pady=(20, 10), sticky="ew")
         
+        # CoinGecko lookup
+        lookup_frame = ctk.CTkFrame(dialog)
+        lookup_frame.grid(row=1, column=0, padx=20, pady=(10, 0), sticky="ew")
+        lookup_frame.grid_columnconfigure(0, weight=1)
+        
+        lookup_label = ctk.CTkLabel(
+            lookup_frame,
+            text="Look up on CoinGecko:",
+            font=ctk.CTkFont(size=14)
+        )
+        lookup_label.grid(row=0, column=0, columnspan=2, padx=(20, 10), pady=(10, 0), sticky="w")
+        
+        lookup_entry = ctk.CTkEntry(
+            lookup_frame,
+            placeholder_text="Symbol or name (e.g., sol)"
+        )
+        lookup_entry.grid(row=1, column=0, padx=(20, 10), pady=(5, 0), sticky="ew")
+        
+        lookup_var = ctk.StringVar(value="")
+        lookup_results = []
+        
+        def on_result_selected(choice):
+            # Fill in the form from the selected coin
+            for coin in lookup_results:
+                if f"{coin['symbol'].upper()} - {coin['name']} ({coin['id']})" == choice:
+                    for entry, value in ((symbol_entry, coin['symbol'].upper()), (name_entry, coin['name']), (coingecko_entry, coin['id'])):
+                        entry.delete(0, "end")
+                        entry.insert(0, value)
+                    break
+                    
+        lookup_dropdown = ctk.CTkOptionMenu(
+            lookup_frame,
+            values=["No results"],
+            variable=lookup_var,
+            command=on_result_selected,
+            state="disabled"
+        )
+        lookup_dropdown.grid(row=2, column=0, columnspan=2, padx=20, pady=(5, 10), sticky="ew")
+        
+        def show_results(results, error):
+            lookup_results[:] = results
+            if results:
+                options = [f"{coin['symbol'].upper()} - {coin['name']} ({coin['id']})" for coin in results]
+                lookup_dropdown.configure(values=options, state="normal")
+                lookup_var.set("Select a match...")
+            else:
+                lookup_dropdown.configure(values=["No results"], state="disabled")
+                lookup_var.set(error or "No results")
+                
+        lookup_button = ctk.CTkButton(
+            lookup_frame,
+            text="Search",
+            command=lambda: self.lookup_coin(dialog, lookup_entry.get(), show_results),
+            width=80,
+            state="normal" if self.coin_index else "disabled"
+        )
+        lookup_button.grid(row=1, column=1, padx=(0, 20), pady=(5, 0), sticky="e")
+        lookup_entry.bind("<Return>", lambda event: lookup_button.invoke())
+        
         # Symbol entry
         symbol_frame = ctk.CTkFrame(dialog)
-        symbol_frame.grid(row=1, column=0, padx=20, pady=(10, 0), sticky="ew")
+        symbol_frame.grid(row=2, column=0, padx=20, pady=(10, 0), sticky="ew")
         
         symbol_label = ctk.CTkLabel(
             symbol_frame,
@@ -613,7 +665,7 @@ class AssetManagement(ctk.CTkFrame):
         
         # Name entry
         name_frame = ctk.CTkFrame(dialog)
-        name_frame.grid(row=2, column=0, padx=20, pady=(10, 0), sticky="ew")
+        name_frame.grid(row=3, column=0, padx=20, pady=(10, 0), sticky="ew")
         
         name_label = ctk.CTkLabel(
             name_frame,
@@ -631,7 +683,7 @@ class AssetManagement(ctk.CTkFrame):
         
         # CoinGecko ID entry
         coingecko_frame = ctk.CTkFrame(dialog)
-        coingecko_frame.grid(row=3, column=0, padx=20, pady=(10, 0), sticky="ew")
+        coingecko_frame.grid(row=4, column=0, padx=20, pady=(10, 0), sticky="ew")
         
         coingecko_label = ctk.CTkLabel(
             coingecko_frame,
@@ -649,7 +701,7 @@ class AssetManagement(ctk.CTkFrame):
         
         # Buttons
         button_frame = ctk.CTkFrame(dialog, fg_color="transparent")
-        button_frame.grid(row=4, column=0, padx=20, pady=(10, 20), sticky="ew")
+        button_frame.grid(row=5, column=0, padx=20, pady=(10, 20), sticky="ew")
         
         button_frame.grid_columnconfigure(0, weight=1)
         button_frame.grid_columnconfigure(1, weight=1)
@@ -677,6 +729,37 @@ class AssetManagement(ctk.CTkFrame):
         )
         add_button.grid(row=0, column=1, padx=(10, 20), pady=0, sticky="w")
         
+    def lookup_coin(self, dialog, query, on_results):
+        """Search the coin index and pass (results, error) to on_results.
+        
+        Local matches are shown immediately. On a local miss the remote
+        search runs on a worker thread so the dialog stays responsive.
+        """
+        if not self.coin_index or not query.strip():
+            return
+            
+        results = self.coin_index.search(query)
+        if results:
+            on_results(results, None)
+            return
+            
+        on_results([], "Searching CoinGecko...")
+        response = []
+        
+        def worker():
+            response.append(self.coin_index.lookup(query))
+            
+        def check_finished():
+            if not dialog.winfo_exists():
+                return
+            if response:
+                on_results(*response[0])
+            else:
+                dialog.after(100, check_finished)
+                
+        threading.Thread(target=worker, daemon=True).start()
+        dialog.after(100, check_finished)
+        
     def add_custom_asset(self, dialog, parent_dialog, symbol, name, coingecko_id):
         """Add a custom asset to the database."""
         symbol = symbol.strip().upper()
@@ -694,11 +777,7 @@ class AssetManagement(ctk.CTkFrame):
             messagebox.showinfo("Success", f"Added {symbol} to the database.", parent=dialog)
             
             # Update asset dropdown in parent dialog
-            assets_data = []
-            self.cursor = self.db.connection.cursor()
-            self.cursor.execute("SELECT id, symbol, name FROM assets ORDER BY symbol")
-            for row in self.cursor.fetchall():
-                assets_data.append({"id": row[0], "symbol": row[1], "name": row[2]})
+            assets_data = self.db.get_all_assets()
             
             asset_options = [f"{asset['symbol']} - {asset['name']}" for asset in assets_data]
             
@@ -767,6 +846,7 @@ class AssetManagement(ctk.CTkFrame):
             dialog.destroy()
             
             # Refresh data
+            self.portfolio.update_holding(self.user['id'], holding_id)
             self.load_assets_data()
             if self.refresh_callback:
                 self.refresh_callback()
@@ -776,14 +856,7 @@ class AssetManagement(ctk.CTkFrame):
     def show_update_dialog(self, holding_id):
         """Show dialog to update a holding."""
         # Get holding details
-        self.cursor = self.db.connection.cursor()
-        self.cursor.execute("""
-            SELECT h.*, a.symbol, a.name 
-            FROM holdings h
-            JOIN assets a ON h.asset_id = a.id
-            WHERE h.id = ?
-        """, (holding_id,))
-        holding = self.cursor.fetchone()
+        holding = self.db.get_holding(self.user['id'], holding_id)
         
         if not holding:
             messagebox.showerror("Error", "Holding not found.")
@@ -1176,6 +1249,7 @@ class AssetManagement(ctk.CTkFrame):
         dialog.destroy()
         
         # Refresh data
+        self.portfolio.update_holding(self.user['id'], holding['id'])
         self.load_assets_data()
         if self.refresh_callback:
             self.refresh_callback()
@@ -1238,6 +1312,7 @@ class AssetManagement(ctk.CTkFrame):
         dialog.destroy()
         
         # Refresh data
+        self.portfolio.update_holding(self.user['id'], holding['id'])
         self.load_assets_data()
         if self.refresh_callback:
             self.refresh_callback()
@@ -1297,6 +1372,7 @@ class AssetManagement(ctk.CTkFrame):
             dialog.destroy()
             
             # Refresh data
+            self.portfolio.update_holding(self.user['id'], holding['id'])
             self.load_assets_data()
             if self.refresh_callback:
                 self.refresh_callback()
@@ -1307,14 +1383,7 @@ class AssetManagement(ctk.CTkFrame):
     def show_delete_confirmation(self, holding_id):
         """Show confirmation dialog before deleting a holding."""
         # Get holding details
-        self.cursor = self.db.connection.cursor()
-        self.cursor.execute("""
-            SELECT h.*, a.symbol, a.name 
-            FROM holdings h
-            JOIN assets a ON h.asset_id = a.id
-            WHERE h.id = ?
-        """, (holding_id,))
-        holding = self.cursor.fetchone()
+        holding = self.db.get_holding(self.user['id'], holding_id)
         
         if not holding:
             messagebox.showerror("Error", "Holding not found.")
@@ -1343,6 +1412,7 @@ class AssetManagement(ctk.CTkFrame):
                 messagebox.showinfo("Success", f"Deleted {holding['symbol']} holding.")
                 
                 # Refresh data
+                self.portfolio.remove_holding(self.user['id'], holding_id)
                 self.load_assets_data()
                 if self.refresh_callback:
                     self.refresh_callback()
@@ -1351,13 +1421,11 @@ class AssetManagement(ctk.CTkFrame):
         
     def on_holding_double_click(self, event):
         """Handle double-click on a holding row."""
-        row_id = self.holdings_tree.identify_row(event.y)
-        if not row_id:
+        # Get the holding ID of the row
+        holding_id = self.holdings_tree.identify_key(event.y)
+        if holding_id is None:
             return
             
-        # Get the holding ID from the row tags
-        holding_id = self.holdings_tree.item(row_id, "tags")[0]
-        
         # Get column
         col = self.holdings_tree.identify_column(event.x)
         col_idx = int(col[1:]) - 1
@@ -1378,34 +1446,29 @@ class AssetManagement(ctk.CTkFrame):
             
     def show_transaction_context_menu(self, event):
         """Show context menu for a transaction."""
-        # Get the row id at the event position
-        row_id = self.transaction_tree.identify_row(event.y)
-        if not row_id:
+        # Get the transaction ID of the row at the event position
+        transaction_id = self.transaction_tree.identify_key(event.y)
+        if transaction_id is None:
             return
             
         # Select the row
-        self.transaction_tree.selection_set(row_id)
+        self.transaction_tree.select_key(transaction_id)
         
         # Create the context menu
         menu = tk.Menu(self, tearoff=0)
-        menu.add_command(label="Edit Transaction", command=lambda: self.show_edit_transaction_dialog(row_id))
-        menu.add_command(label="Delete Transaction", command=lambda: self.delete_transaction(row_id))
+        menu.add_command(label="Edit Transaction", command=lambda: self.show_edit_transaction_dialog(transaction_id))
+        menu.add_command(label="Delete Transaction", command=lambda: self.delete_transaction(transaction_id))
         menu.post(event.x_root, event.y_root)
         
-    def show_edit_transaction_dialog(self, row_id):
+    def show_edit_transaction_dialog(self, transaction_id):
         """Show dialog to edit a transaction."""
         try:
-            # Get the transaction ID from the row tags
-            tags = self.transaction_tree.item(row_id, "tags")
-            if not tags:
+            # Get transaction details as shown in the list
+            transaction_values = self.transaction_tree.get_values(transaction_id)
+            if not transaction_values:
                 messagebox.showerror("Error", "Could not identify transaction to edit.")
                 return
             
-            transaction_id = tags[0]
-            
-            # Get transaction details
-            transaction_values = self.transaction_tree.item(row_id, "values")
-            
             dialog = ctk.CTkToplevel(self)
             dialog.title("Edit Transaction")
             dialog.geometry("500x350")  # Make it tall enough for the confirmation button
@@ -1537,17 +1600,13 @@ class AssetManagement(ctk.CTkFrame):
         except Exception as e:
             messagebox.showerror("Error", f"An error occurred while updating transaction: {str(e)}", parent=dialog)
         
-    def delete_transaction(self, row_id):
+    def delete_transaction(self, transaction_id):
         """Delete a transaction from the database."""
         try:
-            # Get the transaction ID from the row tags
-            tags = self.transaction_tree.item(row_id, "tags")
-            if not tags:
+            if self.transaction_tree.get_record(transaction_id) is None:
                 messagebox.showerror("Error", "Could not identify transaction to delete.")
                 return
-            
-            transaction_id = tags[0]
-            
+                
             # Get confirmation from the user
             result = messagebox.askyesno("Confirm Deletion", "Are you sure you want to delete this transaction? This cannot be undone.")
             
@@ -1569,8 +1628,8 @@ class AssetManagement(ctk.CTkFrame):
         
     def on_transaction_double_click(self, event):
         """Handle double-click on a transaction row."""
-        row_id = self.transaction_tree.identify_row(event.y)
-        if not row_id:
+        transaction_id = self.transaction_tree.identify_key(event.y)
+        if transaction_id is None:
             return
             
         # Get column
@@ -1579,15 +1638,15 @@ class AssetManagement(ctk.CTkFrame):
         
         # Check which column was clicked
         if col_idx == 7:  # Actions column (Delete)
-            self.delete_transaction(row_id)
+            self.delete_transaction(transaction_id)
         elif col_idx == 6:  # Notes column
-            self.show_edit_transaction_dialog(row_id)
+            self.show_edit_transaction_dialog(transaction_id)
         else:
             # For any other column, show edit dialog
-            self.show_edit_transaction_dialog(row_id)
+            self.show_edit_transaction_dialog(transaction_id)
             
     def import_csv(self):
-        """Import holdings from a CSV file."""
+        """Import holdings or an exchange export from a CSV file on a worker thread."""
         file_path = filedialog.askopenfilename(
             title="Import CSV File",
             filetypes=[("CSV Files", "*.csv"), ("All Files", "*.*")]
@@ -1596,36 +1655,163 @@ class AssetManagement(ctk.CTkFrame):
         if not file_path:
             return
             
-        results = parse_csv_data(file_path, self.user['id'], self.db)
+        self.import_button.configure(state="disabled", text="Importing...")
+        state = {"importer": None, "progress": None, "results": None}
+        
+        def on_progress(rows_done, bytes_read, total_bytes):
+            state["progress"] = (rows_done, bytes_read, total_bytes)
+            
+        def worker():
+            # Always post results, so the button is restored whatever happens
+            try:
+                state["importer"] = create_importer(self.db, file_path)
+                state["results"] = state["importer"].run(file_path, self.user['id'], progress=on_progress)
+            except Exception as e:
+                state["results"] = {"imported": 0, "success": [], "errors": [f"Error importing CSV: {str(e)}"]}
+                
+        def check_finished():
+            if not self.winfo_exists():
+                if state["importer"]:
+                    state["importer"].stop()
+                return
+            if state["results"] is not None:
+                self.on_import_complete(state["results"])
+                return
+                
+            if state["progress"]:
+                _, bytes_read, total_bytes = state["progress"]
+                percent = bytes_read / total_bytes * 100 if total_bytes else 100
+                self.import_button.configure(text=f"Importing {percent:.0f}%")
+            self.after(100, check_finished)
+            
+        threading.Thread(target=worker, daemon=True).start()
+        self.after(100, check_finished)
+        
+    def on_import_complete(self, results):
+        """Show the outcome of a CSV import and reload the holdings."""
+        self.import_button.configure(state="normal", text="Import CSV")
         
         # Show results
-        success_count = len(results["success"])
+        success_count = results["imported"]
         error_count = len(results["errors"])
         
         if success_count > 0:
             success_msg = "\n".join(results["success"][:5])
-            if len(results["success"]) > 5:
-                success_msg += f"\n...and {len(results["success"]) - 5} more"
+            if success_count > 5:
+                success_msg += f"\n...and {success_count - 5} more"
                 
-            messagebox.showinfo("Import Successful", f"Successfully imported {success_count} assets:\n\n{success_msg}")
+            if "format" in results:
+                # Exchange exports record transactions and skip rows already imported
+                messagebox.showinfo(
+                    "Import Successful",
+                    f"Imported {success_count} transactions ({results['duplicates']} already imported):\n\n{success_msg}"
+                )
+            else:
+                messagebox.showinfo("Import Successful", f"Successfully imported {success_count} assets:\n\n{success_msg}")
             
-            # Refresh data
+            # Refresh data; an import touches many holdings, so reload them all
+            self.portfolio.invalidate(self.user['id'])
             self.load_assets_data()
             if self.refresh_callback:
                 self.refresh_callback()
-        
+        elif results.get("duplicates"):
+            messagebox.showinfo("Import", f"All {results['duplicates']} transactions were already imported.")
+            
         if error_count > 0:
             error_msg = "\n".join(results["errors"][:5])
-            if len(results["errors"]) > 5:
-                error_msg += f"\n...and {len(results["errors"]) - 5} more"
+            if error_count > 5:
+                error_msg += f"\n...and {error_count - 5} more"
                 
             messagebox.showerror("Import Errors", f"Encountered {error_count} errors:\n\n{error_msg}")
             
+    def show_export_dialog(self):
+        """Show dialog to export holdings, transactions and price history."""
+        dialog = ctk.CTkToplevel(self)
+        dialog.title("Export Data")
+        dialog.geometry("420x220")
+        dialog.transient(self)
+        dialog.resizable(False, False)
+        
+        # Configure dialog layout
+        dialog.grid_columnconfigure(0, weight=1)
+        
+        # Dialog title
+        title_label = ctk.CTkLabel(
+            dialog,
+            text="Export Holdings, Transactions and Prices",
+            font=ctk.CTkFont(size=16, weight="bold")
+        )
+        title_label.grid(row=0, column=0, padx=20, pady=(20, 10), sticky="ew")
+        
+        # Format selection; Parquet needs the optional pyarrow package
+        formats = {"CSV": "csv", "JSON Lines": "jsonl"}
+        if parquet_available():
+            formats["Parquet"] = "parquet"
+        format_var = ctk.StringVar(value="CSV")
+        format_selector = ctk.CTkSegmentedButton(dialog, values=list(formats), variable=format_var)
+        format_selector.grid(row=1, column=0, padx=20, pady=10, sticky="ew")
+        
+        def on_export():
+            directory = filedialog.askdirectory(title="Export To Folder", parent=dialog)
+            if directory:
+                dialog.destroy()
+                self.export_data(directory, formats[format_var.get()])
+                
+        export_button = ctk.CTkButton(dialog, text="Choose Folder and Export", command=on_export)
+        export_button.grid(row=2, column=0, padx=20, pady=(10, 20), sticky="ew")
+        
+    def export_data(self, directory, export_format):
+        """Export the user's data into a directory on a worker thread."""
+        self.export_button.configure(state="disabled", text="Exporting...")
+        exporter = DataExporter(self.db)
+        state = {"progress": None, "result": None}
+        
+        def on_progress(table, rows_written):
+            state["progress"] = (table, rows_written)
+            
+        def worker():
+            # Always post a result, so the button is restored whatever happens
+            try:
+                state["result"] = exporter.run(self.user['id'], directory, export_format, progress=on_progress)
+            except Exception as e:
+                state["result"] = ({}, f"Error exporting data: {str(e)}")
+            
+        def check_finished():
+            if not self.winfo_exists():
+                exporter.stop()
+                return
+            if state["result"] is not None:
+                self.on_export_complete(*state["result"])
+                return
+                
+            if state["progress"]:
+                table, rows_written = state["progress"]
+                self.export_button.configure(text=f"{table.capitalize()} {rows_written:,}")
+            self.after(100, check_finished)
+            
+        threading.Thread(target=worker, daemon=True).start()
+        self.after(100, check_finished)
+        
+    def on_export_complete(self, files, error):
+        """Report the files written by an export."""
+        self.export_button.configure(state="normal", text="Export")
+        
+        summary = "\n".join(f"{table}: {rows_written:,} rows -> {file_path}" for table, (file_path, rows_written) in files.items())
+        if error:
+            messagebox.showerror("Export Error", f"{error}\n\n{summary}".strip())
+        else:
+            messagebox.showinfo("Export Complete", summary)
+            
     def refresh_data(self):
         """Refresh price data from API."""
-        # Call the parent's refresh callback
+        # Call the parent's refresh callback; prices are fetched in the background
         if self.refresh_callback:
-            self.refresh_callback()
+            self.refresh_button.configure(state="disabled", text="Refreshing...")
+            self.refresh_callback(on_complete=self.on_refresh_complete)
+        else:
+            self.load_assets_data()
             
-        # Reload asset data
+    def on_refresh_complete(self, updated_count):
+        """Reload asset data once the background price refresh has finished."""
+        self.refresh_button.configure(state="normal", text="Refresh Prices")
         self.load_assets_data() 
\ No newline at end of file
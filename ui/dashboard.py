@@ -1,16 +1,14 @@
 import customtkinter as ctk
 from PIL import Image, ImageTk
 import os
-from datetime import datetime
-import matplotlib
-matplotlib.use("TkAgg")
-from matplotlib.figure import Figure
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+from datetime import datetime, timedelta, timezone
 
-from utils import format_currency, format_percentage, embed_chart, create_pie_chart
+from charts import ChartManager, pie_chart_data, draw_pie_chart, update_pie_chart
+from portfolio import PortfolioEngine
+from utils import format_currency, format_percentage
 
 class PortfolioDashboard(ctk.CTkFrame):
-    def __init__(self, master, user, db, api, refresh_callback):
+    def __init__(self, master, user, db, api, refresh_callback, portfolio=None, chart_renderer=None):
         """Initialize the dashboard."""
         super().__init__(master)
         self.master = master
@@ -18,6 +16,8 @@ class PortfolioDashboard(ctk.CTkFrame):
         self.db = db
         self.api = api
         self.refresh_callback = refresh_callback
+        self.portfolio = portfolio or PortfolioEngine(db)
+        self.charts = ChartManager(chart_renderer)
         self.current_prices = {}
         
         # Configure layout
@@ -219,51 +219,46 @@ class PortfolioDashboard(ctk.CTkFrame):
         self.chart_placeholder.pack(expand=True)
         
     def load_portfolio_data(self):
-        """Load portfolio data from database."""
-        # Get user holdings
-        holdings_data = self.db.get_user_holdings(self.user['id'])
-        holdings = [holding for holding in holdings_data]
+        """Load portfolio data from the shared portfolio valuation."""
+        snapshot = self.portfolio.get_snapshot(self.user['id'])
+        holdings = snapshot['holdings']
         
         if not holdings:
             return
             
-        # Get latest prices for all assets
         asset_ids = [holding['asset_id'] for holding in holdings]
-        self.current_prices = {}
-        
-        for asset_id in asset_ids:
-            price_data = self.db.get_latest_price(asset_id)
-            if price_data:
-                self.current_prices[asset_id] = price_data['price_usd']
-        
-        # Calculate total portfolio value
-        total_value = 0
-        cost_basis = 0
-        
-        for holding in holdings:
-            price = self.current_prices.get(holding['asset_id'], 0)
-            amount = holding['amount']
-            value = amount * price
-            purchase_value = amount * holding['purchase_price_per_unit']
-            
-            total_value += value
-            cost_basis += purchase_value
+        self.current_prices = snapshot['prices']
+        total_value = snapshot['total_value']
         
         # Update UI
         self.total_value_amount.configure(text=format_currency(total_value))
-        self.assets_count.configure(text=str(len(holdings)))
+        self.assets_count.configure(text=str(snapshot['asset_count']))
         
-        # Calculate profit/loss
-        profit_loss = total_value - cost_basis
-        profit_loss_pct = (profit_loss / cost_basis) * 100 if cost_basis > 0 else 0
+        # Profit/loss
+        profit_loss = snapshot['total_profit']
+        profit_loss_pct = snapshot['total_profit_pct']
         
         profit_text = f"{format_currency(profit_loss)} ({format_percentage(profit_loss_pct)})"
         profit_color = "#2ecc71" if profit_loss >= 0 else "#e74c3c"  # Green if positive, red if negative
         
         self.profit_amount.configure(text=profit_text, text_color=profit_color)
         
-        # For 24h change, we need historical data, but for now just show a placeholder
-        self.change_amount.configure(text="N/A")
+        # 24h change from each asset's last known price a day ago; assets
+        # without history that old count as unchanged
+        day_ago = (datetime.now(timezone.utc) - timedelta(days=1)).strftime("%Y-%m-%d %H:%M:%S")
+        prices_day_ago = self.db.get_prices_at(asset_ids, day_ago)
+        
+        if prices_day_ago:
+            value_day_ago = 0
+            for holding in holdings:
+                value_day_ago += holding['amount'] * prices_day_ago.get(holding['asset_id'], holding['price'])
+                
+            change = total_value - value_day_ago
+            change_pct = (change / value_day_ago) * 100 if value_day_ago > 0 else 0
+            change_color = "#2ecc71" if change >= 0 else "#e74c3c"
+            self.change_amount.configure(text=f"{format_currency(change)} ({format_percentage(change_pct)})", text_color=change_color)
+        else:
+            self.change_amount.configure(text="N/A")
         
         # Update last updated time
         now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
@@ -273,32 +268,31 @@ class PortfolioDashboard(ctk.CTkFrame):
         self.update_chart(holdings)
         
     def update_chart(self, holdings):
-        """Update portfolio distribution chart."""
-        # Clear chart content
-        for widget in self.chart_content.winfo_children():
-            widget.destroy()
-        
-        # Create pie chart
-        fig = create_pie_chart(holdings, self.current_prices)
-        
-        if fig:
-            chart_widget = embed_chart(fig, self.chart_content)
-            chart_widget.pack(fill="both", expand=True)
-        else:
-            # Show placeholder if no chart data
-            self.chart_placeholder = ctk.CTkLabel(
+        """Update portfolio distribution chart in place."""
+        if holdings:
+            self.chart_placeholder.pack_forget()
+            self.charts.show(
+                "distribution",
                 self.chart_content,
-                text="No assets found. Add assets to view portfolio distribution.",
-                font=ctk.CTkFont(size=14),
-                text_color="gray"
+                pie_chart_data(holdings, self.current_prices),
+                draw_pie_chart,
+                update_pie_chart
             )
+        else:
+            # Show placeholder if no chart data
+            self.charts.hide("distribution")
             self.chart_placeholder.pack(expand=True)
             
     def refresh_data(self):
         """Refresh price data from API."""
-        # Call the parent's refresh callback
+        # Call the parent's refresh callback; prices are fetched in the background
         if self.refresh_callback:
-            self.refresh_callback()
+            self.refresh_button.configure(state="disabled", text="Refreshing...")
+            self.refresh_callback(on_complete=self.on_refresh_complete)
+        else:
+            self.load_portfolio_data()
             
-        # Reload dashboard data
+    def on_refresh_complete(self, updated_count):
+        """Reload dashboard data once the background price refresh has finished."""
+        self.refresh_button.configure(state="normal", text="Refresh Prices")
         self.load_portfolio_data() 
\ No newline at end of file
@@ -35,7 +35,6 @@ class SettingsPage(ctk.CTkFrame):
             "appearance_mode": "dark",
             "color_theme": "blue",
             "currency": "USD",
-            "api_cooldown": 60,
             "notifications_enabled": True,
             "price_alert_threshold": 5.0
         }
@@ -59,12 +58,7 @@ class SettingsPage(ctk.CTkFrame):
             return
             
         # Update database
-        self.cursor = self.db.connection.cursor()
-        self.cursor.execute(
-            "UPDATE users SET settings = ? WHERE id = ?",
-            (json.dumps(self.settings), self.user['id'])
-        )
-        self.db.connection.commit()
+        self.db.update_user_settings(self.user['id'], self.settings)
         
         # Apply settings to app
         self.apply_settings()
@@ -79,10 +73,6 @@ class SettingsPage(ctk.CTkFrame):
         # Apply color theme
         ctk.set_default_color_theme(self.settings["color_theme"])
         
-        # Update API cooldown if app_instance has API
-        if hasattr(self.app_instance, 'api'):
-            self.app_instance.api.cooldown_period = self.settings["api_cooldown"]
-        
     def create_title(self):
         """Create title section."""
         self.title_frame = ctk.CTkFrame(self)
@@ -167,52 +157,9 @@ class SettingsPage(ctk.CTkFrame):
         )
         theme_dropdown.grid(row=1, column=0, padx=20, pady=(5, 10), sticky="w")
         
-        # API Settings
-        self.api_section = self.create_section("API Settings")
-        self.api_section.grid(row=1, column=0, padx=0, pady=(0, 20), sticky="ew")
-        
-        # API cooldown setting
-        cooldown_frame = ctk.CTkFrame(self.api_section)
-        cooldown_frame.pack(fill="x", expand=True, padx=10, pady=10)
-        
-        cooldown_label = ctk.CTkLabel(
-            cooldown_frame,
-            text="API Cooldown Period (seconds):",
-            font=ctk.CTkFont(size=14)
-        )
-        cooldown_label.grid(row=0, column=0, padx=(20, 10), pady=(10, 0), sticky="w")
-        
-        self.cooldown_var = ctk.IntVar(value=self.settings["api_cooldown"])
-        
-        cooldown_slider = ctk.CTkSlider(
-            cooldown_frame,
-            from_=30,
-            to=300,
-            number_of_steps=27,  # (300-30)/10 = 27 steps of 10 seconds
-            variable=self.cooldown_var,
-            command=self.on_cooldown_change
-        )
-        cooldown_slider.grid(row=1, column=0, padx=20, pady=(5, 0), sticky="ew")
-        
-        self.cooldown_value_label = ctk.CTkLabel(
-            cooldown_frame,
-            text=f"{self.settings['api_cooldown']} seconds",
-            font=ctk.CTkFont(size=12)
-        )
-        self.cooldown_value_label.grid(row=2, column=0, padx=20, pady=(5, 10), sticky="w")
-        
-        cooldown_info = ctk.CTkLabel(
-            cooldown_frame,
-            text="Note: CoinGecko API has rate limits. Setting this too low may result in API errors.",
-            font=ctk.CTkFont(size=12),
-            text_color="gray",
-            wraplength=500
-        )
-        cooldown_info.grid(row=3, column=0, padx=20, pady=(0, 10), sticky="w")
-        
         # Display Settings
         self.display_section = self.create_section("Display Settings")
-        self.display_section.grid(row=2, column=0, padx=0, pady=(0, 20), sticky="ew")
+        self.display_section.grid(row=1, column=0, padx=0, pady=(0, 20), sticky="ew")
         
         # Currency setting
         currency_frame = ctk.CTkFrame(self.display_section)
@@ -248,7 +195,7 @@ class SettingsPage(ctk.CTkFrame):
         
         # Notification Settings
         self.notification_section = self.create_section("Notification Settings")
-        self.notification_section.grid(row=3, column=0, padx=0, pady=(0, 20), sticky="ew")
+        self.notification_section.grid(row=2, column=0, padx=0, pady=(0, 20), sticky="ew")
         
         # Enable notifications
         notifications_frame = ctk.CTkFrame(self.notification_section)
@@ -307,7 +254,7 @@ class SettingsPage(ctk.CTkFrame):
         
         # Account Settings
         self.account_section = self.create_section("Account Settings")
-        self.account_section.grid(row=4, column=0, padx=0, pady=(0, 20), sticky="ew")
+        self.account_section.grid(row=3, column=0, padx=0, pady=(0, 20), sticky="ew")
         
         # Account info
         account_frame = ctk.CTkFrame(self.account_section)
@@ -365,7 +312,7 @@ class SettingsPage(ctk.CTkFrame):
         
         # About section
         self.about_section = self.create_section("About CryptoJandie")
-        self.about_section.grid(row=5, column=0, padx=0, pady=(0, 20), sticky="ew")
+        self.about_section.grid(row=4, column=0, padx=0, pady=(0, 20), sticky="ew")
         
         # About info
         about_frame = ctk.CTkFrame(self.about_section)
@@ -424,14 +371,6 @@ class SettingsPage(ctk.CTkFrame):
         # Note: Theme change requires app restart to fully apply
         messagebox.showinfo("Theme Changed", "Theme changes will fully apply after restarting the application.")
         
-    def on_cooldown_change(self, value):
-        """Handle API cooldown change."""
-        # Round to nearest 10
-        cooldown = round(value / 10) * 10
-        self.settings["api_cooldown"] = int(cooldown)
-        self.cooldown_var.set(cooldown)
-        self.cooldown_value_label.configure(text=f"{cooldown} seconds")
-        
     def on_currency_change(self, value):
         """Handle currency change."""
         self.settings["currency"] = value
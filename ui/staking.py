@@ -1,18 +1,19 @@
 import customtkinter as ctk
 from PIL import Image, ImageTk
 import os
+from bisect import bisect_right
 from datetime import datetime, timedelta
 import tkinter as tk
-import matplotlib
-matplotlib.use("TkAgg")
-from matplotlib.figure import Figure
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
-import matplotlib.pyplot as plt
 
-from utils import format_currency, format_percentage, embed_chart
+from charts import ChartManager
+from database import choose_candle_interval
+from utils import format_currency, format_percentage
+
+# Matplotlib style of the staking charts, applied only while they are drawn
+STAKING_CHART_STYLE = 'dark_background'
 
 class StakingDashboard(ctk.CTkFrame):
-    def __init__(self, master, user, db, api):
+    def __init__(self, master, user, db, api, chart_renderer=None):
         """Initialize the staking dashboard screen."""
         super().__init__(master)
         self.master = master
@@ -20,6 +21,7 @@ class StakingDashboard(ctk.CTkFrame):
         self.db = db
         self.api = api
         self.current_prices = {}
+        self.charts = ChartManager(chart_renderer)
         
         # Configure layout
         self.grid_rowconfigure(0, weight=0)  # Title
@@ -116,6 +118,30 @@ class StakingDashboard(ctk.CTkFrame):
         self.staking_forecast_frame = ctk.CTkFrame(self.staking_charts_frame, height=300)
         self.staking_forecast_frame.grid(row=0, column=1, padx=(10, 0), pady=10, sticky="nsew")
         
+        # Chart titles and no-data messages, packed as the data requires
+        self.history_title = ctk.CTkLabel(
+            self.staking_history_frame,
+            text="Staking Rewards History",
+            font=ctk.CTkFont(size=14, weight="bold")
+        )
+        self.forecast_title = ctk.CTkLabel(
+            self.staking_forecast_frame,
+            text="Staking Income Forecast (12 Months)",
+            font=ctk.CTkFont(size=14, weight="bold")
+        )
+        self.no_history_label = ctk.CTkLabel(
+            self.staking_history_frame,
+            text="No staking data available.\nAdd staking income transactions to see analysis.",
+            font=ctk.CTkFont(size=14),
+            text_color="gray"
+        )
+        self.no_forecast_label = ctk.CTkLabel(
+            self.staking_forecast_frame,
+            text="No staking forecast available.\nAdd staking income to generate forecasts.",
+            font=ctk.CTkFont(size=14),
+            text_color="gray"
+        )
+        
         # Staking Details Section
         self.details_label = ctk.CTkLabel(
             self.content_frame,
@@ -232,18 +258,11 @@ class StakingDashboard(ctk.CTkFrame):
         
     def load_data(self):
         """Load and analyze staking data."""
-        # Get all assets to check current prices
-        self.cursor = self.db.connection.cursor()
-        self.cursor.execute("SELECT id FROM assets")
-        assets = self.cursor.fetchall()
-        
-        # Get latest prices using the proper method
+        # Get latest prices for all assets in a single query
         self.current_prices = {}
-        for asset in assets:
-            asset_id = asset['id']
-            price_data = self.db.get_latest_price(asset_id)
-            if price_data:
-                self.current_prices[asset_id] = price_data['price_usd']
+        latest_prices = self.db.get_latest_prices()
+        for asset_id, price_data in latest_prices.items():
+            self.current_prices[asset_id] = price_data['price_usd']
         
         self.load_staking_data()
         
@@ -253,16 +272,7 @@ class StakingDashboard(ctk.CTkFrame):
             return
             
         # Get all staking transactions for this user
-        self.cursor = self.db.connection.cursor()
-        self.cursor.execute("""
-            SELECT t.*, a.symbol, a.name 
-            FROM transactions t
-            JOIN assets a ON t.asset_id = a.id
-            WHERE t.user_id = ? AND t.transaction_type = 'STAKING'
-            ORDER BY t.timestamp
-        """, (self.user['id'],))
-        
-        staking_transactions = [dict(row) for row in self.cursor.fetchall()]
+        staking_transactions = self.db.get_user_staking_transactions(self.user['id'])
         
         if not staking_transactions:
             self.show_no_staking_data_message()
@@ -274,13 +284,10 @@ class StakingDashboard(ctk.CTkFrame):
         staking_by_month = {}
         
         # Get user holdings to calculate APY
-        self.cursor.execute("""
-            SELECT h.*, a.symbol, a.name 
-            FROM holdings h
-            JOIN assets a ON h.asset_id = a.id
-            WHERE h.user_id = ?
-        """, (self.user['id'],))
-        holdings = [dict(row) for row in self.cursor.fetchall()]
+        holdings = self.db.get_user_holdings(self.user['id'])
+        
+        # Closes of the candles covering the staking period, to value each reward when received
+        received_closes = self.get_received_closes(staking_transactions)
         
         for tx in staking_transactions:
             asset_id = tx['asset_id']
@@ -294,6 +301,10 @@ class StakingDashboard(ctk.CTkFrame):
             current_value = amount * current_price
             total_staking_income += current_value
             
+            # Value of this staking reward when it was received
+            received_price = self.get_close_at(received_closes.get(asset_id), tx['timestamp'])
+            received_value = amount * (received_price if received_price is not None else current_price)
+            
             # Aggregate by asset
             if asset_id not in staking_by_asset:
                 staking_by_asset[asset_id] = {
@@ -318,10 +329,12 @@ class StakingDashboard(ctk.CTkFrame):
             if month_key not in staking_by_month:
                 staking_by_month[month_key] = {
                     'total_value': 0,
+                    'received_value': 0,
                     'by_asset': {}
                 }
             
             staking_by_month[month_key]['total_value'] += current_value
+            staking_by_month[month_key]['received_value'] += received_value
             
             if asset_id not in staking_by_month[month_key]['by_asset']:
                 staking_by_month[month_key]['by_asset'][asset_id] = {
@@ -497,28 +510,9 @@ class StakingDashboard(ctk.CTkFrame):
         self.monthly_average_value.configure(text="$0.00")
         self.estimated_annual_yield_value.configure(text="0.00%")
         
-        # Clear staking charts
-        for widget in self.staking_history_frame.winfo_children():
-            widget.destroy()
-        for widget in self.staking_forecast_frame.winfo_children():
-            widget.destroy()
-            
-        # Add messages to chart frames
-        no_data_label1 = ctk.CTkLabel(
-            self.staking_history_frame,
-            text="No staking data available.\nAdd staking income transactions to see analysis.",
-            font=ctk.CTkFont(size=14),
-            text_color="gray"
-        )
-        no_data_label1.pack(expand=True)
-        
-        no_data_label2 = ctk.CTkLabel(
-            self.staking_forecast_frame,
-            text="No staking forecast available.\nAdd staking income to generate forecasts.",
-            font=ctk.CTkFont(size=14),
-            text_color="gray"
-        )
-        no_data_label2.pack(expand=True)
+        # Hide staking charts and show messages in their place
+        self.staking_data = None
+        self.update_staking_charts()
         
         # Clear staking table
         for item in self.staking_tree.get_children():
@@ -545,63 +539,97 @@ class StakingDashboard(ctk.CTkFrame):
         self.estimated_annual_yield_value.configure(text=format_percentage(avg_apy))
         
     def update_staking_charts(self):
-        """Update staking charts with current data."""
-        # Clear existing charts
-        for widget in self.staking_history_frame.winfo_children():
-            widget.destroy()
-        for widget in self.staking_forecast_frame.winfo_children():
-            widget.destroy()
-            
-        if not hasattr(self, 'staking_data') or not self.staking_data:
-            return
-            
-        # Create historical staking chart
-        staking_history_fig = self.create_staking_history_chart(width=400, height=300)
-        if staking_history_fig:
-            staking_history = embed_chart(staking_history_fig, self.staking_history_frame)
-            staking_history.pack(fill="both", expand=True)
+        """Update staking charts with current data, rendering them off the Tk thread."""
+        charts = (
+            ("history", self.staking_history_data(), self.draw_staking_history_chart,
+             self.history_title, self.no_history_label),
+            ("forecast", self.staking_forecast_data(), self.draw_staking_forecast_chart,
+             self.forecast_title, self.no_forecast_label),
+        )
+        for name, chart_data, draw, title, no_data_label in charts:
+            if chart_data:
+                no_data_label.pack_forget()
+                self.charts.show(
+                    name,
+                    title.master,
+                    chart_data,
+                    draw,
+                    width=400,
+                    height=300,
+                    style=STAKING_CHART_STYLE
+                )
+                title.pack(side="top", pady=(10, 0))
+            else:
+                self.charts.hide(name)
+                title.pack_forget()
+                no_data_label.pack(expand=True)
             
-            history_title = ctk.CTkLabel(
-                self.staking_history_frame,
-                text="Staking Rewards History",
-                font=ctk.CTkFont(size=14, weight="bold")
-            )
-            history_title.pack(side="top", pady=(10, 0))
-            
-        # Create staking forecast chart
-        staking_forecast_fig = self.create_staking_forecast_chart(width=400, height=300)
-        if staking_forecast_fig:
-            staking_forecast = embed_chart(staking_forecast_fig, self.staking_forecast_frame)
-            staking_forecast.pack(fill="both", expand=True)
-            
-            forecast_title = ctk.CTkLabel(
-                self.staking_forecast_frame,
-                text="Staking Income Forecast (12 Months)",
-                font=ctk.CTkFont(size=14, weight="bold")
-            )
-            forecast_title.pack(side="top", pady=(10, 0))
+    def get_received_closes(self, staking_transactions):
+        """Get candle closes per asset over the period of the given transactions.
+        
+        Returns:
+            A dict of asset_id -> (bucket starts, closes) lists sorted by time.
+        """
+        timestamps = [tx['timestamp'] for tx in staking_transactions]
+        start = datetime.fromisoformat(min(timestamps))
+        end = datetime.fromisoformat(max(timestamps))
+        
+        # Long periods are read as daily candles, short ones at a finer interval
+        interval = choose_candle_interval(start, end)
+        asset_ids = list({tx['asset_id'] for tx in staking_transactions})
+        candles = self.db.get_candles(asset_ids, interval, min(timestamps), max(timestamps))
+        
+        received_closes = {}
+        for asset_id, series in candles.items():
+            if series:
+                received_closes[asset_id] = (
+                    [candle['bucket_start'] for candle in series],
+                    [candle['close'] for candle in series]
+                )
+        return received_closes
+        
+    def get_close_at(self, closes, timestamp):
+        """Get the close of the candle containing timestamp, or None if there is none."""
+        if not closes:
+            return None
             
-    def create_staking_history_chart(self, width=800, height=500):
-        """Create a time series chart for staking rewards history."""
+        bucket_starts, values = closes
+        position = bisect_right(bucket_starts, timestamp) - 1
+        if position < 0:
+            return None
+        return values[position]
+        
+    def staking_history_data(self):
+        """Get the staking history chart's data.
+        
+        Returns:
+            A (month_labels, values, received_values) tuple, or None if there
+            is no staking data.
+        """
         if not hasattr(self, 'staking_data') or not self.staking_data:
             return None
             
         # Prepare data
         months = sorted(self.staking_data['by_month'].keys())
         values = [self.staking_data['by_month'][month]['total_value'] for month in months]
+        received_values = [self.staking_data['by_month'][month].get('received_value', 0) for month in months]
         
         # Add current month if not in data
         current_month = datetime.now().strftime("%Y-%m")
         if current_month not in months:
             months.append(current_month)
             values.append(0)
+            received_values.append(0)
             
         # Format month labels
         month_labels = [datetime.strptime(m, "%Y-%m").strftime("%b %Y") for m in months]
+        return month_labels, values, received_values
+        
+    def draw_staking_history_chart(self, fig, chart_data):
+        """Draw the staking history chart into an empty figure; safe off the Tk thread."""
+        from matplotlib.ticker import FuncFormatter
         
-        # Create figure with a better style
-        plt.style.use('dark_background')
-        fig = Figure(figsize=(width/100, height/100), dpi=100)
+        month_labels, values, received_values = chart_data
         ax = fig.add_subplot(111)
         
         # Create gradient-filled line chart
@@ -615,6 +643,11 @@ class StakingDashboard(ctk.CTkFrame):
         # Fill area under the curve with gradient
         ax.fill_between(x, y, color='#3498db', alpha=0.3)
         
+        # Value of the rewards at the price on the day they were received
+        ax.plot(month_labels, received_values, marker='o', linestyle='--', color='#f39c12', linewidth=2, markersize=4, label='Value when received')
+        line.set_label('Current value')
+        ax.legend(loc='upper left', fontsize=9)
+        
         # Add value labels with better formatting
         for i, v in enumerate(values):
             if v > 0:  # Only show labels for non-zero values
@@ -642,7 +675,7 @@ class StakingDashboard(ctk.CTkFrame):
         ax.grid(True, linestyle='--', alpha=0.3, color='gray')
         
         # Format y-axis as currency
-        ax.yaxis.set_major_formatter(matplotlib.ticker.FuncFormatter(lambda x, _: format_currency(x)))
+        ax.yaxis.set_major_formatter(FuncFormatter(lambda x, _: format_currency(x)))
         
         # Set background color
         ax.set_facecolor('#1e272e')
@@ -651,12 +684,13 @@ class StakingDashboard(ctk.CTkFrame):
         # Add a horizontal line at zero
         ax.axhline(y=0, color='gray', linestyle='-', alpha=0.3)
         
-        fig.tight_layout()
-        
-        return fig
+    def staking_forecast_data(self):
+        """Get the staking forecast chart's data.
         
-    def create_staking_forecast_chart(self, width=800, height=500):
-        """Create a forecast chart for future staking rewards."""
+        Returns:
+            A (months, forecast_values, cumulative_values) tuple, or None if
+            there is no staking income to forecast from.
+        """
         if not hasattr(self, 'staking_data') or not self.staking_data:
             return None
             
@@ -685,10 +719,15 @@ class StakingDashboard(ctk.CTkFrame):
             
             cumulative_total += forecast_value
             cumulative_values.append(cumulative_total)
+            
+        return months, forecast_values, cumulative_values
         
-        # Create figure with a better style
-        plt.style.use('dark_background')
-        fig = Figure(figsize=(width/100, height/100), dpi=100)
+    def draw_staking_forecast_chart(self, fig, chart_data):
+        """Draw the staking forecast chart into an empty figure; safe off the Tk thread."""
+        from matplotlib.colors import to_rgb
+        from matplotlib.ticker import FuncFormatter
+        
+        months, forecast_values, cumulative_values = chart_data
         ax = fig.add_subplot(111)
         
         # Create custom colormap for gradient bars
@@ -696,7 +735,7 @@ class StakingDashboard(ctk.CTkFrame):
         for i in range(len(months)):
             # Create a gradient effect from lighter to darker green
             alpha = 0.5 + (i / len(months)) * 0.5
-            color_gradient.append((*matplotlib.colors.to_rgb('#2ecc71'), alpha))
+            color_gradient.append((*to_rgb('#2ecc71'), alpha))
         
         # Create bar chart for monthly forecast with gradient colors
         bars = ax.bar(months, forecast_values, color=color_gradient, label='Monthly Income')
@@ -782,8 +821,8 @@ class StakingDashboard(ctk.CTkFrame):
         ax2.tick_params(axis='y', colors='#e74c3c', labelsize=10)
         
         # Format y-axis as currency
-        ax.yaxis.set_major_formatter(matplotlib.ticker.FuncFormatter(lambda x, _: format_currency(x)))
-        ax2.yaxis.set_major_formatter(matplotlib.ticker.FuncFormatter(lambda x, _: format_currency(x)))
+        ax.yaxis.set_major_formatter(FuncFormatter(lambda x, _: format_currency(x)))
+        ax2.yaxis.set_major_formatter(FuncFormatter(lambda x, _: format_currency(x)))
         
         # Add gridlines with better styling
         ax.grid(True, linestyle='--', alpha=0.3, color='gray')
@@ -807,10 +846,6 @@ class StakingDashboard(ctk.CTkFrame):
         legend.get_texts()[0].set_color('#2ecc71')
         legend.get_texts()[1].set_color('#e74c3c')
         
-        fig.tight_layout()
-        
-        return fig
-        
     def update_staking_table(self):
         """Update staking details table with current data."""
         # Clear existing data
@@ -893,13 +928,7 @@ class StakingDashboard(ctk.CTkFrame):
         stakable_assets = ["ETH", "SOL", "ADA", "DOT", "ATOM", "NEAR", "OSMO", "TRX", "MATIC", "AVAX", "BNB"]
         
         # Get all user holdings to check for potential staking opportunities
-        self.cursor.execute("""
-            SELECT h.*, a.symbol, a.name 
-            FROM holdings h
-            JOIN assets a ON h.asset_id = a.id
-            WHERE h.user_id = ?
-        """, (self.user['id'],))
-        holdings = [dict(row) for row in self.cursor.fetchall()]
+        holdings = self.db.get_user_holdings(self.user['id'])
         
         # Find stakable assets that user holds but hasn't staked
         holdings_symbols = [h["symbol"] for h in holdings]
@@ -0,0 +1,248 @@
+from tkinter import ttk
+
+# Row colors shared by every list; rows are tagged with one of these instead
+# of getting a tag of their own, so the tag table does not grow with the data
+ROW_TAGS = {
+    "profit": {"background": "#2b2b2b", "foreground": "#2ecc71"},
+    "loss": {"background": "#2b2b2b", "foreground": "#e74c3c"},
+    "neutral": {"background": "#2b2b2b", "foreground": "white"},
+}
+
+def profit_tag(profit_loss):
+    """Get the row tag for a profit or loss amount."""
+    if profit_loss > 0:
+        return "profit"
+    elif profit_loss < 0:
+        return "loss"
+    return "neutral"
+
+class VirtualTreeview(ttk.Treeview):
+    def __init__(self, master, format_row, row_key, tags=ROW_TAGS, scroll_units=3, load_more=None, **options):
+        """Initialize a Treeview that only creates items for the rows in view.
+        
+        The rows are kept as a list of records; only the ones in view are
+        formatted and shown, in a fixed pool of items that is rebound as the
+        list scrolls. Setting new records rewrites just the items whose
+        text or tag changed, so reloads and scrolling cost the same for any
+        number of rows.
+        
+        Args:
+            master: Parent widget.
+            format_row: Callable record -> (values, tag) giving a row's
+                column values and one of the tags.
+            row_key: Callable record -> key identifying a record across
+                reloads, such as its database id.
+            tags: Dict of tag name -> tag_configure options.
+            scroll_units: Rows scrolled per mouse wheel step.
+            load_more: Optional callable called when the view gets within
+                a page of the last record, to add more with
+                append_records().
+            **options: ttk.Treeview options; yscrollcommand is driven by
+                the virtual scroll position.
+        """
+        self.y_scroll_set = options.pop("yscrollcommand", None)
+        super().__init__(master, yscrollcommand=self.on_native_scroll, **options)
+        self.format_row = format_row
+        self.row_key = row_key
+        self.scroll_units = scroll_units
+        self.load_more = load_more
+        self.load_more_pending = False
+        self.records = []
+        self.key_index = None  # key -> position in records, built on first lookup
+        self.offset = 0  # Position of the first row in view
+        self.visible_rows = int(self.cget("height"))
+        self.shown = []  # (key, values, tag) of each pooled item, by item position
+        self.selected_key = None
+        
+        for tag, tag_options in tags.items():
+            self.tag_configure(tag, **tag_options)
+            
+        self.bind("<Configure>", self.on_configure, add="+")
+        self.bind("<<TreeviewSelect>>", self.on_select, add="+")
+        self.bind("<MouseWheel>", self.on_mouse_wheel)
+        self.bind("<Button-4>", lambda event: self.scroll_rows(-self.scroll_units))
+        self.bind("<Button-5>", lambda event: self.scroll_rows(self.scroll_units))
+        self.bind("<Up>", lambda event: self.move_selection(-1))
+        self.bind("<Down>", lambda event: self.move_selection(1))
+        self.bind("<Prior>", lambda event: self.move_selection(-self.visible_rows))
+        self.bind("<Next>", lambda event: self.move_selection(self.visible_rows))
+        
+    def set_records(self, records):
+        """Replace the rows with a new list of records, keeping the scroll position.
+        
+        The list is used as given; only append_records() may change it
+        afterwards.
+        """
+        self.records = records
+        self.key_index = None
+        self.scroll_to(self.offset)
+        
+    def append_records(self, records):
+        """Add records at the end of the rows, such as the next page of a list."""
+        if self.key_index is not None:
+            for position, record in enumerate(records, start=len(self.records)):
+                self.key_index[self.row_key(record)] = position
+        self.records.extend(records)
+        self.refresh()
+        
+    def position_of(self, key):
+        """Get the position of the record with the given key, or None if there is none."""
+        if self.key_index is None:
+            self.key_index = {self.row_key(record): position for position, record in enumerate(self.records)}
+        return self.key_index.get(key)
+        
+    def get_record(self, key):
+        """Get the record with the given key, or None if there is none."""
+        position = self.position_of(key)
+        return self.records[position] if position is not None else None
+        
+    def get_values(self, key):
+        """Get the column values shown for the record with the given key, or None."""
+        record = self.get_record(key)
+        return self.format_row(record)[0] if record is not None else None
+        
+    def identify_key(self, y):
+        """Get the key of the row at a y position, or None if there is no row there."""
+        item = self.identify_row(y)
+        if not item:
+            return None
+        return self.shown[int(item)][0]
+        
+    def select_key(self, key):
+        """Select the row with the given key, scrolling it into view."""
+        self.selected_key = key
+        self.see_key(key)
+        
+    def see_key(self, key):
+        """Scroll the row with the given key into view."""
+        position = self.position_of(key)
+        if position is None:
+            return
+        if position < self.offset:
+            self.scroll_to(position)
+        elif position >= self.offset + self.visible_rows:
+            self.scroll_to(position - self.visible_rows + 1)
+        else:
+            self.refresh()
+            
+    def scroll_to(self, offset):
+        """Show rows starting at offset, clamped to the list."""
+        self.offset = max(0, min(offset, len(self.records) - self.visible_rows))
+        self.refresh()
+        
+    def scroll_rows(self, count):
+        """Scroll by count rows; returns "break" to stop the Treeview's own scrolling."""
+        self.scroll_to(self.offset + count)
+        return "break"
+        
+    def refresh(self):
+        """Bind the pooled items to the rows in view, rewriting only changed items."""
+        count = max(0, min(self.visible_rows, len(self.records) - self.offset))
+        
+        # Grow or shrink the pool to the number of rows in view
+        while len(self.shown) > count:
+            self.delete(str(len(self.shown) - 1))
+            self.shown.pop()
+        while len(self.shown) < count:
+            self.insert("", "end", iid=str(len(self.shown)))
+            self.shown.append(None)
+            
+        selected_item = None
+        for position in range(count):
+            record = self.records[self.offset + position]
+            key = self.row_key(record)
+            values, tag = self.format_row(record)
+            row = (key, tuple(values), tag)
+            if row != self.shown[position]:
+                self.item(str(position), values=row[1], tags=(tag,))
+                self.shown[position] = row
+            if key == self.selected_key:
+                selected_item = str(position)
+                
+        # Selection follows the record, not the pooled item showing it
+        if selected_item is not None:
+            if self.selection() != (selected_item,):
+                self.selection_set(selected_item)
+        elif self.selection():
+            self.selection_set(())
+            
+        if self.y_scroll_set:
+            total = len(self.records)
+            if total:
+                self.y_scroll_set(self.offset / total, (self.offset + count) / total)
+            else:
+                self.y_scroll_set(0, 1)
+                
+        # Ask for more rows before the view reaches the end; once per idle
+        # loop, so a load that adds rows is not re-entered from this refresh
+        near_end = self.offset + 2 * self.visible_rows >= len(self.records)
+        if self.load_more and near_end and not self.load_more_pending:
+            self.load_more_pending = True
+            self.after_idle(self.on_load_more)
+            
+    def on_load_more(self):
+        """Call load_more for a view that reached the end of the rows."""
+        self.load_more_pending = False
+        self.load_more()
+                
+    def yview(self, *args):
+        """Get or change the virtual scroll position, as a scrollbar command."""
+        total = len(self.records)
+        if not args:
+            if not total:
+                return (0.0, 1.0)
+            return (self.offset / total, min(self.offset + self.visible_rows, total) / total)
+            
+        if args[0] == "moveto":
+            self.yview_moveto(args[1])
+        elif args[0] == "scroll":
+            self.yview_scroll(args[1], args[2])
+            
+    def yview_moveto(self, fraction):
+        """Scroll so the row at fraction of the list is at the top."""
+        self.scroll_to(round(float(fraction) * len(self.records)))
+        
+    def yview_scroll(self, number, what):
+        """Scroll by number rows ("units") or pages of rows in view."""
+        number = int(number)
+        if what.startswith("page"):
+            number *= max(1, self.visible_rows - 1)
+        self.scroll_rows(number)
+        
+    def on_native_scroll(self, first, last):
+        """Keep the Treeview's own view at the top; scrolling moves the rows instead."""
+        if float(first) > 0:
+            self.tk.call(self._w, "yview", "moveto", 0)
+            
+    def on_mouse_wheel(self, event):
+        """Scroll by whole steps of the mouse wheel."""
+        return self.scroll_rows(-self.scroll_units if event.delta > 0 else self.scroll_units)
+        
+    def on_configure(self, event):
+        """Resize the item pool to the rows that fit the new height."""
+        bbox = self.bbox("0") if self.shown else None
+        if bbox:
+            top, row_height = bbox[1], bbox[3]
+        else:
+            row_height = int(ttk.Style(self).lookup(self.cget("style") or "Treeview", "rowheight") or 20)
+            top = row_height  # Heading row
+        visible_rows = max(1, (event.height - top) // row_height)
+        if visible_rows != self.visible_rows:
+            self.visible_rows = visible_rows
+            self.scroll_to(self.offset)
+            
+    def on_select(self, event):
+        """Remember the key of a row selected by the user."""
+        selection = self.selection()
+        if selection:
+            self.selected_key = self.shown[int(selection[0])][0]
+            
+    def move_selection(self, count):
+        """Move the selection count rows up or down; returns "break" to stop the default handling."""
+        if not self.records:
+            return "break"
+            
+        position = self.position_of(self.selected_key)
+        position = 0 if position is None else max(0, min(position + count, len(self.records) - 1))
+        self.select_key(self.row_key(self.records[position]))
+        return "break"